@@ -12,6 +12,8 @@ from botbuilder.core import (
 )
 from botbuilder.schema import ActivityTypes, Activity
 
+from helpers.metrics import TURN_ERRORS
+
 
 class AdapterWithErrorHandler(BotFrameworkAdapter):
     def __init__(
@@ -29,6 +31,7 @@ class AdapterWithErrorHandler(BotFrameworkAdapter):
             #       application insights.
             print(f"\n [on_turn_error] unhandled error: {error}", file=sys.stderr)
             traceback.print_exc()
+            TURN_ERRORS.labels(type(error).__name__).inc()
 
             # Send a message to the user
             await context.send_activity("The bot encountered an error or bug.")
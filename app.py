@@ -8,26 +8,25 @@ This sample shows how to create a bot that demonstrates the following:
 - Handle user interruptions for such things as `Help` or `Cancel`.
 - Prompt for and validate requests for information from the user.
 """
+import hmac
 from http import HTTPStatus
+from threading import current_thread
 
 from aiohttp import web
 from aiohttp.web import Request, Response, json_response
+from msrest.exceptions import DeserializationError
 
 from botbuilder.core import (
     BotFrameworkAdapterSettings,
-    ConversationState,
-    MemoryStorage,
-    UserState,
+    NullTelemetryClient,
 )
 
 from botbuilder.core.integration import aiohttp_error_middleware
-from botbuilder.schema import Activity
 from botbuilder.applicationinsights import ApplicationInsightsTelemetryClient
-from botbuilder.integration.applicationinsights.aiohttp import (
-    AiohttpTelemetryProcessor,
-    bot_telemetry_middleware,
-)
-from botbuilder.core.telemetry_logger_middleware import TelemetryLoggerMiddleware
+from botbuilder.integration.applicationinsights.aiohttp import AiohttpTelemetryProcessor
+from botbuilder.integration.applicationinsights.aiohttp import aiohttp_telemetry_middleware
+from applicationinsights import TelemetryClient
+from applicationinsights.channel import TelemetryChannel
 
 from config import DefaultConfig
 from dialogs import MainDialog, BookingDialog
@@ -35,6 +34,26 @@ from bots import DialogAndWelcomeBot
 
 from adapter_with_error_handler import AdapterWithErrorHandler
 from flight_booking_recognizer import FlightBookingRecognizer
+from sampling_telemetry_middleware import SamplingTelemetryLoggerMiddleware
+from helpers.activity_parser import ActivityParser, loads
+from helpers.admission import AdmissionController, AdmissionPriorityMiddleware, AdmissionRejected
+from helpers.date_recognition import DateRecognizer
+from helpers.fast_path_router import FastPathRouter
+from helpers.loop_lag import LoopLagMonitor
+from helpers.metrics import REGISTRY, TURN_SECONDS, TURNS_IN_FLIGHT
+from helpers.profiler import TurnProfiler
+from helpers.telemetry_sink import AsyncTelemetryQueue
+from helpers.turn_queue import TurnQueue
+from storage import (
+    CachedConversationState,
+    CachedUserState,
+    CodecStorage,
+    DeltaSqliteStorage,
+    EvictingMemoryStorage,
+    SqliteStorage,
+    StateCache,
+    StateCodec,
+)
 
 
 CONFIG = DefaultConfig()
@@ -44,40 +63,111 @@ CONFIG = DefaultConfig()
 SETTINGS = BotFrameworkAdapterSettings(CONFIG.CHATBOT_BOT_ID, CONFIG.CHATBOT_BOT_PASSWORD)
 
 # Create MemoryStorage, UserState and ConversationState
-MEMORY = MemoryStorage()
-USER_STATE = UserState(MEMORY)
-CONVERSATION_STATE = ConversationState(MEMORY)
+STATE_CODEC = StateCodec(CONFIG.STATE_COMPRESS_ABOVE) if CONFIG.STATE_CODEC == "binary" else None
+EVICTION = dict(
+    idle_ttl=CONFIG.STATE_IDLE_TTL,
+    max_entries=CONFIG.STATE_MAX_ENTRIES,
+    sweep_interval=CONFIG.STATE_SWEEP_INTERVAL,
+)
+MEMORY = None
+if CONFIG.STORAGE == "sqlite" and CONFIG.SQLITE_DELTAS:
+    # Its own uncompressed codec: the deltas are deflated.
+    MEMORY = DeltaSqliteStorage(
+        CONFIG.SQLITE_PATH, flush_interval=CONFIG.SQLITE_FLUSH_INTERVAL, snapshot_every=CONFIG.SQLITE_DELTAS
+    )
+elif CONFIG.STORAGE == "sqlite":
+    MEMORY = SqliteStorage(CONFIG.SQLITE_PATH, flush_interval=CONFIG.SQLITE_FLUSH_INTERVAL, codec=STATE_CODEC)
+if STATE_CODEC is not None and CONFIG.STATE_CACHE:
+    MEMORY = StateCache(MEMORY, STATE_CODEC, **EVICTION)
+elif MEMORY is None:
+    MEMORY = EvictingMemoryStorage(**EVICTION)
+    if STATE_CODEC is not None:
+        MEMORY = CodecStorage(MEMORY, STATE_CODEC)
+USER_STATE = CachedUserState(MEMORY)
+CONVERSATION_STATE = CachedConversationState(MEMORY)
 
 # Create adapter.
 # See https://aka.ms/about-bot-adapter to learn more about how bots work.
 ADAPTER = AdapterWithErrorHandler(SETTINGS, CONVERSATION_STATE)
 
 # Create telemetry client.
-# Note the small 'client_queue_size'.  This is for demonstration purposes.  Larger queue sizes
-# result in fewer calls to applicationInsights, improving bot performance at the expense of
-# less frequent updates.
+# Events go to a bounded buffer sent in batches by a background task (see
+# helpers/telemetry_sink.py), so tracking never waits on Application Insights.
 
 INSTRUMENTATION_KEY = CONFIG.APPINSIGHTS_INSTRUMENTATIONKEY
-TELEMETRY_CLIENT = ApplicationInsightsTelemetryClient(
-    instrumentation_key = INSTRUMENTATION_KEY, 
-    telemetry_processor=AiohttpTelemetryProcessor(), 
-    client_queue_size=10,
-)
+if INSTRUMENTATION_KEY:
+    TELEMETRY_QUEUE = AsyncTelemetryQueue(
+        endpoint=CONFIG.TELEMETRY_ENDPOINT,
+        capacity=CONFIG.TELEMETRY_BUFFER_SIZE,
+        batch_size=CONFIG.TELEMETRY_BATCH_SIZE,
+        flush_interval=CONFIG.TELEMETRY_FLUSH_INTERVAL,
+        spool_path=CONFIG.TELEMETRY_SPOOL_PATH or None,
+    )
+    TELEMETRY_CLIENT = ApplicationInsightsTelemetryClient(
+        instrumentation_key = INSTRUMENTATION_KEY, 
+        telemetry_client=TelemetryClient(INSTRUMENTATION_KEY, TelemetryChannel(queue=TELEMETRY_QUEUE)),
+        telemetry_processor=AiohttpTelemetryProcessor(), 
+    )
+else:
+    # An empty key disables telemetry (e.g. offline load tests).
+    TELEMETRY_QUEUE = None
+    TELEMETRY_CLIENT = NullTelemetryClient()
 
-TELEMETRY_MIDDLEWARE =  TelemetryLoggerMiddleware(
+TELEMETRY_MIDDLEWARE =  SamplingTelemetryLoggerMiddleware(
     telemetry_client=TELEMETRY_CLIENT,
-    log_personal_information=True
+    log_personal_information=True,
+    sample_rate=CONFIG.TELEMETRY_SAMPLE_RATE,
+    target_turns_per_second=CONFIG.TELEMETRY_TARGET_TURNS_PER_S,
+    max_text_length=CONFIG.TELEMETRY_MAX_TEXT_LENGTH,
+    hash_text=CONFIG.TELEMETRY_HASH_TEXT,
 )
 ADAPTER.use(TELEMETRY_MIDDLEWARE)
 
 # Create dialogs and Bot
 RECOGNIZER = FlightBookingRecognizer(CONFIG, telemetry_client=TELEMETRY_CLIENT)
-BOOKING_DIALOG = BookingDialog()
-DIALOG = MainDialog(RECOGNIZER, BOOKING_DIALOG, telemetry_client=TELEMETRY_CLIENT)
+DATE_RECOGNIZER = DateRecognizer(CONFIG.DATE_RECOGNITION_PROCESSES)
+BOOKING_DIALOG = BookingDialog(date_recognizer=DATE_RECOGNIZER)
+FAST_PATH_ROUTER = FastPathRouter.from_file(CONFIG.FAST_PATH_RULES, CONFIG.FAST_PATH_MODE)
+DIALOG = MainDialog(
+    RECOGNIZER, BOOKING_DIALOG, telemetry_client=TELEMETRY_CLIENT, fast_path_router=FAST_PATH_ROUTER
+)
 BOT = DialogAndWelcomeBot(CONVERSATION_STATE, USER_STATE, DIALOG, TELEMETRY_CLIENT)
 
 TELEMETRY_CLIENT.main_dialog = DIALOG
 
+TURN_QUEUE = TurnQueue()
+if CONFIG.ADMISSION_MAX_CONCURRENT:
+    ADMISSION = AdmissionController(
+        CONFIG.ADMISSION_MAX_CONCURRENT,
+        max_queue=CONFIG.ADMISSION_MAX_QUEUE,
+        max_wait=CONFIG.ADMISSION_MAX_WAIT,
+        retry_after=CONFIG.ADMISSION_RETRY_AFTER,
+        max_keys=CONFIG.STATE_MAX_ENTRIES or 10000,
+    )
+    # Marks the conversations left in the middle of a booking by their turn.
+    ADAPTER.use(AdmissionPriorityMiddleware(ADMISSION, CONVERSATION_STATE, [BookingDialog.__name__]))
+else:
+    ADMISSION = None
+PROFILER = TurnProfiler(CONFIG.PROFILE_DIR, mode=CONFIG.PROFILE_MODE)
+PROFILE_HEADER = "X-Profile-Turn"
+LOOP_LAG = LoopLagMonitor(CONFIG.LOOP_LAG_INTERVAL)
+ACTIVITY_PARSER = ActivityParser()
+
+# Component counters, read when /metrics is scraped.
+REGISTRY.register_stats("bot_turn_queue", "Per-conversation turn queue (helpers/turn_queue.py).", lambda: TURN_QUEUE.stats)
+REGISTRY.register_stats("bot_storage", "State storage counters.", lambda: MEMORY.stats)
+REGISTRY.register_stats("bot_telemetry_middleware", "Activity telemetry sampling.", lambda: TELEMETRY_MIDDLEWARE.stats)
+REGISTRY.register_stats("bot_fast_path", "Local intent rules tried before LUIS.", lambda: FAST_PATH_ROUTER.stats)
+REGISTRY.register_stats("bot_date_recognizer", "DateTimePrompt recognition (helpers/date_recognition.py).", lambda: DATE_RECOGNIZER.stats)
+REGISTRY.register_stats("bot_event_loop_lag", "Last and largest event loop lag, in seconds.", lambda: LOOP_LAG.stats)
+REGISTRY.register_stats("bot_activity_parser", "Activities built directly or by msrest.", lambda: ACTIVITY_PARSER.stats)
+if ADMISSION is not None:
+    REGISTRY.register_stats("bot_admission", "Admission control (helpers/admission.py).", lambda: ADMISSION.stats)
+if RECOGNIZER.cache is not None:
+    REGISTRY.register_stats("bot_recognition_cache", "LUIS recognition cache.", lambda: RECOGNIZER.cache.stats)
+if TELEMETRY_QUEUE is not None:
+    REGISTRY.register_stats("bot_telemetry_queue", "Application Insights send queue.", lambda: TELEMETRY_QUEUE.stats)
+
 # # Listen for incoming requests on /api/messages.
 # async def index(req: Request) -> Response:
 #     name = req.match_info.get('name', "Anonymous")
@@ -87,15 +177,58 @@ TELEMETRY_CLIENT.main_dialog = DIALOG
 # Listen for incoming requests on /api/messages.
 async def messages(req: Request) -> Response:
     # Main bot message handler.
-    if "application/json" in req.headers["Content-Type"]:       
-        body = await req.json()       
-    else:
+    if "application/json" not in req.headers.get("Content-Type", ""):
         return Response(status=HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+    # Chunked bodies have no Content-Length: aiohttp stops reading them at the
+    # application's client_max_size (fast_start's is larger: check again).
+    if (req.content_length or 0) > CONFIG.MAX_ACTIVITY_BYTES:
+        return Response(status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    try:
+        data = await req.read()
+    except web.HTTPRequestEntityTooLarge:
+        return Response(status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    if len(data) > CONFIG.MAX_ACTIVITY_BYTES:
+        return Response(status=HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    try:
+        body = loads(data)
+    except ValueError:
+        return Response(status=HTTPStatus.BAD_REQUEST)
+    if not isinstance(body, dict):
+        return Response(status=HTTPStatus.BAD_REQUEST)
 
-    activity = Activity().deserialize(body)
+    if INSTRUMENTATION_KEY:
+        # What bot_telemetry_middleware did, without parsing the body a second
+        # time: AiohttpTelemetryProcessor reads it back from this thread's entry.
+        aiohttp_telemetry_middleware._REQUEST_BODIES[current_thread().ident] = body  # pylint: disable=protected-access
+    try:
+        activity = ACTIVITY_PARSER.parse(body)
+    except DeserializationError:
+        # e.g. an invalid timestamp, rejected by msrest.
+        return Response(status=HTTPStatus.BAD_REQUEST)
     auth_header = req.headers["Authorization"] if "Authorization" in req.headers else ""   
 
-    response = await ADAPTER.process_activity(activity, auth_header, BOT.on_turn)
+    # Turns of one conversation run one after the other (a double-send must not
+    # interleave two waterfalls over the same DialogState); other conversations
+    # are not blocked.
+    conversation_id = activity.conversation.id if activity.conversation else ""
+    key = f"{activity.channel_id}/{conversation_id}"
+    turn = lambda: ADAPTER.process_activity(activity, auth_header, BOT.on_turn)
+    if PROFILER.armed or PROFILE_HEADER in req.headers:
+        turn = PROFILER.wrap(conversation_id, turn, force=is_admin(req.headers.get(PROFILE_HEADER)))
+    if ADMISSION is not None:
+        # Asked for once the conversation's earlier turns are done: turns queued
+        # behind them do not hold a slot.
+        queued_turn = turn
+        turn = lambda: ADMISSION.run(key, queued_turn)
+
+    TURNS_IN_FLIGHT.inc()
+    try:
+        with TURN_SECONDS.time():
+            response = await TURN_QUEUE.run(key, turn)
+    except AdmissionRejected as rejection:
+        return Response(status=HTTPStatus.SERVICE_UNAVAILABLE, headers={"Retry-After": str(rejection.retry_after)})
+    finally:
+        TURNS_IN_FLIGHT.dec()
 
     if response:
         return json_response(data=response.body, status=response.status)
@@ -103,16 +236,80 @@ async def messages(req: Request) -> Response:
     return Response(status=HTTPStatus.OK)
 
 
+def is_admin(token: str) -> bool:
+    if not CONFIG.PROFILE_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, CONFIG.PROFILE_ADMIN_TOKEN)
+
+
+# Arm (POST ?turns=N&conversation_id=...&mode=cprofile|sample), inspect (GET)
+# or disarm (DELETE) the turn profiler. Needs "Authorization: Bearer <PROFILE_ADMIN_TOKEN>".
+async def admin_profile(req: Request) -> Response:
+    authorization = req.headers.get("Authorization", "")
+    if not is_admin(authorization[len("Bearer "):] if authorization.startswith("Bearer ") else ""):
+        return Response(status=HTTPStatus.FORBIDDEN)
+
+    if req.method == "POST":
+        try:
+            PROFILER.arm(
+                turns=int(req.query.get("turns", 1)),
+                conversation_id=req.query.get("conversation_id"),
+                mode=req.query.get("mode"),
+            )
+        except ValueError as error:
+            return json_response({"error": str(error)}, status=HTTPStatus.BAD_REQUEST)
+    elif req.method == "DELETE":
+        PROFILER.disarm()
+    return json_response(PROFILER.stats)
+
+
+# Prometheus scrape target (helpers/metrics.py).
+async def metrics(req: Request) -> Response:
+    return Response(
+        body=REGISTRY.render().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+# Readiness probe; always ready once serving. fast_start.py answers it while loading.
+async def ready(req: Request) -> Response:
+    return json_response({"ready": True, "stage": "ready"})
+
+
 # For aiohttp deployment: www.youtube.com/watch?v=eLMYd4LGAu8
 # https://docs.microsoft.com/fr-fr/azure/app-service/configure-language-python#customize-startup-command
 # On Azure Portal: App Service >> Web App Configuration >> General Settings
 # Update <Startup Command> with:
 # python3.8 -m aiohttp.web -H 0.0.0.0 -P 8000 app:init_func
 # Note : app(.py) is the name of the app
+# fast_start:init_func binds the port before importing this module (see fast_start.py).
+
+async def on_startup(app: web.Application):
+    # Worker processes build their date models before the first prompt needs them.
+    await DATE_RECOGNIZER.start()
+    LOOP_LAG.start()
+
+
+async def on_cleanup(app: web.Application):
+    await LOOP_LAG.stop()
+    await DATE_RECOGNIZER.close()
+    await RECOGNIZER.close()
+    # Stops background tasks; SqliteStorage also commits its queued writes.
+    await MEMORY.close()
+    if TELEMETRY_QUEUE is not None:
+        # Sends, or spools, the events still buffered.
+        await TELEMETRY_QUEUE.close()
+
 
 def init_func(argv):
-    app = web.Application(middlewares=[bot_telemetry_middleware, aiohttp_error_middleware])
+    app = web.Application(middlewares=[aiohttp_error_middleware], client_max_size=CONFIG.MAX_ACTIVITY_BYTES)
     app.router.add_post("/api/messages", messages)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/ready", ready)
+    for method in ("GET", "POST", "DELETE"):
+        app.router.add_route(method, "/admin/profile", admin_profile)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
     return app
 
 if __name__ == "__main__":
@@ -3,6 +3,11 @@
 
 
 class BookingDetails:
+    # Field order is part of the binary state format (storage/state_codec.py):
+    # append new fields at the end.
+    SCHEMA = ("from_city", "to_city", "from_date", "to_date", "budget")
+    __slots__ = SCHEMA
+
     def __init__(
         self,
         from_city: str = "",
@@ -12,6 +12,8 @@ from botbuilder.core import (
 )
 from botbuilder.dialogs import Dialog, DialogExtensions
 from helpers.dialog_helper import DialogHelper
+from helpers.metrics import STATE_SECONDS
+from storage import save_all_changes
 
 
 class DialogBot(ActivityHandler):
@@ -44,15 +46,20 @@ class DialogBot(ActivityHandler):
         # properties["text"] = turn_context.activity.text
         # self.telemetry_client.track_event("messageActivity", properties)
 
+        # Load explicitly (run_dialog would do it lazily) to time it on its own.
+        with STATE_SECONDS.labels("load").time():
+            await self.conversation_state.load(turn_context)
+
         await DialogExtensions.run_dialog(
             self.dialog,
             turn_context,
             self.conversation_state.create_property("DialogState"),
         )
 
-        # Save any state changes that might have occured during the turn.
-        await self.conversation_state.save_changes(turn_context, False)
-        await self.user_state.save_changes(turn_context, False)
+        # Save any state changes that might have occured during the turn, in a
+        # single storage write when both states share the storage.
+        with STATE_SECONDS.labels("save").time():
+            await save_all_changes(turn_context, self.conversation_state, self.user_state)
 
     @property
     def telemetry_client(self) -> BotTelemetryClient:
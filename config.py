@@ -7,6 +7,8 @@ import os
 
 from dotenv import load_dotenv
 
+from luis_http_client import HttpClientOptions
+
 
 class DefaultConfig:
     """Configuration for the bot."""
@@ -21,5 +23,104 @@ class DefaultConfig:
         self.LUIS_APP_ID = os.environ.get("LUIS_APP_ID", "cfde1d4c-2cf0-437c-98b9-cdfb6abdbecb")
         self.LUIS_PRED_KEY = os.environ.get("LUIS_PRED_KEY", "6321abe2e88341ecab8981a107c87099")
         self.LUIS_PRED_ENDPOINT = os.environ.get("LUIS_PRED_ENDPOINT", "https://p10luis.cognitiveservices.azure.com/")
+        # Pin predictions to a published version instead of the production slot.
+        self.LUIS_APP_VERSION = os.environ.get("LUIS_APP_VERSION", "")
+
+        # Pool size, keep-alive, timeouts and retries for LUIS calls (LUIS_HTTP_* variables).
+        self.LUIS_HTTP_OPTIONS = HttpClientOptions.from_env()
+
+        # Recognition cache; LUIS_CACHE_SIZE=0 disables it. Entries are keyed by
+        # LUIS_APP_VERSION (or the slot): a version republished to the same slot is
+        # only picked up as entries expire, after LUIS_CACHE_TTL seconds.
+        self.LUIS_CACHE_SIZE = int(os.environ.get("LUIS_CACHE_SIZE", 1024))
+        self.LUIS_CACHE_TTL = float(os.environ.get("LUIS_CACHE_TTL", 3600))
+
+        # "luis" queries the LUIS endpoint, "offline" uses the in-process model
+        # trained from OFFLINE_TRAIN_PATH (see offline_recognizer.py).
+        self.RECOGNIZER = os.environ.get("RECOGNIZER", "luis")
+        self.OFFLINE_TRAIN_PATH = os.environ.get(
+            "OFFLINE_TRAIN_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "00_data", "datasets", "utterances_train.json"),
+        )
+
+        # Local intent rules tried before LUIS: "on" answers matching messages without
+        # LUIS, "shadow" only compares them with LUIS, "off" disables the rules.
+        self.FAST_PATH_MODE = os.environ.get("FAST_PATH_MODE", "on")
+        self.FAST_PATH_RULES = os.environ.get(
+            "FAST_PATH_RULES",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "fast_path_rules.json"),
+        )
+
+        # fast_start:init_func: seconds a request waits for the bot to finish loading
+        # before getting a 503.
+        self.READY_TIMEOUT = float(os.environ.get("READY_TIMEOUT", 60))
+
+        # DateTimePrompt recognition in this many warm worker processes (0 = on the
+        # event loop); the loop lag is sampled every LOOP_LAG_INTERVAL seconds.
+        self.DATE_RECOGNITION_PROCESSES = int(os.environ.get("DATE_RECOGNITION_PROCESSES", 0))
+        self.LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", 0.5))
+
+        # Largest /api/messages body accepted, in bytes (413 above).
+        self.MAX_ACTIVITY_BYTES = int(os.environ.get("MAX_ACTIVITY_BYTES", 256 * 1024))
+
+        # Admission control on /api/messages (helpers/admission.py): at most
+        # ADMISSION_MAX_CONCURRENT turns run at once (0 disables it), up to
+        # ADMISSION_MAX_QUEUE more wait at most ADMISSION_MAX_WAIT seconds, the rest
+        # get a 503 with Retry-After: ADMISSION_RETRY_AFTER. Conversations in the
+        # middle of a booking go first.
+        self.ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", 0))
+        self.ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 100))
+        self.ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", 5))
+        self.ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 2))
+
+        # Conversation/user state storage: "memory" or "sqlite" (durable, shared by processes).
+        self.STORAGE = os.environ.get("STORAGE", "memory")
+        self.SQLITE_PATH = os.environ.get("SQLITE_PATH", "bot_state.db")
+        self.SQLITE_FLUSH_INTERVAL = float(os.environ.get("SQLITE_FLUSH_INTERVAL", 0.05))
+        # Append each write as a delta, with a snapshot every SQLITE_DELTAS writes
+        # (storage/delta_sqlite_storage.py); 0 rewrites whole rows.
+        self.SQLITE_DELTAS = int(os.environ.get("SQLITE_DELTAS", 0))
+
+        # State encoding: "binary" (storage/state_codec.py, zlib above STATE_COMPRESS_ABOVE
+        # bytes, 0 = never) or "jsonpickle"/"none" (state kept as the Bot Framework does).
+        self.STATE_CODEC = os.environ.get("STATE_CODEC", "binary")
+        self.STATE_COMPRESS_ABOVE = int(os.environ.get("STATE_COMPRESS_ABOVE", 1024))
+        # With the binary codec, keep state in a StateCache (in front of SQLite when
+        # STORAGE=sqlite): no deep copies, unchanged state is not rewritten.
+        self.STATE_CACHE = os.environ.get("STATE_CACHE", "on") == "on"
+
+        # In-memory state limits: idle conversations are dropped after STATE_IDLE_TTL
+        # seconds, least recently used ones beyond STATE_MAX_ENTRIES (0 disables).
+        self.STATE_IDLE_TTL = float(os.environ.get("STATE_IDLE_TTL", 3600))
+        self.STATE_MAX_ENTRIES = int(os.environ.get("STATE_MAX_ENTRIES", 10000))
+        self.STATE_SWEEP_INTERVAL = float(os.environ.get("STATE_SWEEP_INTERVAL", 60))
+
+        # launcher.py: worker processes (0 = one per core) and activities served
+        # by a worker before it is replaced (0 = never).
+        self.WORKERS = int(os.environ.get("WORKERS", 1))
+        self.WORKER_MAX_REQUESTS = int(os.environ.get("WORKER_MAX_REQUESTS", 0))
+
+        # On-demand turn profiling (helpers/profiler.py), armed through /admin/profile
+        # or the X-Profile-Turn header; both need PROFILE_ADMIN_TOKEN (empty disables them).
+        self.PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+        self.PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+        self.PROFILE_MODE = os.environ.get("PROFILE_MODE", "cprofile")
         
-        self.APPINSIGHTS_INSTRUMENTATIONKEY = os.environ.get("APPINSIGHTS_INSTRUMENTATIONKEY", "7a7bd8f1-6b2a-4ddd-9bd2-ef22e1fd5143")
\ No newline at end of file
+        self.APPINSIGHTS_INSTRUMENTATIONKEY = os.environ.get("APPINSIGHTS_INSTRUMENTATIONKEY", "7a7bd8f1-6b2a-4ddd-9bd2-ef22e1fd5143")
+
+        # Telemetry buffer: events are sent TELEMETRY_BATCH_SIZE at a time or every
+        # TELEMETRY_FLUSH_INTERVAL seconds; undeliverable batches are appended to
+        # TELEMETRY_SPOOL_PATH (empty disables the spool) and replayed later.
+        self.TELEMETRY_ENDPOINT = os.environ.get("TELEMETRY_ENDPOINT", "https://dc.services.visualstudio.com/v2/track")
+        self.TELEMETRY_BUFFER_SIZE = int(os.environ.get("TELEMETRY_BUFFER_SIZE", 1000))
+        self.TELEMETRY_BATCH_SIZE = int(os.environ.get("TELEMETRY_BATCH_SIZE", 100))
+        self.TELEMETRY_FLUSH_INTERVAL = float(os.environ.get("TELEMETRY_FLUSH_INTERVAL", 5))
+        self.TELEMETRY_SPOOL_PATH = os.environ.get("TELEMETRY_SPOOL_PATH", "telemetry_spool.jsonl")
+
+        # Share of turns whose activities are logged, lowered automatically above
+        # TELEMETRY_TARGET_TURNS_PER_S (0 disables); longer texts are truncated,
+        # or replaced by a hash with TELEMETRY_HASH_TEXT=1. Errors are always logged.
+        self.TELEMETRY_SAMPLE_RATE = float(os.environ.get("TELEMETRY_SAMPLE_RATE", 1.0))
+        self.TELEMETRY_TARGET_TURNS_PER_S = float(os.environ.get("TELEMETRY_TARGET_TURNS_PER_S", 10))
+        self.TELEMETRY_MAX_TEXT_LENGTH = int(os.environ.get("TELEMETRY_MAX_TEXT_LENGTH", 256))
+        self.TELEMETRY_HASH_TEXT = os.environ.get("TELEMETRY_HASH_TEXT", "0") == "1"
\ No newline at end of file
@@ -8,6 +8,8 @@ from botbuilder.dialogs import WaterfallDialog, WaterfallStepContext, DialogTurn
 from botbuilder.dialogs.prompts import ConfirmPrompt, TextPrompt, PromptOptions, PromptCultureModels
 from botbuilder.dialogs.choices import Choice, ChoiceFactoryOptions
 from botbuilder.core import MessageFactory, BotTelemetryClient, NullTelemetryClient
+from helpers.date_recognition import DateRecognizer
+from helpers.metrics import timed_step
 from .cancel_and_help_dialog import CancelAndHelpDialog
 from .date_resolver_dialog import DateResolverDialog
 
@@ -19,6 +21,7 @@ class BookingDialog(CancelAndHelpDialog):
         self,
         dialog_id: str = None,
         telemetry_client: BotTelemetryClient = NullTelemetryClient(),
+        date_recognizer: DateRecognizer = None,
     ):
         super(BookingDialog, self).__init__(
             dialog_id or BookingDialog.__name__, telemetry_client
@@ -30,13 +33,16 @@ class BookingDialog(CancelAndHelpDialog):
         waterfall_dialog = WaterfallDialog(
             WaterfallDialog.__name__,
             [
-                self.from_city_step,
-                self.to_city_step,
-                self.from_date_step,
-                self.to_date_step,
-                self.budget_step,
-                self.confirm_step,
-                self.final_step,
+                timed_step(BookingDialog.__name__, step)
+                for step in (
+                    self.from_city_step,
+                    self.to_city_step,
+                    self.from_date_step,
+                    self.to_date_step,
+                    self.budget_step,
+                    self.confirm_step,
+                    self.final_step,
+                )
             ],
         )
         waterfall_dialog.telemetry_client = telemetry_client
@@ -64,14 +70,16 @@ class BookingDialog(CancelAndHelpDialog):
             DateResolverDialog(
                 DateResolverDialog.__name__ + "_from_date",
                 self.telemetry_client,
-                "When do you want to leave?"
+                "When do you want to leave?",
+                date_recognizer,
             )
         )
         self.add_dialog(
             DateResolverDialog(
                 DateResolverDialog.__name__ + "_to_date",
                 self.telemetry_client,
-                "When do you want to come back?"
+                "When do you want to come back?",
+                date_recognizer,
             )
         )
         self.add_dialog(waterfall_dialog)
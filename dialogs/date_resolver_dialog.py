@@ -12,6 +12,7 @@ from botbuilder.dialogs.prompts import (
     PromptOptions,
     DateTimeResolution,
 )
+from helpers.date_recognition import DateRecognizer, OffloadedDateTimePrompt, is_definite
 from .cancel_and_help_dialog import CancelAndHelpDialog
 
 
@@ -22,15 +23,19 @@ class DateResolverDialog(CancelAndHelpDialog):
         self,
         dialog_id: str = None,
         telemetry_client: BotTelemetryClient = NullTelemetryClient(),
-        prompt_msg: str = "On what date would you like to travel?"
+        prompt_msg: str = "On what date would you like to travel?",
+        date_recognizer: DateRecognizer = None,
     ):
         super(DateResolverDialog, self).__init__(
             dialog_id or DateResolverDialog.__name__, telemetry_client
         )
         self.telemetry_client = telemetry_client
 
-        date_time_prompt = DateTimePrompt(
-            DateTimePrompt.__name__, DateResolverDialog.datetime_prompt_validator
+        # Registered under DateTimePrompt's id: dialog stacks in storage refer to it.
+        date_time_prompt = OffloadedDateTimePrompt(
+            DateTimePrompt.__name__,
+            DateResolverDialog.datetime_prompt_validator,
+            date_recognizer=date_recognizer,
         )
         date_time_prompt.telemetry_client = telemetry_client
 
@@ -84,9 +89,12 @@ class DateResolverDialog(CancelAndHelpDialog):
     async def datetime_prompt_validator(prompt_context: PromptValidatorContext) -> bool:
         """ Validate the date provided is in proper form. """
         if prompt_context.recognized.succeeded:
-            timex = prompt_context.recognized.value[0].timex.split("T")[0]
+            # Already checked where the date was recognized (possibly another process).
+            definite = getattr(prompt_context.recognized, "definite", None)
+            if definite is not None:
+                return definite
 
             # TODO: Needs TimexProperty
-            return "definite" in Timex(timex).types
+            return is_definite(prompt_context.recognized.value[0].timex)
 
         return False
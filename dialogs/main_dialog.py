@@ -1,6 +1,6 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
-import uuid, json, re
+import uuid
 
 from botbuilder.dialogs import (
     ComponentDialog, WaterfallDialog,
@@ -12,7 +12,10 @@ from botbuilder.schema import InputHints, Attachment
 
 from booking_details import BookingDetails
 from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.card_templates import CardTemplates
+from helpers.fast_path_router import FastPathRouter
 from helpers.luis_helper import LuisHelper, Intent
+from helpers.metrics import timed_step
 from .booking_dialog import BookingDialog
 
 
@@ -22,6 +25,8 @@ class MainDialog(ComponentDialog):
         luis_recognizer: FlightBookingRecognizer,
         booking_dialog: BookingDialog,
         telemetry_client: BotTelemetryClient = None,
+        fast_path_router: FastPathRouter = None,
+        card_templates: CardTemplates = None,
     ):
         super(MainDialog, self).__init__(MainDialog.__name__)
         self.telemetry_client = telemetry_client or NullTelemetryClient()
@@ -32,11 +37,18 @@ class MainDialog(ComponentDialog):
         booking_dialog.telemetry_client = self.telemetry_client
 
         wf_dialog = WaterfallDialog(
-            "WFDialog", [self.intro_step, self.act_step, self.final_step]
+            "WFDialog",
+            [
+                timed_step(MainDialog.__name__, step)
+                for step in (self.intro_step, self.act_step, self.final_step)
+            ],
         )
         wf_dialog.telemetry_client = self.telemetry_client
 
         self._luis_recognizer = luis_recognizer
+        self._fast_path_router = fast_path_router
+        # Parsed once here rather than on every booking.
+        self._card_templates = card_templates or CardTemplates.from_directory()
         self._booking_dialog_id = booking_dialog.id
 
         self.add_dialog(text_prompt)
@@ -65,7 +77,13 @@ class MainDialog(ComponentDialog):
 
     async def act_step(self, step_context: WaterfallStepContext) -> DialogTurnResult:
         # Call LUIS and gather any potential booking details. (Note the TurnContext has the response to the prompt.)
-        intent, luis_result = await LuisHelper.execute_luis_query(
+        # Greetings and other obvious messages are answered by the local rules first.
+        execute_query = (
+            self._fast_path_router.execute_luis_query
+            if self._fast_path_router
+            else LuisHelper.execute_luis_query
+        )
+        intent, luis_result = await execute_query(
             self._luis_recognizer, step_context.context
         )
 
@@ -117,37 +135,19 @@ class MainDialog(ComponentDialog):
         return await step_context.replace_dialog(self.id, prompt_message)
 
 
-    # Create internal function
-    def replace(self, templateCard: dict, data: dict):
-        string_temp = str(templateCard)
-        for key in data:
-            pattern = "\${" + key + "}"
-            string_temp = re.sub(pattern, str(data[key]), string_temp)
-        return eval(string_temp)
-
-
-    # Load attachment from file.
+    # Render the booking recap from the precompiled template.
     def create_adaptive_card_attachment(self, result):
         """Create an adaptive card."""
-        
-        path =  "cards/bookedFlightCard.json" #need to create this
-        with open(path) as card_file:
-            card = json.load(card_file)
-        
-        origin = result.from_city
-        destination = result.to_city
-        start_date = result.from_date
-        end_date = result.to_date
-        budget = result.budget
-
-        templateCard = {
-            "origin": origin, 
-            "destination": destination,
-            "start_date": start_date,
-            "end_date": end_date,
-            "budget": budget}
-
-        flightCard = self.replace(card, templateCard)
+        flightCard = self._card_templates.render(
+            "bookedFlightCard",
+            {
+                "from_city": result.from_city,
+                "to_city": result.to_city,
+                "from_date": result.from_date,
+                "to_date": result.to_date,
+                "budget": result.budget,
+            },
+        )
 
         return Attachment(
-            content_type="application/vnd.microsoft.card.adaptive", content=flightCard)
\ No newline at end of file
+            content_type="application/vnd.microsoft.card.adaptive", content=flightCard)
@@ -0,0 +1,188 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bind the port first, then load the bot in the background.
+
+    python -m aiohttp.web -H 0.0.0.0 -P 8000 fast_start:init_func
+
+Importing ``app`` takes most of a cold start: botbuilder, Application
+Insights (which pulls in Django), recognizers-text. Here ``init_func``
+returns a small application right away, so the port is bound while
+``LazyApp``:
+
+1. imports the modules ``app.py`` imports, in a thread, so the loop keeps
+   answering ``/ready`` and health probes;
+2. imports ``app`` on the loop (only its module-level objects are built
+   there) and starts ``app.init_func``'s application;
+3. warms up the recognizers-text models in a thread.
+
+Requests are forwarded to the real application once step 2 is done;
+those arriving earlier wait up to ``READY_TIMEOUT`` seconds, then get a
+503 with ``Retry-After``. ``GET /ready`` answers 200 after step 3 and
+503 before, with the current stage and how long each stage took.
+"""
+import ast
+import asyncio
+import importlib
+import os
+import sys
+import time
+import traceback
+from functools import partial
+from http import HTTPStatus
+from typing import Callable, Dict, List, Sequence
+
+from aiohttp import web
+
+from config import DefaultConfig
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def module_imports(path: str) -> List[str]:
+    """Absolute modules imported at the top level of a source file."""
+    with open(path, encoding="utf-8") as source:
+        tree = ast.parse(source.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.append(node.module)
+    return modules
+
+
+def _import_all(modules: Sequence[str]):
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _warm_recognizers():
+    # pylint: disable=import-outside-toplevel
+    from recognizers_choice import recognize_boolean
+    from recognizers_number import recognize_number
+
+    from helpers.date_recognition import warm_up
+
+    # The models behind DateTimePrompt, ConfirmPrompt and its choice fallback
+    # are built on first use.
+    warm_up()
+    recognize_boolean("yes", "English")
+    recognize_number("1", "English")
+
+
+class LazyApp:
+    """Loads ``module_name:init_func`` in the background and forwards requests to it."""
+
+    def __init__(
+        self,
+        module_name: str = "app",
+        warm_ups: Sequence[Callable[[], None]] = (_warm_recognizers,),
+        ready_timeout: float = 60,
+    ):
+        self.module_name = module_name
+        self.warm_ups = warm_ups
+        self.ready_timeout = ready_timeout
+
+        self.app: web.Application = None
+        self.stage = "starting"
+        self.error: str = None
+        self.timings: Dict[str, float] = {}
+        self._started = time.monotonic()
+        self._loading: asyncio.Task = None
+        self._serving: asyncio.Event = None
+
+    async def on_startup(self, _app: web.Application):
+        # Returns at once: aiohttp binds the port after the startup hooks.
+        self._serving = asyncio.Event()
+        self._loading = asyncio.ensure_future(self._load())
+
+    async def _run_stage(self, stage: str, coroutine):
+        self.stage = stage
+        start = time.monotonic()
+        result = await coroutine
+        self.timings[stage] = time.monotonic() - start
+        return result
+
+    async def _load(self):
+        loop = asyncio.get_event_loop()
+        try:
+            path = os.path.join(ROOT, self.module_name.replace(".", os.sep) + ".py")
+            imports = module_imports(path) if os.path.exists(path) else []
+            await self._run_stage("importing", loop.run_in_executor(None, _import_all, imports))
+            await self._run_stage("initializing", self._initialize())
+            self._serving.set()
+            for warm_up in self.warm_ups:
+                await self._run_stage("warming", loop.run_in_executor(None, warm_up))
+            self.stage = "ready"
+            self.timings["total"] = time.monotonic() - self._started
+        except Exception as error:  # pylint: disable=broad-except
+            self.stage = "failed"
+            self.error = f"{type(error).__name__}: {error}"
+            print(f"\n [fast_start] loading {self.module_name} failed", file=sys.stderr)
+            traceback.print_exc()
+            # Waiting requests get their 503 now.
+            self._serving.set()
+
+    async def _initialize(self):
+        module = importlib.import_module(self.module_name)
+        app = module.init_func(None)
+        app.freeze()
+        await app.startup()
+        self.app = app
+
+    @property
+    def ready(self) -> bool:
+        return self.stage == "ready"
+
+    async def readiness(self, _request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "ready": self.ready,
+                "stage": self.stage,
+                "error": self.error,
+                "uptime": time.monotonic() - self._started,
+                "timings": self.timings,
+            },
+            status=HTTPStatus.OK if self.ready else HTTPStatus.SERVICE_UNAVAILABLE,
+        )
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        if not self._serving.is_set():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._serving.wait()), self.ready_timeout)
+            except asyncio.TimeoutError:
+                pass
+        if self.app is None:
+            # Still loading, or failed (see /ready).
+            return web.Response(status=HTTPStatus.SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
+
+        match = await self.app.router.resolve(request)
+        if match.http_exception is not None:
+            raise match.http_exception
+        handler = match.handler
+        for middleware in reversed(self.app.middlewares):
+            handler = partial(middleware, handler=handler)
+        return await handler(request)
+
+    async def on_cleanup(self, _app: web.Application):
+        if self._loading is not None and not self._loading.done():
+            self._loading.cancel()
+        if self.app is not None:
+            await self.app.cleanup()
+
+
+def init_func(argv):
+    config = DefaultConfig()
+    lazy = LazyApp(ready_timeout=config.READY_TIMEOUT)
+
+    app = web.Application()
+    app["lazy_app"] = lazy
+    app.router.add_get("/ready", lazy.readiness)
+    app.router.add_route("*", "/{path:.*}", lazy.handle)
+    app.on_startup.append(lazy.on_startup)
+    app.on_cleanup.append(lazy.on_cleanup)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(init_func(None), host="0.0.0.0", port=DefaultConfig().PORT)
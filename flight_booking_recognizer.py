@@ -2,6 +2,7 @@
 # Licensed under the MIT License.
 
 from botbuilder.ai.luis import LuisApplication, LuisRecognizer, LuisRecognizerOptionsV3
+from botbuilder.ai.luis.luis_recognizer_v3 import LuisRecognizerV3
 from botbuilder.core import (
     Recognizer,
     RecognizerResult,
@@ -9,8 +10,91 @@ from botbuilder.core import (
     BotTelemetryClient,
     NullTelemetryClient,
 )
+from botbuilder.schema import ActivityTypes
 
 from config import DefaultConfig
+from helpers.metrics import RECOGNIZE_SECONDS
+from helpers.recognition_cache import RecognitionCache
+from helpers.single_flight import SingleFlight
+from luis_http_client import AsyncHttpClient
+from offline_recognizer import OfflineRecognizer
+
+
+class PooledLuisRecognizerV3(LuisRecognizerV3):
+    """LuisRecognizerV3 sending predictions through a shared, pooled client.
+
+    The SDK version opens a new aiohttp session (and TLS connection) per call.
+    """
+
+    def __init__(
+        self,
+        luis_application: LuisApplication,
+        luis_recognizer_options_v3: LuisRecognizerOptionsV3,
+        http_client: AsyncHttpClient,
+    ):
+        super().__init__(luis_application, luis_recognizer_options_v3)
+        self._http_client = http_client
+
+    async def predict(self, utterance: str) -> dict:
+        """Query LUIS for ``utterance``; needs no turn context."""
+        headers = {
+            "Ocp-Apim-Subscription-Key": self.luis_application.endpoint_key,
+            "Content-Type": "application/json",
+        }
+        return await self._http_client.request_json(
+            "POST", self._build_url(), json=self._build_request(utterance), headers=headers
+        )
+
+    async def from_prediction(self, turn_context: TurnContext, luis_result: dict) -> RecognizerResult:
+        """The turn's result for a LUIS prediction of its text, traced on that turn."""
+        utterance: str = turn_context.activity.text if turn_context.activity is not None else None
+
+        recognizer_result = RecognizerResult(
+            text=utterance,
+            intents=self._get_intents(luis_result["prediction"]),
+            entities=self._extract_entities_and_metadata(luis_result["prediction"]),
+        )
+
+        if self.luis_recognizer_options_v3.include_instance_data:
+            recognizer_result.entities.setdefault(self._metadata_key, {})
+
+        if "sentiment" in luis_result["prediction"]:
+            recognizer_result.properties["sentiment"] = self._get_sentiment(
+                luis_result["prediction"]
+            )
+
+        await self._emit_trace_info(
+            turn_context, luis_result, recognizer_result, self.luis_recognizer_options_v3
+        )
+
+        return recognizer_result
+
+    async def recognizer_internal(self, turn_context: TurnContext):
+        utterance: str = turn_context.activity.text if turn_context.activity is not None else None
+        return await self.from_prediction(turn_context, await self.predict(utterance))
+
+
+class PooledLuisRecognizer(LuisRecognizer):
+    def __init__(self, application: LuisApplication, http_client: AsyncHttpClient, **kwargs):
+        super().__init__(application, **kwargs)
+        self._http_client = http_client
+
+    def _build_recognizer(self, luis_prediction_options):
+        if isinstance(luis_prediction_options, LuisRecognizerOptionsV3):
+            return PooledLuisRecognizerV3(
+                self._application, luis_prediction_options, self._http_client
+            )
+        return super()._build_recognizer(luis_prediction_options)
+
+    async def predict(self, utterance: str) -> dict:
+        """LUIS prediction for ``utterance``, made without a turn context."""
+        return await self._build_recognizer(self._options).predict(utterance)
+
+    async def recognize_prediction(self, turn_context: TurnContext, luis_result: dict) -> RecognizerResult:
+        """What ``recognize`` returns, traces and logs for this turn, from a prediction of its text."""
+        recognizer_result = await self._build_recognizer(self._options).from_prediction(turn_context, luis_result)
+        self.on_recognizer_result(recognizer_result, turn_context)
+        return recognizer_result
 
 
 class FlightBookingRecognizer(Recognizer):
@@ -18,6 +102,16 @@ class FlightBookingRecognizer(Recognizer):
         self, configuration: DefaultConfig, telemetry_client: BotTelemetryClient = None
     ):
         self._recognizer = None
+        self._options = None
+        self._cache = None
+        self._in_flight = SingleFlight()
+        self._http_client = None
+
+        if configuration.RECOGNIZER == "offline":
+            self._recognizer = OfflineRecognizer.from_file(
+                configuration.OFFLINE_TRAIN_PATH, telemetry_client=telemetry_client
+            )
+            return
 
         luis_is_configured = (
             configuration.LUIS_APP_ID
@@ -36,9 +130,24 @@ class FlightBookingRecognizer(Recognizer):
 
             options = LuisRecognizerOptionsV3()
             options.telemetry_client = telemetry_client or NullTelemetryClient()
+            # Without an explicit version, predictions go to the production slot.
+            options.version = configuration.LUIS_APP_VERSION or None
+            self._options = options
+
+            self._http_client = AsyncHttpClient(configuration.LUIS_HTTP_OPTIONS)
+            self._recognizer = PooledLuisRecognizer(
+                luis_application, self._http_client, prediction_options=options
+            )
 
-            self._recognizer = LuisRecognizer(
-                luis_application, prediction_options=options
+            # Cache results per (app id, version or slot): a new LUIS_APP_VERSION
+            # never serves predictions of the previous one. LUIS responses do
+            # not say which version answered, so a version republished to the
+            # production slot is only seen once entries expire (LUIS_CACHE_TTL)
+            # or when app_version is set.
+            self._cache = RecognitionCache(
+                max_size=configuration.LUIS_CACHE_SIZE,
+                ttl=configuration.LUIS_CACHE_TTL,
+                version=(configuration.LUIS_APP_ID, options.version or options.slot),
             )
 
     @property
@@ -46,5 +155,51 @@ class FlightBookingRecognizer(Recognizer):
         # Returns true if luis is configured in the config.py and initialized.
         return self._recognizer is not None
 
+    async def close(self):
+        """Release pooled LUIS connections."""
+        if self._http_client is not None:
+            await self._http_client.close()
+
+    @property
+    def cache(self) -> RecognitionCache:
+        return self._cache
+
+    @property
+    def in_flight(self) -> SingleFlight:
+        return self._in_flight
+
+    @property
+    def app_version(self) -> str:
+        return self._options.version if self._options else None
+
+    @app_version.setter
+    def app_version(self, value: str):
+        """Point predictions at another LUIS version; cached predictions are dropped.
+
+        Does nothing without LUIS (offline recognizer, LUIS not configured).
+        """
+        if self._options is None:
+            return
+        self._options.version = value or None
+        app_id, _ = self._cache.version
+        self._cache.set_version((app_id, self._options.version or self._options.slot))
+
     async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
-        return await self._recognizer.recognize(turn_context)
+        with RECOGNIZE_SECONDS.time():
+            return await self._recognize(turn_context)
+
+    async def _recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        activity = turn_context.activity
+        if self._cache is None or activity.type != ActivityTypes.message or not (activity.text or "").strip():
+            return await self._recognizer.recognize(turn_context)
+
+        # The raw prediction is cached, not the result: each turn then builds,
+        # traces and logs its own result, hit or miss.
+        text = activity.text
+        luis_result = self._cache.get(text)
+        if luis_result is None:
+            # Conversations sending the same text concurrently share one LUIS call.
+            # It can outlive the turn that started it, so it runs without a turn context.
+            luis_result = await self._in_flight.do(self._cache.key(text), lambda: self._recognizer.predict(text))
+            self._cache.put(text, luis_result)
+        return await self._recognizer.recognize_prediction(turn_context, luis_result)
@@ -0,0 +1,153 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Inbound activity parsing without msrest's generic deserializer.
+
+``Activity().deserialize(body)`` walks msrest's type descriptions for
+every key, recursing through a ``Deserializer`` per nested model. The
+activities this bot receives (messages, conversation updates) only hold
+strings, accounts, entities, timestamps, free-form ``channelData`` /
+``value`` and empty lists: ``ActivityParser`` builds those directly from
+``Activity._attribute_map``, with the same result, and hands anything
+else (attachments, suggested actions, reactions...) to msrest.
+
+``loads`` uses orjson when it is installed.
+"""
+import json
+from typing import Callable, Dict, Tuple
+
+from botbuilder.schema import Activity, ChannelAccount, ConversationAccount, Entity
+from msrest.serialization import Deserializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: bytes) -> object:
+    """Decode a JSON request body; raises ValueError on invalid JSON."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class _Fallback(Exception):
+    """The body needs msrest's deserializer."""
+
+
+def _string(value):
+    if type(value) is not str:  # pylint: disable=unidiomatic-typecheck
+        # msrest would coerce it.
+        raise _Fallback()
+    return value
+
+
+def _boolean(value):
+    if type(value) is not bool:  # pylint: disable=unidiomatic-typecheck
+        raise _Fallback()
+    return value
+
+
+def _passthrough(value):
+    return value
+
+
+def _timestamp(value):
+    return Deserializer.deserialize_iso(_string(value))
+
+
+_SIMPLE = {"str": _string, "bool": _boolean, "object": _passthrough, "iso-8601": _timestamp}
+
+
+def _empty_list(value):
+    # Channels send "attachments": [] with every message.
+    if value != []:  # pylint: disable=use-implicit-booleaness-not-comparison
+        raise _Fallback()
+    return []
+
+
+def _model_fields(cls: type, builders: Dict[str, Callable]) -> Dict[str, Tuple[str, Callable]]:
+    """JSON key -> (attribute, builder) for the attributes of ``cls`` with a builder.
+
+    Other lists are only built when empty.
+    """
+    fields = {}
+    for name, description in cls._attribute_map.items():  # pylint: disable=protected-access
+        kind = description["type"]
+        if kind in builders:
+            fields[description["key"]] = (name, builders[kind])
+        elif kind.startswith("["):
+            fields[description["key"]] = (name, _empty_list)
+    return fields
+
+
+def _model_builder(cls: type, fields: Dict[str, Tuple[str, Callable]]) -> Callable:
+    """Builds ``cls`` from a dict; unknown keys go to ``additional_properties``, as msrest does."""
+    known = {description["key"] for description in cls._attribute_map.values()}  # pylint: disable=protected-access
+
+    def build(value):
+        if type(value) is not dict:  # pylint: disable=unidiomatic-typecheck
+            raise _Fallback()
+        attributes = {}
+        extra = {}
+        for key, item in value.items():
+            field = fields.get(key)
+            if field is not None:
+                attributes[field[0]] = None if item is None else field[1](item)
+            elif key in known:
+                raise _Fallback()
+            else:
+                extra[key] = item
+        model = cls(**attributes)
+        model.additional_properties = extra
+        return model
+
+    return build
+
+
+def _list_of(build: Callable) -> Callable:
+    def build_list(value):
+        if type(value) is not list:  # pylint: disable=unidiomatic-typecheck
+            raise _Fallback()
+        return [None if item is None else build(item) for item in value]
+
+    return build_list
+
+
+_channel_account = _model_builder(ChannelAccount, _model_fields(ChannelAccount, _SIMPLE))
+_conversation_account = _model_builder(ConversationAccount, _model_fields(ConversationAccount, _SIMPLE))
+_entity = _model_builder(Entity, _model_fields(Entity, _SIMPLE))
+
+_ACTIVITY_BUILDERS = dict(
+    _SIMPLE,
+    **{
+        "ChannelAccount": _channel_account,
+        "ConversationAccount": _conversation_account,
+        "[ChannelAccount]": _list_of(_channel_account),
+        "[Entity]": _list_of(_entity),
+        "[str]": _list_of(_string),
+    },
+)
+
+
+class ActivityParser:
+    """Builds ``Activity`` objects from request bodies, falling back to msrest."""
+
+    def __init__(self):
+        self._build = _model_builder(Activity, _model_fields(Activity, _ACTIVITY_BUILDERS))
+
+        self.fast = 0
+        self.fallback = 0
+
+    def parse(self, body: object) -> Activity:
+        try:
+            activity = self._build(body)
+        except _Fallback:
+            self.fallback += 1
+            return Activity().deserialize(body)
+        self.fast += 1
+        return activity
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"fast": self.fast, "fallback": self.fallback}
@@ -0,0 +1,220 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Admission control for turns: a concurrency limit with a bounded, prioritized wait queue.
+
+Without it every activity of a burst enters ``ADAPTER.process_activity`` at
+once, LUIS answers 429 and every conversation slows down together.
+``AdmissionController`` lets ``max_concurrent`` turns run, queues up to
+``max_queue`` more and turns the rest away at once with ``AdmissionRejected``
+(``messages()`` answers 503 with Retry-After). Conversations in the middle
+of a booking, as recorded by ``AdmissionPriorityMiddleware`` at the end of
+their previous turn, are let in before new ones and take the place of a
+new conversation's turn when the queue is full.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Iterator
+
+from botbuilder.core import BotState, Middleware, TurnContext
+from botbuilder.dialogs import DialogState
+
+from helpers.metrics import ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+NEW, IN_DIALOG = 0, 1
+PRIORITY_NAMES = {NEW: "new", IN_DIALOG: "in_dialog"}
+
+
+class AdmissionRejected(Exception):
+    """The turn was not admitted: the queue was full, or the wait too long."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Runs at most ``max_concurrent`` turns; the others wait, highest priority first.
+
+    A turn waits at most ``max_wait`` seconds. Waiting turns of the same
+    priority are admitted in arrival order; a freed slot is handed to the
+    next one directly, so a turn arriving meanwhile cannot take it.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int = 100,
+        max_wait: float = 5.0,
+        retry_after: int = 2,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.max_keys = max_keys
+        self._clock = clock
+
+        self._running = 0
+        self._waiting: Dict[int, Deque[asyncio.Future]] = {}
+        # Conversations with a priority above NEW, least recently set first.
+        self._priorities: "OrderedDict[str, int]" = OrderedDict()
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "displaced": 0, "timeout": 0}
+        self.max_waiting = 0
+        self.wait_time_max = 0.0
+
+    def priority(self, key: str) -> int:
+        return self._priorities.get(key, NEW)
+
+    def set_priority(self, key: str, priority: int):
+        if priority == NEW:
+            self._priorities.pop(key, None)
+            return
+        self._priorities[key] = priority
+        self._priorities.move_to_end(key)
+        if len(self._priorities) > self.max_keys:
+            self._priorities.popitem(last=False)
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    async def run(self, key: str, turn: Callable[[], Awaitable]):
+        """Runs ``turn`` once admitted; raises ``AdmissionRejected`` otherwise."""
+        priority = self.priority(key)
+        start = self._clock()
+        if self._running < self.max_concurrent and not self.waiting:
+            self._running += 1
+        else:
+            await self._wait(priority)
+        waited = self._clock() - start
+        self.admitted += 1
+        self.wait_time_max = max(self.wait_time_max, waited)
+        ADMISSION_WAIT_SECONDS.labels(PRIORITY_NAMES.get(priority, str(priority))).observe(waited)
+        try:
+            return await turn()
+        finally:
+            self._release()
+
+    async def _wait(self, priority: int):
+        if self.waiting >= self.max_queue and not self._displace(priority):
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_event_loop().create_future()
+        queue = self._waiting.setdefault(priority, deque())
+        queue.append(waiter)
+        self.queued += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        timer = asyncio.get_event_loop().call_later(self.max_wait, self._expire, priority, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # Handed a slot just before the request was cancelled (not
+                # displaced or expired: those never held one).
+                self._release()
+            else:
+                self._remove(priority, waiter)
+            raise
+        finally:
+            timer.cancel()
+
+    def _displace(self, priority: int) -> bool:
+        """Rejects the newest waiting turn of the lowest priority below ``priority``."""
+        for lower in sorted(self._waiting):
+            if lower >= priority:
+                break
+            queue = self._waiting[lower]
+            if queue:
+                waiter = queue.pop()
+                waiter.set_exception(self._reject("displaced"))
+                return True
+        return False
+
+    def _expire(self, priority: int, waiter: asyncio.Future):
+        if not waiter.done():
+            self._remove(priority, waiter)
+            waiter.set_exception(self._reject("timeout"))
+
+    def _remove(self, priority: int, waiter: asyncio.Future):
+        queue = self._waiting.get(priority)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+
+    def _release(self):
+        for priority in sorted(self._waiting, reverse=True):
+            queue = self._waiting[priority]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    # The slot changes hands: _running stays the same.
+                    waiter.set_result(None)
+                    return
+        self._running -= 1
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        ADMISSION_REJECTED.labels(reason).inc()
+        return AdmissionRejected(reason, self.retry_after)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "running": self._running,
+            "waiting": self.waiting,
+            "in_dialog_conversations": len(self._priorities),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "max_waiting": self.max_waiting,
+            "wait_time_max": self.wait_time_max,
+            **{f"rejected_{reason}": count for reason, count in self.rejected.items()},
+        }
+
+
+def active_dialogs(dialog_state: DialogState) -> Iterator[str]:
+    """Ids of the dialogs on the stack, including those of nested component dialogs."""
+    for instance in dialog_state.dialog_stack:
+        yield instance.id
+        inner = instance.state.get("dialogs") if isinstance(instance.state, dict) else None
+        if isinstance(inner, DialogState):
+            yield from active_dialogs(inner)
+
+
+class AdmissionPriorityMiddleware(Middleware):
+    """Records, after each turn, whether the conversation is in one of ``dialog_ids``.
+
+    The next turn of such a conversation gets the IN_DIALOG priority. The
+    dialog stack is read from the state already loaded for the turn.
+    """
+
+    def __init__(
+        self,
+        controller: AdmissionController,
+        conversation_state: BotState,
+        dialog_ids: Iterable[str],
+        property_name: str = "DialogState",
+    ):
+        self.controller = controller
+        self.conversation_state = conversation_state
+        self.dialog_ids = frozenset(dialog_ids)
+        self.property_name = property_name
+
+    async def on_turn(self, context: TurnContext, logic: Callable[[], Awaitable]):
+        await logic()
+
+        activity = context.activity
+        conversation_id = activity.conversation.id if activity.conversation else ""
+        state = self.conversation_state.get(context) or {}
+        dialog_state = state.get(self.property_name)
+        in_dialog = isinstance(dialog_state, DialogState) and not self.dialog_ids.isdisjoint(
+            active_dialogs(dialog_state)
+        )
+        self.controller.set_priority(f"{activity.channel_id}/{conversation_id}", IN_DIALOG if in_dialog else NEW)
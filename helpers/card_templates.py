@@ -0,0 +1,102 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Adaptive card templates parsed once and rendered without re-reading them.
+
+Every string of a card holding ``${field}`` placeholders becomes a slot: the
+path of keys/indexes leading to it and the literal/field pieces of its
+value. Rendering copies the dicts and lists of the parsed card and writes
+each slot at its path, so no JSON parsing, regex or ``eval`` happens per
+card.
+"""
+import json
+import os
+import re
+from typing import Dict, List, Mapping, Tuple, Union
+
+CARDS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cards")
+
+_PLACEHOLDER_RE = re.compile(r"\$\{(\w+)\}")
+
+# Literal text and field names alternate, starting with literal text.
+_Pieces = Tuple[str, ...]
+_Path = Tuple[Union[str, int], ...]
+
+
+def _copy(node):
+    if isinstance(node, dict):
+        return {key: _copy(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_copy(value) for value in node]
+    return node
+
+
+class CardTemplate:
+    """One card with its ``${field}`` slots compiled."""
+
+    def __init__(self, card: dict):
+        self.card = card
+        self.slots: List[Tuple[_Path, _Pieces]] = []
+        self._compile(card, ())
+        self.fields = frozenset(
+            field for _, pieces in self.slots for field in pieces[1::2]
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "CardTemplate":
+        with open(path, encoding="utf-8") as card_file:
+            return cls(json.load(card_file))
+
+    def _compile(self, node, path: _Path):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                self._compile(value, path + (key,))
+        elif isinstance(node, list):
+            for index, value in enumerate(node):
+                self._compile(value, path + (index,))
+        elif isinstance(node, str) and "${" in node:
+            pieces = tuple(_PLACEHOLDER_RE.split(node))
+            if len(pieces) > 1:
+                self.slots.append((path, pieces))
+
+    def render(self, data: Mapping[str, object]) -> dict:
+        """A new card with the fields of ``data`` filled in ("" when missing)."""
+        card = _copy(self.card)
+        for path, pieces in self.slots:
+            parent = card
+            for step in path[:-1]:
+                parent = parent[step]
+            if len(pieces) == 3 and not pieces[0] and not pieces[2]:
+                value = str(data.get(pieces[1], ""))
+            else:
+                value = "".join(
+                    piece if index % 2 == 0 else str(data.get(piece, ""))
+                    for index, piece in enumerate(pieces)
+                )
+            parent[path[-1]] = value
+        return card
+
+
+class CardTemplates:
+    """All ``*.json`` cards of a directory, by file name without extension."""
+
+    def __init__(self, templates: Dict[str, CardTemplate]):
+        self.templates = templates
+
+    @classmethod
+    def from_directory(cls, directory: str = CARDS_DIR) -> "CardTemplates":
+        return cls(
+            {
+                os.path.splitext(name)[0]: CardTemplate.from_file(os.path.join(directory, name))
+                for name in sorted(os.listdir(directory))
+                if name.endswith(".json")
+            }
+        )
+
+    def __getitem__(self, name: str) -> CardTemplate:
+        return self.templates[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.templates
+
+    def render(self, name: str, data: Mapping[str, object]) -> dict:
+        return self.templates[name].render(data)
@@ -0,0 +1,163 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""DateTimePrompt recognition off the event loop.
+
+``recognize_datetime`` is pure-Python regex work: a few milliseconds per
+utterance (hundreds for the first one, which builds the models), during
+which no other conversation is served. ``DateRecognizer`` runs it, with
+the Timex check of ``DateResolverDialog.datetime_prompt_validator``, in a
+pool of processes that are warmed up at startup. Each process keeps its
+own cache of results; results holding a time of day are not cached, as
+they depend on when they were asked.
+
+With ``processes=0`` recognition stays on the loop, cached the same way.
+"""
+import asyncio
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Dict, List, Tuple
+
+from botbuilder.core import TurnContext
+from botbuilder.dialogs.prompts import DateTimePrompt, PromptOptions, PromptRecognizerResult
+from botbuilder.schema import ActivityTypes
+from datatypes_date_time.timex import Timex
+from recognizers_date_time import recognize_datetime
+
+from helpers.metrics import DATE_RECOGNIZE_SECONDS
+
+DEFAULT_CULTURE = "English"
+
+# (utterance, culture, day) -> (resolution values, definite); per process.
+_CACHE: "OrderedDict[Tuple[str, str, str], Tuple[List[Dict[str, str]], bool]]" = OrderedDict()
+_CACHE_SIZE = 2048
+
+
+def is_definite(timex: str) -> bool:
+    return "definite" in Timex(timex.split("T")[0]).types
+
+
+def recognize(utterance: str, culture: str) -> Tuple[List[Dict[str, str]], bool]:
+    """Resolution values of the first date in ``utterance``, and whether the
+    first of them is a definite date."""
+    key = (utterance, culture, date.today().isoformat())
+    cached = _CACHE.get(key)
+    if cached is not None:
+        _CACHE.move_to_end(key)
+        return cached
+
+    results = recognize_datetime(utterance, culture)
+    values = results[0].resolution["values"] if results else []
+    definite = bool(values) and is_definite(values[0]["timex"])
+
+    if not any("T" in value.get("timex", "") for value in values):
+        _CACHE[key] = (values, definite)
+        if len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return values, definite
+
+
+def warm_up():
+    # Builds the English models, the slow part of the first recognition.
+    recognize("June 5th 2021", DEFAULT_CULTURE)
+
+
+class DateRecognizer:
+    """Runs ``recognize`` in ``processes`` warm worker processes (0 = inline)."""
+
+    def __init__(self, processes: int = 0):
+        self.processes = processes
+        self._pool: ProcessPoolExecutor = None
+
+        self.calls = 0
+        self.offloaded = 0
+        self.pool_failures = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # Not forked: the bot process has threads (executor, telemetry) by then.
+        return ProcessPoolExecutor(
+            self.processes, mp_context=multiprocessing.get_context("spawn"), initializer=warm_up
+        )
+
+    async def start(self):
+        """Start the processes and wait until each has built its models."""
+        if not self.processes:
+            return
+        self._pool = self._new_pool()
+        loop = asyncio.get_event_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._pool, os.getpid) for _ in range(self.processes)])
+
+    async def recognize(self, utterance: str, culture: str = DEFAULT_CULTURE) -> Tuple[List[Dict[str, str]], bool]:
+        self.calls += 1
+        with DATE_RECOGNIZE_SECONDS.time():
+            if self._pool is None:
+                return recognize(utterance, culture)
+            try:
+                values, definite = await asyncio.get_event_loop().run_in_executor(
+                    self._pool, recognize, utterance, culture
+                )
+                self.offloaded += 1
+                return values, definite
+            except BrokenProcessPool:
+                # A worker died: answer inline this once and replace the pool.
+                self.pool_failures += 1
+                self._pool = self._new_pool()
+                return recognize(utterance, culture)
+
+    async def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_event_loop().run_in_executor(None, pool.shutdown)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "processes": self.processes,
+            "calls": self.calls,
+            "offloaded": self.offloaded,
+            "pool_failures": self.pool_failures,
+            "cache_size": len(_CACHE),
+        }
+
+
+class DateRecognizerResult(PromptRecognizerResult):
+    def __init__(self, succeeded: bool = False, value: object = None, definite: bool = False):
+        super().__init__(succeeded, value)
+        # Computed next to the recognition, for datetime_prompt_validator.
+        self.definite = definite
+
+
+class OffloadedDateTimePrompt(DateTimePrompt):
+    """DateTimePrompt whose recognition runs through a ``DateRecognizer``."""
+
+    def __init__(
+        self,
+        dialog_id: str,
+        validator: object = None,
+        default_locale: str = None,
+        date_recognizer: DateRecognizer = None,
+    ):
+        super().__init__(dialog_id, validator, default_locale)
+        self.date_recognizer = date_recognizer or DateRecognizer()
+
+    async def on_recognize(
+        self,
+        turn_context: TurnContext,
+        state: Dict[str, object],
+        options: PromptOptions,
+    ) -> PromptRecognizerResult:
+        if not turn_context:
+            raise TypeError("DateTimePrompt.on_recognize(): turn_context cannot be None.")
+
+        result = DateRecognizerResult()
+        if turn_context.activity.type == ActivityTypes.message and turn_context.activity.text:
+            culture = turn_context.activity.locale if turn_context.activity.locale is not None else DEFAULT_CULTURE
+            values, definite = await self.date_recognizer.recognize(turn_context.activity.text, culture)
+            if values:
+                result.succeeded = True
+                result.value = [self.read_resolution(value) for value in values]
+                result.definite = definite
+        return result
@@ -0,0 +1,123 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Local intent rules tried before LUIS.
+
+Rules are read from a JSON file mapping an intent to exact ``phrases``
+and regex ``patterns``, both matched against the lower-cased message
+without punctuation:
+
+    {"None": {"phrases": ["hi", "thanks"], "patterns": ["^he+y+$"]},
+     "ReserverVoyage": {"phrases": ["book a flight"], "patterns": []}}
+
+A booking rule skips LUIS's entity extraction, so it should only match
+messages that carry no city, date or budget. Messages no rule matches,
+or that rules of two intents match, go to LUIS.
+"""
+import json
+import re
+from typing import Dict, Optional
+
+from botbuilder.core import TurnContext
+
+from booking_details import BookingDetails
+from helpers.luis_helper import Intent, LuisHelper
+from helpers.metrics import INTENTS
+from helpers.recognition_cache import normalize_text
+
+MODES = ("off", "shadow", "on")
+
+# Punctuation carries no intent here ("Hello, there!" is "hello there").
+_PUNCTUATION_RE = re.compile(r"[^\w\s']+")
+
+
+class FastPathRouter:
+    """``on`` answers matched messages locally; ``shadow`` still asks LUIS
+    and counts how often the rules agree with it."""
+
+    def __init__(self, rules: Dict[str, dict], mode: str = "on"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown fast path mode: {mode}")
+        self.mode = mode
+
+        self._phrases: Dict[str, str] = {}
+        self._patterns = []
+        for intent, rule in rules.items():
+            for phrase in rule.get("phrases", []):
+                self._phrases[self.normalize(phrase)] = intent
+            if rule.get("patterns"):
+                # One alternation per intent: a single regex run per message.
+                pattern = "|".join(f"(?:{p})" for p in rule["patterns"])
+                self._patterns.append((intent, re.compile(pattern)))
+
+        self.messages = 0
+        self.matched = 0
+        self.ambiguous = 0
+        self.bypassed = 0
+        self.shadow_compared = 0
+        self.shadow_agreed = 0
+        self.disagreements: Dict[str, int] = {}
+
+    @classmethod
+    def from_file(cls, path: str, mode: str = "on") -> "FastPathRouter":
+        with open(path, encoding="utf-8") as rules_file:
+            return cls(json.load(rules_file), mode)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return normalize_text(_PUNCTUATION_RE.sub(" ", text or ""))
+
+    def classify(self, text: str) -> Optional[str]:
+        """Intent the rules are sure of, or None."""
+        text = self.normalize(text)
+        if not text:
+            return None
+
+        intent = self._phrases.get(text)
+        if intent is not None:
+            return intent
+
+        matches = {intent for intent, pattern in self._patterns if pattern.search(text)}
+        if len(matches) > 1:
+            self.ambiguous += 1
+            return None
+        return matches.pop() if matches else None
+
+    async def execute_luis_query(self, luis_recognizer, turn_context: TurnContext) -> (str, object):
+        """Same contract as ``LuisHelper.execute_luis_query``."""
+        if self.mode == "off":
+            return await LuisHelper.execute_luis_query(luis_recognizer, turn_context)
+
+        self.messages += 1
+        local = self.classify(turn_context.activity.text)
+        if local is not None:
+            self.matched += 1
+            if self.mode == "on":
+                self.bypassed += 1
+                INTENTS.labels(local).inc()
+                if local == Intent.BOOK_FLIGHT.value:
+                    return local, BookingDetails()
+                return local, None
+
+        intent, result = await LuisHelper.execute_luis_query(luis_recognizer, turn_context)
+        if local is not None:
+            self.shadow_compared += 1
+            if local == intent:
+                self.shadow_agreed += 1
+            else:
+                key = f"{local}->{intent}"
+                self.disagreements[key] = self.disagreements.get(key, 0) + 1
+        return intent, result
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        return {
+            "messages": self.messages,
+            "matched": self.matched,
+            "ambiguous": self.ambiguous,
+            "bypassed": self.bypassed,
+            "bypass_rate": self.bypassed / self.messages if self.messages else 0.0,
+            "shadow_compared": self.shadow_compared,
+            "shadow_agreed": self.shadow_agreed,
+            "agreement": self.shadow_agreed / self.shadow_compared if self.shadow_compared else 0.0,
+            "disagreements": dict(self.disagreements),
+        }
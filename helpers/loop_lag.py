@@ -0,0 +1,51 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Measure how long the event loop is blocked.
+
+A task sleeps ``interval`` seconds at a time; whatever it wakes up later
+than asked is time during which the loop was busy running something else
+(regex parsing, JSON, a slow callback) and every other conversation waited.
+"""
+import asyncio
+from typing import Dict
+
+from helpers.metrics import LOOP_LAG_SECONDS, Histogram
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5, histogram: Histogram = LOOP_LAG_SECONDS):
+        self.interval = interval
+        self.histogram = histogram
+        self._task: asyncio.Task = None
+
+        self.samples = 0
+        self.last = 0.0
+        self.max = 0.0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.histogram.observe(lag)
+            self.samples += 1
+            self.last = lag
+            self.max = max(self.max, lag)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {"samples": self.samples, "last": self.last, "max": self.max}
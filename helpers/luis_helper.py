@@ -1,7 +1,8 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 from enum import Enum
-from typing import DefaultDict, Dict, Tuple
+from functools import lru_cache
+from typing import Callable, DefaultDict, Dict, List, NamedTuple, Optional, Tuple
 from datetime import datetime, timedelta
 
 from dateutil.relativedelta import relativedelta
@@ -11,6 +12,7 @@ from botbuilder.core import IntentScore, TopIntent, TurnContext
 from datatypes_date_time import Timex
 
 from booking_details import BookingDetails
+from helpers.metrics import INTENTS
 
 
 class Intent(Enum):
@@ -53,6 +55,7 @@ class LuisHelper:
                 if recognizer_result.intents
                 else None
             )
+            INTENTS.labels(intent or Intent.NONE_INTENT.value).inc()
            
             if intent == Intent.BOOK_FLIGHT.value:
                 result = BookingDetails()
@@ -88,123 +91,86 @@ class LuisHelper:
         return intent, result
 
     @staticmethod
-    def extract_datetimes(datetimes: list) -> Tuple[str, str]:
-        """"""
-        from_date, to_date = "", ""
-        now = datetime.now()
-        dt_format = "%d-%m-%Y"
+    def extract_datetimes(datetimes: list, now: datetime = None) -> Tuple[str, str]:
+        """(from_date, to_date) as dd-mm-YYYY for the datetime entities of one utterance.
 
-        if len(datetimes) == 1:
-            if datetimes[0]["type"] == "daterange":
-                timex = Timex(datetimes[0]["timex"][0])
-
-
-                from_date = datetime(
-                    timex.year if timex.year else now.year,
-                    timex.month if timex.month else now.month,
-                    timex.day_of_month if timex.day_of_month else now.day
-                )
-
-                to_date = from_date + relativedelta(
-                    years=int(timex.years) if timex.years else 0,
-                    months=int(timex.months) if timex.months else 0,
-                    weeks=int(timex.weeks) if timex.weeks else 0,
-                    days=int(timex.days) if timex.days else 0,
-                    hours=int(timex.hours) if timex.hours else 0,
-                    minutes=int(timex.minutes) if timex.minutes else 0,
-                    seconds=int(timex.seconds) if timex.seconds else 0
-                )
-
-                from_date = from_date.strftime(dt_format)
-                to_date = to_date.strftime(dt_format)
-
-            elif datetimes[0]["type"] == "duration":
-                timex = Timex(datetimes[0]["timex"][0])
-                from_date = now
-
-                to_date = from_date + relativedelta(
-                    years=int(timex.years) if timex.years else 0,
-                    months=int(timex.months) if timex.months else 0,
-                    weeks=int(timex.weeks) if timex.weeks else 0,
-                    days=int(timex.days) if timex.days else 0,
-                    hours=int(timex.hours) if timex.hours else 0,
-                    minutes=int(timex.minutes) if timex.minutes else 0,
-                    seconds=int(timex.seconds) if timex.seconds else 0
-                )
-
-                from_date = from_date.strftime(dt_format)
-                to_date = to_date.strftime(dt_format)
+        Combinations without a resolver in ``_RANGE_RESOLVERS`` give ("", "").
+        """
+        resolver = _RANGE_RESOLVERS.get(tuple(entity["type"] for entity in datetimes))
+        if resolver is None:
+            return "", ""
+        parsed = [_parse_timex(entity["timex"][0]) for entity in datetimes]
+        from_date, to_date = resolver(parsed, now or datetime.now())
+        return from_date.strftime(DATE_FORMAT), to_date.strftime(DATE_FORMAT)
 
-        elif len(datetimes) == 2:
-            if (datetimes[0]["type"] == "date") and (datetimes[1]["type"] == "date"):
-                timex = Timex(datetimes[0]["timex"][0])
+    @staticmethod
+    def extract_datetimes_batch(column, now: datetime = None):
+        """``extract_datetimes`` over many utterances, e.g. a DataFrame column.
 
-                dt0 = datetime(
-                    timex.year if timex.year else now.year,
-                    timex.month if timex.month else now.month,
-                    timex.day_of_month if timex.day_of_month else now.day
+        Each distinct combination of entities is resolved once, all against
+        the same ``now``; empty cells give ("", ""). A pandas Series gives a
+        DataFrame with ``from_date``/``to_date`` columns on the same index,
+        anything else a list of tuples.
+        """
+        now = now or datetime.now()
+        keys = [_entities_key(datetimes) for datetimes in column]
+        resolved = {}
+        for key in set(keys):
+            try:
+                resolved[key] = LuisHelper.extract_datetimes(
+                    [{"type": kind, "timex": [timex]} for kind, timex in key], now
                 )
+            except ValueError:
+                # Not a valid day of the month (e.g. 31 in a 30-day month).
+                resolved[key] = ("", "")
+        dates = [resolved[key] for key in keys]
 
-                timex = Timex(datetimes[1]["timex"][0])
-
-                dt1 = datetime(
-                    timex.year if timex.year else now.year,
-                    timex.month if timex.month else now.month,
-                    timex.day_of_month if timex.day_of_month else now.day
-                )
+        if type(column).__module__.startswith("pandas"):
+            import pandas as pd  # pylint: disable=import-outside-toplevel
 
-                from_date = min(dt0, dt1)
-                to_date = max(dt0, dt1)
+            return pd.DataFrame(dates, index=column.index, columns=["from_date", "to_date"])
+        return dates
 
-                from_date = from_date.strftime(dt_format)
-                to_date = to_date.strftime(dt_format)
 
-            elif (datetimes[0]["type"] == "date") and (datetimes[1]["type"] == "duration"):
-                timex = Timex(datetimes[0]["timex"][0])
+DATE_FORMAT = "%d-%m-%Y"
 
-                from_date = datetime(
-                    timex.year if timex.year else now.year,
-                    timex.month if timex.month else now.month,
-                    timex.day_of_month if timex.day_of_month else now.day
-                )
+_DURATION_UNITS = ("years", "months", "weeks", "days", "hours", "minutes", "seconds")
 
-                timex = Timex(datetimes[1]["timex"][0])
 
-                to_date = from_date + relativedelta(
-                    years=int(timex.years) if timex.years else 0,
-                    months=int(timex.months) if timex.months else 0,
-                    weeks=int(timex.weeks) if timex.weeks else 0,
-                    days=int(timex.days) if timex.days else 0,
-                    hours=int(timex.hours) if timex.hours else 0,
-                    minutes=int(timex.minutes) if timex.minutes else 0,
-                    seconds=int(timex.seconds) if timex.seconds else 0
-                )
+class _ParsedTimex(NamedTuple):
+    year: Optional[int]
+    month: Optional[int]
+    day: Optional[int]
+    duration: relativedelta
 
-                from_date = from_date.strftime(dt_format)
-                to_date = to_date.strftime(dt_format)
+    def date(self, now: datetime) -> datetime:
+        return datetime(self.year or now.year, self.month or now.month, self.day or now.day)
 
-            elif (datetimes[0]["type"] == "duration") and (datetimes[1]["type"] == "date"):
-                timex = Timex(datetimes[1]["timex"][0])
 
-                from_date = datetime(
-                    timex.year if timex.year else now.year,
-                    timex.month if timex.month else now.month,
-                    timex.day_of_month if timex.day_of_month else now.day
-                )
+@lru_cache(maxsize=4096)
+def _parse_timex(timex: str) -> _ParsedTimex:
+    """Components of a timex string; ``now`` is applied by the caller, so
+    results stay valid across days."""
+    parsed = Timex(timex)
+    return _ParsedTimex(
+        parsed.year,
+        parsed.month,
+        parsed.day_of_month,
+        relativedelta(**{unit: int(getattr(parsed, unit)) for unit in _DURATION_UNITS if getattr(parsed, unit)}),
+    )
 
-                timex = Timex(datetimes[0]["timex"][0])
 
-                to_date = from_date + relativedelta(
-                    years=int(timex.years) if timex.years else 0,
-                    months=int(timex.months) if timex.months else 0,
-                    weeks=int(timex.weeks) if timex.weeks else 0,
-                    days=int(timex.days) if timex.days else 0,
-                    hours=int(timex.hours) if timex.hours else 0,
-                    minutes=int(timex.minutes) if timex.minutes else 0,
-                    seconds=int(timex.seconds) if timex.seconds else 0
-                )
+def _entities_key(datetimes) -> Tuple[Tuple[str, str], ...]:
+    if not isinstance(datetimes, list):  # None, or NaN in a DataFrame.
+        return ()
+    return tuple((entity["type"], entity["timex"][0]) for entity in datetimes)
 
-                from_date = from_date.strftime(dt_format)
-                to_date = to_date.strftime(dt_format)
 
-        return from_date, to_date
+# Entity types of an utterance -> (parsed timexes, now) -> (from, to).
+_RANGE_RESOLVERS: Dict[Tuple[str, ...], Callable[[List[_ParsedTimex], datetime], Tuple[datetime, datetime]]] = {
+    ("daterange",): lambda p, now: (p[0].date(now), p[0].date(now) + p[0].duration),
+    ("duration",): lambda p, now: (now, now + p[0].duration),
+    ("date", "date"): lambda p, now: tuple(sorted((p[0].date(now), p[1].date(now)))),
+    ("date", "duration"): lambda p, now: (p[0].date(now), p[0].date(now) + p[1].duration),
+    ("duration", "date"): lambda p, now: (p[1].date(now), p[1].date(now) + p[0].duration),
+}
@@ -0,0 +1,248 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""In-process counters and histograms rendered in the Prometheus text format.
+
+Everything runs on the event loop thread, so recording is a couple of
+integer updates without locks. The bot's metrics are defined at the bottom
+of this module and exposed by ``/metrics`` in ``app.py``.
+"""
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; a LUIS round trip is typically 50-500 ms.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        # Per-bucket (not cumulative) counts; the last one is +Inf.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_buckets", "_start")
+
+    def __init__(self, buckets: _Buckets):
+        self._buckets = buckets
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._buckets.observe(time.perf_counter() - self._start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(child.sum)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._stats: List[Tuple[str, str, Callable[[], Dict[str, object]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, name: str, documentation: str, stats: Callable[[], Dict[str, object]]):
+        """Export a component's ``stats`` dict as a gauge labelled by key.
+
+        Read at scrape time; non-numeric values are skipped.
+        """
+        self._stats.append((name, documentation, stats))
+
+    def render(self) -> str:
+        blocks = [metric.render() for metric in self._metrics]
+        for name, documentation, stats in self._stats:
+            lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'{name}{{stat="{_escape(key)}"}} {_number(value)}')
+            blocks.append("\n".join(lines))
+        return "\n".join(blocks) + "\n"
+
+
+REGISTRY = Registry()
+
+TURN_SECONDS = REGISTRY.register(Histogram("bot_turn_seconds", "Time spent in messages() per activity."))
+TURNS_IN_FLIGHT = REGISTRY.register(Gauge("bot_turns_in_flight", "Activities being processed."))
+TURN_ERRORS = REGISTRY.register(
+    Counter("bot_turn_errors_total", "Turns that reached AdapterWithErrorHandler.on_error.", ["error"])
+)
+RECOGNIZE_SECONDS = REGISTRY.register(
+    Histogram("bot_recognize_seconds", "FlightBookingRecognizer.recognize latency (cache hits included).")
+)
+INTENTS = REGISTRY.register(Counter("bot_intents_total", "Top intent of each recognized utterance.", ["intent"]))
+STATE_SECONDS = REGISTRY.register(
+    Histogram("bot_state_seconds", "Conversation/user state load and save time per turn.", ["operation"])
+)
+STEP_SECONDS = REGISTRY.register(
+    Histogram("bot_waterfall_step_seconds", "Time spent in each waterfall step.", ["dialog", "step"])
+)
+DATE_RECOGNIZE_SECONDS = REGISTRY.register(
+    Histogram("bot_date_recognize_seconds", "DateTimePrompt recognition latency, as awaited by the turn.")
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_admission_wait_seconds",
+        "Time a turn waited for an admission slot (helpers/admission.py), by priority.",
+        ["priority"],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+    )
+)
+ADMISSION_REJECTED = REGISTRY.register(
+    Counter("bot_admission_rejected_total", "Turns turned away with 503 by admission control.", ["reason"])
+)
+LOOP_LAG_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_event_loop_lag_seconds",
+        "How late the event loop ran a timer: time other coroutines could not run.",
+        buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    )
+)
+
+
+def timed_step(dialog: str, step: Callable) -> Callable:
+    """Wrap a waterfall step so its duration is recorded in STEP_SECONDS.
+
+    ``functools.wraps`` keeps the step's ``__qualname__``, which
+    ``WaterfallDialog`` uses as the step name in its own telemetry.
+    """
+    buckets = STEP_SECONDS.labels(dialog, step.__name__)
+
+    @wraps(step)
+    async def timed(step_context):
+        with buckets.time():
+            return await step(step_context)
+
+    return timed
@@ -0,0 +1,159 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Opt-in profiling of the next turns, armed at runtime.
+
+``TurnProfiler.arm`` selects the next N turns (optionally of one
+conversation). Each selected turn runs under either ``cProfile`` (written
+as ``.pstats``, for ``python -m pstats`` or snakeviz) or a stack sampler
+(written as ``.folded``, one ``frame;frame;... count`` line per stack, for
+flamegraph.pl or speedscope). Nothing is installed until a turn is
+selected, so a disarmed profiler costs one attribute check per turn.
+
+Profilers see the whole thread: work of other conversations interleaved
+with the profiled turn shows up too.
+"""
+import asyncio
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict
+
+MODES = ("cprofile", "sample")
+
+
+class _StackSampler:
+    """Samples the stack of one thread from a background thread."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="turn-profiler", daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)  # pylint: disable=protected-access
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as folded:
+            for stack, count in self.stacks.most_common():
+                folded.write(f"{stack} {count}\n")
+
+
+class TurnProfiler:
+    def __init__(self, directory: str = "profiles", mode: str = "cprofile", interval: float = 0.001):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.interval = interval
+
+        self._remaining = 0
+        self._conversation_id: str = None
+        self._active = False
+
+        self.profiled = 0
+        self.skipped = 0
+        self.last_path: str = None
+
+    @property
+    def armed(self) -> bool:
+        return self._remaining > 0
+
+    def arm(self, turns: int = 1, conversation_id: str = None, mode: str = None):
+        """Profile the next ``turns`` turns, only of ``conversation_id`` if given."""
+        if mode is not None:
+            if mode not in MODES:
+                raise ValueError(f"Unknown profiling mode: {mode}")
+            self.mode = mode
+        self._remaining = turns
+        self._conversation_id = conversation_id or None
+
+    def disarm(self):
+        self._remaining = 0
+        self._conversation_id = None
+
+    def _selects(self, conversation_id: str) -> bool:
+        return self.armed and self._conversation_id in (None, conversation_id)
+
+    def wrap(self, conversation_id: str, turn: Callable[[], Awaitable], force: bool = False) -> Callable[[], Awaitable]:
+        """Return ``turn`` itself, or a version of it that is profiled."""
+        if not (force or self._selects(conversation_id)):
+            return turn
+        return lambda: self._profile(conversation_id, turn, force)
+
+    async def _profile(self, conversation_id: str, turn: Callable[[], Awaitable], force: bool):
+        if self._active:
+            # Profilers cannot nest: run this one as is, the next turn stays selected.
+            self.skipped += 1
+            return await turn()
+        if not force:
+            # Turns only count once profiled; another one may have used the last.
+            if not self._selects(conversation_id):
+                return await turn()
+            self._remaining -= 1
+            if not self._remaining:
+                self._conversation_id = None
+
+        self._active = True
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = _StackSampler(self.interval)
+            profiler.start()
+        try:
+            return await turn()
+        finally:
+            # The mode may have been re-armed while the turn ran.
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            self._active = False
+            self.profiled += 1
+            await asyncio.get_event_loop().run_in_executor(None, self._dump, profiler, conversation_id)
+
+    def _dump(self, profiler, conversation_id: str):
+        os.makedirs(self.directory, exist_ok=True)
+        name = "{}-{}-{}".format(
+            time.strftime("%Y%m%d-%H%M%S"),
+            "".join(c if c.isalnum() else "_" for c in (conversation_id or "none"))[:32],
+            self.profiled,
+        )
+        if isinstance(profiler, cProfile.Profile):
+            path = os.path.join(self.directory, name + ".pstats")
+            profiler.dump_stats(path)
+        else:
+            path = os.path.join(self.directory, name + ".folded")
+            profiler.dump(path)
+        self.last_path = path
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        return {
+            "armed": self._remaining,
+            "conversation_id": self._conversation_id,
+            "mode": self.mode,
+            "profiled": self.profiled,
+            "skipped": self.skipped,
+            "last_path": self.last_path,
+        }
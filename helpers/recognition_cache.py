@@ -0,0 +1,101 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bounded LRU + TTL cache for LUIS predictions."""
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold and collapse whitespace so trivial variants compare equal."""
+    return _WHITESPACE_RE.sub(" ", text or "").strip().casefold()
+
+
+class RecognitionCache:
+    """Least-recently-used cache whose entries also expire after ``ttl`` seconds.
+
+    Keys are scoped to a model ``version``; calling ``set_version`` with a new
+    value drops every entry recognized by the previous model. Texts are
+    matched exactly: a prediction carries its utterance (``query``, entity
+    offsets and substrings), so "Paris" cannot reuse the prediction of "paris".
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600,
+        version: Hashable = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[float, dict]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, text: str) -> Tuple[Hashable, str]:
+        return self.version, text
+
+    def get(self, text: str) -> dict:
+        key = self.key(text)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, prediction = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return prediction
+
+    def put(self, text: str, prediction: dict):
+        if self.max_size <= 0:
+            return
+
+        key = self.key(text)
+        self._entries[key] = (self._clock() + self.ttl, prediction)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set_version(self, version: Hashable):
+        """Switch to a new model version, invalidating all cached predictions."""
+        if version == self.version:
+            return
+        self.version = version
+        self.clear()
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,285 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Application Insights queue that never sends on the caller's turn.
+
+``SynchronousQueue`` posts to the ingestion endpoint from ``put`` as soon as
+``max_queue_length`` envelopes are queued, i.e. inside whichever turn tracked
+the last event. ``AsyncTelemetryQueue`` only appends to a bounded buffer;
+a background task sends batches when ``batch_size`` envelopes are waiting
+or every ``flush_interval`` seconds, and appends batches it could not
+deliver to a spool file that is replayed once the endpoint answers again.
+Workers started by the launcher share that file, so it is only appended to
+or taken under an exclusive ``flock`` on ``<spool>.lock``.
+"""
+import asyncio
+import json
+import os
+import sys
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+from applicationinsights.channel import QueueBase
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process owns the spool.
+    fcntl = None
+
+DEFAULT_ENDPOINT = "https://dc.services.visualstudio.com/v2/track"
+
+
+def _is_important(envelope) -> bool:
+    """Exceptions and traces (e.g. the booking "YES answer"/"NO answer") are
+    kept under pressure."""
+    return envelope.name.endswith((".Exception", ".Message"))
+
+
+class AsyncTelemetryQueue(QueueBase):
+    """Bounded ring buffer of envelopes flushed by a background task.
+
+    Once the buffer is more than ``sample_above`` full, only one in
+    ``pressure_sample_rate`` ordinary envelopes is kept (``sampled_out``);
+    when it is full the oldest envelope is dropped (``dropped``). Spooled
+    batches are one JSON array per line, up to ``max_spool_bytes``.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = DEFAULT_ENDPOINT,
+        capacity: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 5,
+        spool_path: str = None,
+        max_spool_bytes: int = 50 * 2 ** 20,
+        sample_above: float = 0.5,
+        pressure_sample_rate: int = 10,
+        timeout: float = 10,
+    ):
+        super().__init__(None)
+        if aiohttp is None:
+            raise ImportError("AsyncTelemetryQueue requires aiohttp")
+
+        self.endpoint = endpoint
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.max_spool_bytes = max_spool_bytes
+        self.sample_above = sample_above
+        self.pressure_sample_rate = pressure_sample_rate
+        self.timeout = timeout
+
+        self._buffer = deque()
+        self._seen_under_pressure = 0
+        self._session: "aiohttp.ClientSession" = None
+        self._flusher: asyncio.Task = None
+        self._wakeup: asyncio.Event = None
+        self._flush_all = False
+        self._sending: asyncio.Lock = None
+
+        self.queued = 0
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.spooled = 0
+        self.spool_dropped = 0
+        self.replayed = 0
+
+    def put(self, item):
+        if not item:
+            return
+
+        if len(self._buffer) >= self.capacity * self.sample_above and not _is_important(item):
+            self._seen_under_pressure += 1
+            if self._seen_under_pressure % self.pressure_sample_rate:
+                self.sampled_out += 1
+                return
+        if len(self._buffer) >= self.capacity:
+            self._buffer.popleft()
+            self.dropped += 1
+
+        self._buffer.append(item)
+        self.queued += 1
+        self._schedule_flush(len(self._buffer) >= self.batch_size)
+
+    def get(self):
+        return self._buffer.popleft() if self._buffer else None
+
+    def flush(self):
+        """Ask the background task to send everything now; returns immediately."""
+        self._flush_all = True
+        self._schedule_flush(True)
+
+    def _schedule_flush(self, now: bool):
+        try:
+            asyncio.get_event_loop()
+        except RuntimeError:  # No loop in this thread (e.g. a worker thread).
+            return
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+        if now:
+            self._wakeup.set()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                # Woken by a full batch: the remainder waits for the interval.
+                everything, self._flush_all = self._flush_all, False
+            except asyncio.TimeoutError:
+                everything = True
+            self._wakeup.clear()
+            try:
+                await self.send_pending(everything)
+            except Exception:  # pylint: disable=broad-except
+                # Telemetry must not take the bot down; keep the loop alive.
+                print("\n [AsyncTelemetryQueue] flush failed", file=sys.stderr)
+                traceback.print_exc()
+
+    def _take_batch(self) -> List[object]:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    async def send_pending(self, everything: bool = True):
+        """Send buffered batches (only full ones unless ``everything``), then
+        replay the spool if sending works."""
+        if self._sending is None:
+            self._sending = asyncio.Lock()
+        async with self._sending:
+            await self._send_pending(everything)
+
+    async def _send_pending(self, everything: bool):
+        delivered = True
+        while self._buffer and (everything or len(self._buffer) >= self.batch_size):
+            batch = self._take_batch()
+            payload = json.dumps([envelope.write() for envelope in batch])
+            if await self._post(payload):
+                self.sent += len(batch)
+                continue
+            delivered = False
+            await self._run(self._spool, [payload])
+
+        if delivered and self.spool_path and os.path.exists(self.spool_path):
+            await self._replay()
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _post(self, payload: str) -> bool:
+        """True when the batch needs no retry (accepted or rejected as invalid)."""
+        self.batches += 1
+        try:
+            async with self.session.post(
+                self.endpoint,
+                data=payload.encode("utf-8"),
+                headers={"Accept": "application/json", "Content-Type": "application/json; charset=utf-8"},
+            ) as response:
+                await response.read()
+                # 400 means the payload itself is invalid, as SenderBase treats it.
+                if 200 <= response.status < 300 or response.status == 400:
+                    return True
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        self.failures += 1
+        return False
+
+    async def _run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    @contextmanager
+    def _spool_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.spool_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _spool(self, payloads: List[str], count: bool = True):
+        """Append ``payloads``; ``count`` is False when putting back replayed
+        batches, which may have been spooled by another worker."""
+        if not self.spool_path:
+            self.spool_dropped += len(payloads)
+            return
+        with self._spool_lock():
+            size = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+            with open(self.spool_path, "a", encoding="utf-8") as spool:
+                for payload in payloads:
+                    if size + len(payload) > self.max_spool_bytes:
+                        self.spool_dropped += 1
+                        continue
+                    spool.write(payload + "\n")
+                    size += len(payload) + 1
+                    if count:
+                        self.spooled += 1
+
+    def _take_spool(self) -> List[str]:
+        with self._spool_lock():
+            if not os.path.exists(self.spool_path):  # Taken by another worker.
+                return []
+            with open(self.spool_path, encoding="utf-8") as spool:
+                payloads = [line.rstrip("\n") for line in spool if line.strip()]
+            os.remove(self.spool_path)
+        return payloads
+
+    async def _replay(self):
+        # close() cancels the flusher, possibly mid-replay: whatever was taken
+        # from the spool and not delivered yet is put back.
+        take = asyncio.ensure_future(self._run(self._take_spool))
+        try:
+            payloads = await asyncio.shield(take)
+        except asyncio.CancelledError:
+            self._spool(await take, False)
+            raise
+        index = 0
+        try:
+            while index < len(payloads) and await self._post(payloads[index]):
+                index += 1
+                self.replayed += 1
+        except asyncio.CancelledError:
+            self._spool(payloads[index:], False)
+            raise
+        if index < len(payloads):
+            await self._run(self._spool, payloads[index:], False)
+
+    async def close(self):
+        """Send (or spool) what is buffered and stop the background task."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.send_pending()
+        if self._session is not None:
+            await self._session.close()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": len(self._buffer),
+            "queued": self.queued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "spooled": self.spooled,
+            "spool_dropped": self.spool_dropped,
+            "replayed": self.replayed,
+        }
@@ -0,0 +1,64 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Serialize turns per conversation while conversations run in parallel."""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict
+
+
+class _Queue:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class TurnQueue:
+    """Keyed table of FIFO locks, one per conversation with turns in flight.
+
+    A conversation's entry is created by its first pending turn and removed
+    when the last one finishes, so the table only holds active conversations.
+    """
+
+    def __init__(self):
+        self._queues: Dict[str, _Queue] = {}
+        self.turns = 0
+        self.waited = 0
+        self.max_depth = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    async def run(self, key: str, turn: Callable[[], Awaitable]):
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _Queue()
+
+        ahead = queue.depth
+        queue.depth += 1
+        self.max_depth = max(self.max_depth, queue.depth)
+        start = time.perf_counter()
+        try:
+            # asyncio.Lock wakes waiters in arrival order.
+            async with queue.lock:
+                waited = time.perf_counter() - start
+                self.turns += 1
+                if ahead:
+                    self.waited += 1
+                self.wait_time_total += waited
+                self.wait_time_max = max(self.wait_time_max, waited)
+                return await turn()
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0:
+                del self._queues[key]
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "conversations": len(self._queues),
+            "queued": sum(q.depth - 1 for q in self._queues.values() if q.depth > 1),
+            "turns": self.turns,
+            "waited": self.waited,
+            "max_depth": self.max_depth,
+            "wait_time_avg": self.wait_time_total / self.turns if self.turns else 0.0,
+            "wait_time_max": self.wait_time_max,
+        }
@@ -0,0 +1,388 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Run several ``app:init_func`` workers behind a conversation-affine dispatcher.
+
+    python launcher.py --workers 4 --port 8000
+
+Each worker is the usual ``python -m aiohttp.web ... app:init_func`` process
+listening on a private port of 127.0.0.1. The dispatcher reads the activity,
+hashes its conversation id and forwards it to the worker owning that hash, so
+every turn of a conversation reaches the same process, whose ``TurnQueue``
+keeps them in order.
+
+Other paths are not tied to a conversation:
+
+- ``/ready`` is answered by the launcher: ready (200) once every worker is.
+- ``/admin/profile?conversation_id=...`` goes to the worker owning that
+  conversation, where the profiled turns will run.
+- anything else, ``/metrics`` included, goes to the worker given by the
+  ``worker`` query parameter (0 by default): scrape ``/metrics?worker=0``
+  to ``/metrics?worker=N-1`` as separate targets.
+
+Workers are recycled after ``--max-requests`` activities, or all of them on
+SIGHUP. The replacement is started first; the slot is then paused while the
+old worker drains and exits (flushing its storage), so a conversation never
+has turns in two processes at once. A recycled worker with STORAGE=memory
+loses its conversations: use ``--storage sqlite`` to share state between
+workers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import zlib
+from typing import Awaitable, Callable, Dict, List
+
+import aiohttp
+from aiohttp import web
+from multidict import CIMultiDict
+
+from config import DefaultConfig
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Headers that only apply to one connection (RFC 7230 6.1), never forwarded.
+HOP_BY_HOP_HEADERS = frozenset(
+    ("connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer", "transfer-encoding", "upgrade")
+)
+# Set again by aiohttp for the forwarded request and response (the worker's
+# body is read decompressed).
+NOT_FORWARDED_REQUEST = HOP_BY_HOP_HEADERS | {"host", "content-length"}
+NOT_FORWARDED_RESPONSE = HOP_BY_HOP_HEADERS | {"content-length", "content-encoding"}
+
+
+def _forwarded(headers, excluded: frozenset) -> CIMultiDict:
+    return CIMultiDict((name, value) for name, value in headers.items() if name.lower() not in excluded)
+
+
+ACTIVITY_PATH = "/api/messages"
+
+
+def conversation_key(body: bytes) -> str:
+    """Conversation id of an activity, or "" when the body is not one."""
+    try:
+        return json.loads(body)["conversation"]["id"] or ""
+    except (ValueError, KeyError, TypeError):
+        return ""
+
+
+def _free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class Worker:
+    """One ``app:init_func`` process on a private port."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1", env: Dict[str, str] = None):
+        self.host = host
+        self.port = port
+        self.env = env
+        self.process: asyncio.subprocess.Process = None
+        self.stopping = False
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @classmethod
+    async def spawn(cls, env: Dict[str, str] = None, host: str = "127.0.0.1", timeout: float = 60) -> "Worker":
+        worker = cls(_free_port(host), host, env)
+        await worker.start(timeout)
+        return worker
+
+    async def start(self, timeout: float = 60):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "aiohttp.web", "-H", self.host, "-P", str(self.port), "app:init_func",
+            cwd=ROOT, env=self.env,
+        )
+
+        # Importing app (dialogs, recognizer, storage) takes a while: wait for the port.
+        deadline = asyncio.get_event_loop().time() + timeout
+        while True:
+            if self.process.returncode is not None:
+                raise RuntimeError(f"Worker on port {self.port} exited with {self.process.returncode}")
+            try:
+                _, writer = await asyncio.open_connection(self.host, self.port)
+                writer.close()
+                return
+            except OSError:
+                if asyncio.get_event_loop().time() > deadline:
+                    await self.stop()
+                    raise RuntimeError(f"Worker on port {self.port} did not start in {timeout}s")
+                await asyncio.sleep(0.1)
+
+    async def wait(self) -> int:
+        return await self.process.wait()
+
+    async def stop(self, timeout: float = 30):
+        """SIGTERM (aiohttp runs on_cleanup), then SIGKILL after ``timeout``."""
+        self.stopping = True
+        if self.process is None or self.process.returncode is not None:
+            return
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+
+
+class _Slot:
+    def __init__(self, worker: Worker):
+        self.worker = worker
+        self.in_flight = 0
+        self.served = 0
+        self.recycling = False
+        # Cleared while the slot switches workers; set when there are no requests in flight.
+        self.open = asyncio.Event()
+        self.open.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+
+class Dispatcher:
+    """Forwards each activity to the worker owning its conversation (other paths: see above).
+
+    ``spawn`` creates a replacement worker for recycling; without it
+    workers are never recycled. Bodies larger than ``max_body_size`` (the
+    workers' MAX_ACTIVITY_BYTES) are answered 413 without being read.
+    """
+
+    def __init__(
+        self,
+        workers: List[Worker],
+        spawn: Callable[[], Awaitable[Worker]] = None,
+        max_requests: int = 0,
+        max_body_size: int = 256 * 1024,
+    ):
+        self.slots = [_Slot(worker) for worker in workers]
+        self.spawn = spawn
+        self.max_requests = max_requests
+        self.max_body_size = max_body_size
+        self.restart_delay = 1.0
+        self.max_restart_delay = 30.0
+        self._session: aiohttp.ClientSession = None
+        self._watchers: List[asyncio.Task] = []
+
+        self.requests = 0
+        self.failed = 0
+        self.recycled = 0
+        self.restarted = 0
+        self.restart_failures = 0
+
+    def route(self, conversation_id: str) -> int:
+        # crc32 is stable across processes, unlike hash() on str.
+        return zlib.crc32(conversation_id.encode("utf-8")) % len(self.slots)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+        return self._session
+
+    def target(self, request: web.Request, body: bytes) -> int:
+        """Slot a request goes to; raises ValueError for a bad ``worker`` parameter."""
+        if request.path == ACTIVITY_PATH:
+            return self.route(conversation_key(body))
+        if "conversation_id" in request.query:
+            # /admin/profile?conversation_id=...: the profiler runs where the conversation does.
+            return self.route(request.query["conversation_id"])
+        index = int(request.query.get("worker", 0))
+        if not 0 <= index < len(self.slots):
+            raise ValueError(f"worker must be between 0 and {len(self.slots) - 1}")
+        return index
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if (request.content_length or 0) > self.max_body_size:
+            return web.Response(status=413)
+        try:
+            body = await request.read()
+        except web.HTTPRequestEntityTooLarge:
+            return web.Response(status=413)
+        try:
+            index = self.target(request, body)
+        except ValueError as error:
+            return web.json_response({"error": str(error)}, status=400)
+        slot = self.slots[index]
+
+        await slot.open.wait()
+        slot.in_flight += 1
+        slot.idle.clear()
+        self.requests += 1
+        try:
+            headers = _forwarded(request.headers, NOT_FORWARDED_REQUEST)
+            async with self.session.request(
+                request.method, slot.worker.url + request.path_qs, data=body, headers=headers
+            ) as response:
+                payload = await response.read()
+                # Retry-After on a 503 (admission control) reaches the client too.
+                return web.Response(
+                    body=payload,
+                    status=response.status,
+                    headers=_forwarded(response.headers, NOT_FORWARDED_RESPONSE),
+                )
+        except aiohttp.ClientError:
+            self.failed += 1
+            return web.Response(status=502)
+        finally:
+            slot.in_flight -= 1
+            if slot.in_flight == 0:
+                slot.idle.set()
+            if request.path == ACTIVITY_PATH:
+                slot.served += 1
+                if self.spawn and self.max_requests and slot.served >= self.max_requests and not slot.recycling:
+                    asyncio.ensure_future(self.recycle(index))
+
+    async def _worker_ready(self, slot: _Slot) -> dict:
+        if not slot.open.is_set():
+            return {"ready": False, "stage": "restarting"}
+        try:
+            async with self.session.get(slot.worker.url + "/ready", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status == 200:
+                    return await response.json()
+                return {"ready": False, "status": response.status}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            return {"ready": False, "error": type(error).__name__}
+
+    async def ready(self, request: web.Request) -> web.Response:
+        """Ready when every worker is."""
+        workers = await asyncio.gather(*[self._worker_ready(slot) for slot in self.slots])
+        ready = all(worker.get("ready") for worker in workers)
+        return web.json_response({"ready": ready, "workers": workers}, status=200 if ready else 503)
+
+    async def recycle(self, index: int):
+        """Replace the worker of a slot once its in-flight requests are done."""
+        slot = self.slots[index]
+        if slot.recycling or self.spawn is None:
+            return
+        slot.recycling = True
+        try:
+            replacement = await self.spawn()
+            slot.open.clear()
+            await slot.idle.wait()
+            await slot.worker.stop()
+            slot.worker = replacement
+            slot.served = 0
+            self.recycled += 1
+        finally:
+            slot.open.set()
+            slot.recycling = False
+
+    async def recycle_all(self):
+        # One slot at a time, so the other workers keep serving.
+        for index in range(len(self.slots)):
+            await self.recycle(index)
+
+    async def _watch(self, index: int):
+        """Restart a worker that exits without being asked to."""
+        while True:
+            worker = self.slots[index].worker
+            code = await worker.wait()
+            if worker.stopping:
+                # Recycled (or shutting down): watch the replacement.
+                while self.slots[index].worker is worker:
+                    await asyncio.sleep(0.1)
+                continue
+            print(f"\n [launcher] worker on port {worker.port} exited with {code}, restarting", file=sys.stderr)
+            await self._restart(index)
+
+    async def _restart(self, index: int):
+        """Spawn a new worker for the slot, retrying with backoff until one starts."""
+        slot = self.slots[index]
+        delay = self.restart_delay
+        while True:
+            slot.open.clear()
+            try:
+                slot.worker = await self.spawn()
+                self.restarted += 1
+                return
+            except Exception as error:  # pylint: disable=broad-except
+                self.restart_failures += 1
+                print(f"\n [launcher] could not start a worker ({error}), retrying in {delay:g}s", file=sys.stderr)
+            finally:
+                # Requests to the slot get 502 until a worker starts, instead of waiting.
+                slot.open.set()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    def start_watching(self):
+        if self.spawn is not None:
+            self._watchers = [asyncio.ensure_future(self._watch(i)) for i in range(len(self.slots))]
+
+    async def close(self):
+        for watcher in self._watchers:
+            watcher.cancel()
+        if self._session is not None:
+            await self._session.close()
+        await asyncio.gather(*[slot.worker.stop() for slot in self.slots])
+
+    @property
+    def stats(self) -> Dict[str, object]:
+        return {
+            "workers": [slot.worker.port for slot in self.slots],
+            "in_flight": [slot.in_flight for slot in self.slots],
+            "served": [slot.served for slot in self.slots],
+            "requests": self.requests,
+            "failed": self.failed,
+            "recycled": self.recycled,
+            "restarted": self.restarted,
+            "restart_failures": self.restart_failures,
+        }
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=self.max_body_size)
+        app.router.add_get("/ready", self.ready)
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        return app
+
+
+async def main(args):
+    env = dict(os.environ)
+    if args.storage:
+        env["STORAGE"] = args.storage
+    if env.get("STORAGE", "memory") == "memory" and args.max_requests:
+        print(" [launcher] STORAGE=memory: conversations are lost when a worker is recycled", file=sys.stderr)
+
+    async def spawn() -> Worker:
+        return await Worker.spawn(env)
+
+    workers = await asyncio.gather(*[spawn() for _ in range(args.workers)])
+    dispatcher = Dispatcher(
+        list(workers), spawn, max_requests=args.max_requests, max_body_size=DefaultConfig().MAX_ACTIVITY_BYTES
+    )
+    dispatcher.start_watching()
+
+    runner = web.AppRunner(dispatcher.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f" [launcher] {args.workers} worker(s) behind http://{args.host}:{args.port}", file=sys.stderr)
+
+    loop = asyncio.get_event_loop()
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(dispatcher.recycle_all()))
+
+    await stop.wait()
+    await runner.cleanup()
+    await dispatcher.close()
+
+
+if __name__ == "__main__":
+    CONFIG = DefaultConfig()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=CONFIG.PORT)
+    parser.add_argument("--workers", type=int, default=CONFIG.WORKERS, help="0 = one per core")
+    parser.add_argument("--max-requests", type=int, default=CONFIG.WORKER_MAX_REQUESTS, help="recycle a worker after this many activities (0 = never)")
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default=None, help="overrides STORAGE for the workers")
+    args = parser.parse_args()
+    args.workers = args.workers or os.cpu_count()
+
+    asyncio.get_event_loop().run_until_complete(main(args))
@@ -0,0 +1,202 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Connection-pooled HTTP clients shared by all LUIS traffic.
+
+``get_session`` returns a ``requests.Session`` for the authoring/evaluation
+tooling in ``p10_01_luis``; ``AsyncHttpClient`` wraps one ``aiohttp``
+session for the bot runtime. Both keep connections alive, enforce connect
+and read timeouts, and retry with exponential backoff on 429 and 5xx.
+
+``requests`` sessions only retry idempotent methods: a version import or an
+evaluation POST that timed out may have been accepted, and is not sent
+twice. ``get_authoring_session`` waits longer for the (large) exports and
+imports. ``AsyncHttpClient`` gives every request, retries included, a
+``total_timeout`` budget.
+"""
+import asyncio
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import aiohttp
+except ImportError:  # The authoring tooling environment does not ship aiohttp.
+    aiohttp = None
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpClientOptions:
+    def __init__(
+        self,
+        pool_size: int = 10,
+        keepalive_timeout: float = 30,
+        connect_timeout: float = 3.05,
+        read_timeout: float = 10,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        total_timeout: float = 15,
+        authoring_read_timeout: float = 120,
+    ):
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.total_timeout = total_timeout
+        self.authoring_read_timeout = authoring_read_timeout
+
+    @classmethod
+    def from_env(cls) -> "HttpClientOptions":
+        """Read overrides from the LUIS_HTTP_* environment variables."""
+        return cls(
+            pool_size=int(os.environ.get("LUIS_HTTP_POOL_SIZE", 10)),
+            keepalive_timeout=float(os.environ.get("LUIS_HTTP_KEEPALIVE", 30)),
+            connect_timeout=float(os.environ.get("LUIS_HTTP_CONNECT_TIMEOUT", 3.05)),
+            read_timeout=float(os.environ.get("LUIS_HTTP_READ_TIMEOUT", 10)),
+            retries=int(os.environ.get("LUIS_HTTP_RETRIES", 3)),
+            backoff_factor=float(os.environ.get("LUIS_HTTP_BACKOFF", 0.5)),
+            total_timeout=float(os.environ.get("LUIS_HTTP_TOTAL_TIMEOUT", 15)),
+            authoring_read_timeout=float(os.environ.get("LUIS_HTTP_AUTHORING_TIMEOUT", 120)),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number ``attempt`` (1-based), as urllib3 computes it."""
+        if attempt <= 1:
+            return 0
+        return self.backoff_factor * (2 ** (attempt - 1))
+
+
+class _TimeoutSession(requests.Session):
+    """Session applying a default (connect, read) timeout to every request."""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):  # pylint: disable=arguments-differ
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _retry(options: HttpClientOptions) -> Retry:
+    # urllib3's default methods: the idempotent ones (GET, PUT, DELETE...), not POST.
+    return Retry(
+        total=options.retries,
+        backoff_factor=options.backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def create_session(options: HttpClientOptions = None, read_timeout: float = None) -> requests.Session:
+    options = options or HttpClientOptions.from_env()
+
+    session = _TimeoutSession((options.connect_timeout, read_timeout or options.read_timeout))
+    adapter = HTTPAdapter(
+        pool_connections=options.pool_size,
+        pool_maxsize=options.pool_size,
+        max_retries=_retry(options),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = None
+_AUTHORING_SESSION = None
+
+
+def get_session() -> requests.Session:
+    """Process-wide session, created on first use."""
+    global _SESSION  # pylint: disable=global-statement
+    if _SESSION is None:
+        _SESSION = create_session()
+    return _SESSION
+
+
+def get_authoring_session() -> requests.Session:
+    """Process-wide session for version exports/imports and evaluations (longer read timeout)."""
+    global _AUTHORING_SESSION  # pylint: disable=global-statement
+    if _AUTHORING_SESSION is None:
+        options = HttpClientOptions.from_env()
+        _AUTHORING_SESSION = create_session(options, read_timeout=options.authoring_read_timeout)
+    return _AUTHORING_SESSION
+
+
+class AsyncHttpClient:
+    """Lazily-created ``aiohttp.ClientSession`` reused for every request."""
+
+    def __init__(self, options: HttpClientOptions = None):
+        if aiohttp is None:
+            raise ImportError("AsyncHttpClient requires aiohttp")
+
+        self.options = options or HttpClientOptions.from_env()
+        self._session = None
+        self.retries = 0
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        # The session binds to the running loop, so it cannot be built in __init__.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.options.pool_size,
+                keepalive_timeout=self.options.keepalive_timeout,
+            )
+            timeout = aiohttp.ClientTimeout(
+                connect=self.options.connect_timeout,
+                sock_read=self.options.read_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def request_json(self, method: str, url: str, **kwargs) -> dict:
+        """Send a request and decode its JSON body, retrying transient failures.
+
+        Attempts and the waits between them share ``total_timeout`` seconds: a
+        retry that could not start before the budget runs out (a long
+        Retry-After, say) is not made, and the last failure is raised.
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.options.total_timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = aiohttp.ClientTimeout(
+                total=max(deadline - loop.time(), 0.001),
+                connect=self.options.connect_timeout,
+                sock_read=self.options.read_timeout,
+            )
+            try:
+                async with self.session.request(method, url, timeout=timeout, **kwargs) as response:
+                    retryable = response.status in RETRY_STATUSES
+                    delay = (_retry_after(response) or self.options.backoff(attempt)) if retryable else 0
+                    if not retryable or not self._can_retry(attempt, delay, deadline):
+                        response.raise_for_status()
+                        return await response.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                delay = self.options.backoff(attempt)
+                if not self._can_retry(attempt, delay, deadline):
+                    raise
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def _can_retry(self, attempt: int, delay: float, deadline: float) -> bool:
+        return attempt <= self.options.retries and asyncio.get_event_loop().time() + delay < deadline
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0
@@ -0,0 +1,365 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""In-process intent/entity recognizer trained from the LUIS utterances dataset."""
+
+import json
+import math
+import random
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from botbuilder.core import (
+    BotTelemetryClient,
+    IntentScore,
+    NullTelemetryClient,
+    Recognizer,
+    RecognizerResult,
+    TurnContext,
+)
+
+NONE_INTENT = "None"
+ENTITY_NAMES = ("from_city", "to_city", "from_date", "to_date", "budget")
+DATE_ENTITIES = ("from_date", "to_date")
+
+_TOKEN_RE = re.compile(r"\d+(?:[/.-]\d+)+|\w+|[^\w\s]", re.UNICODE)
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = r"(?P<month>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_DAY = r"(?P<day>\d{1,2})(?:st|nd|rd|th)?"
+_YEAR = r"(?:,?\s+(?P<year>\d{4}))?"
+_DATE_PATTERNS = [
+    re.compile(_MONTH + r"\s+" + _DAY + _YEAR + r"$"),
+    re.compile(_DAY + r"\s+(?:of\s+)?" + _MONTH + _YEAR + r"$"),
+    re.compile(r"(?P<day>\d{1,2})[/.-](?P<nmonth>\d{1,2})(?:[/.-](?P<year>\d{2,4}))?$"),
+    re.compile(_DAY + r"$"),
+]
+_DURATION_RE = re.compile(r"(?P<count>\d+)\s+(?P<unit>day|week|month|year)s?$")
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Split text into (token, start, end) triples, end being exclusive."""
+    return [(m.group(), m.start(), m.end()) for m in _TOKEN_RE.finditer(text)]
+
+
+def _shape(token: str) -> str:
+    if token.isdigit():
+        return "d" * min(len(token), 4)
+    if token.istitle():
+        return "Xx"
+    if token.isupper():
+        return "X"
+    if token.isalpha():
+        return "x"
+    return "p"
+
+
+class _IntentClassifier:
+    """Binary-or-more softmax regression over sparse n-gram features."""
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self.weights: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def features(tokens: List[str]) -> List[str]:
+        words = [tok.lower() for tok in tokens]
+        feats = ["bias"]
+        feats.extend("w=" + w for w in words)
+        feats.extend("b=" + a + "_" + b for a, b in zip(words, words[1:]))
+        feats.extend("s=" + _shape(tok) for tok in tokens)
+        feats.append("len=" + str(min(len(words), 10)))
+        return feats
+
+    def _scores(self, feats: List[str]) -> Dict[str, float]:
+        logits = {}
+        for label in self.labels:
+            weights = self.weights[label]
+            logits[label] = sum(weights.get(f, 0.0) for f in feats)
+        top = max(logits.values())
+        exps = {label: math.exp(v - top) for label, v in logits.items()}
+        total = sum(exps.values())
+        return {label: v / total for label, v in exps.items()}
+
+    def train(
+        self,
+        samples: List[Tuple[List[str], str]],
+        epochs: int = 30,
+        learning_rate: float = 0.05,
+        l2: float = 1e-2,
+        seed: int = 1,
+    ):
+        self.labels = sorted({label for _, label in samples})
+        self.weights = {label: defaultdict(float) for label in self.labels}
+        data = [(self.features(tokens), label) for tokens, label in samples]
+        rng = random.Random(seed)
+
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1.0 + epoch * 0.1)
+            for feats, gold in data:
+                probs = self._scores(feats)
+                for label in self.labels:
+                    grad = probs[label] - (1.0 if label == gold else 0.0)
+                    weights = self.weights[label]
+                    for f in feats:
+                        weights[f] -= rate * (grad + l2 * weights[f])
+
+        self.weights = {label: dict(w) for label, w in self.weights.items()}
+
+    def predict(self, tokens: List[str]) -> Tuple[str, float]:
+        probs = self._scores(self.features(tokens))
+        label = max(probs, key=probs.get)
+        return label, probs[label]
+
+
+class _SpanTagger:
+    """Greedy averaged-perceptron BIO tagger."""
+
+    def __init__(self):
+        self.tags: List[str] = ["O"]
+        self.weights: Dict[str, Dict[str, float]] = {}
+
+    @staticmethod
+    def features(words: List[str], index: int, prev_tag: str, prev2_tag: str) -> List[str]:
+        word = words[index]
+        lower = word.lower()
+
+        def ctx(offset):
+            pos = index + offset
+            if 0 <= pos < len(words):
+                return words[pos].lower()
+            return "<s>" if pos < 0 else "</s>"
+
+        return [
+            "bias",
+            "w=" + lower,
+            "p3=" + lower[:3],
+            "s3=" + lower[-3:],
+            "shape=" + _shape(word),
+            "w-1=" + ctx(-1),
+            "w-2=" + ctx(-2),
+            "w+1=" + ctx(1),
+            "w+2=" + ctx(2),
+            "w-1w=" + ctx(-1) + "_" + lower,
+            "w-2w-1=" + ctx(-2) + "_" + ctx(-1),
+            "ww+1=" + lower + "_" + ctx(1),
+            "t-1=" + prev_tag,
+            "t-2t-1=" + prev2_tag + "_" + prev_tag,
+            "t-1w=" + prev_tag + "_" + lower,
+            "t-1s=" + prev_tag + "_" + _shape(word),
+        ]
+
+    def _best(self, feats: List[str]) -> str:
+        scores = dict.fromkeys(self.tags, 0.0)
+        for f in feats:
+            weights = self.weights.get(f)
+            if weights:
+                for tag, value in weights.items():
+                    scores[tag] += value
+        return max(self.tags, key=lambda tag: (scores[tag], tag == "O"))
+
+    def train(self, samples: List[Tuple[List[str], List[str]]], epochs: int = 8, seed: int = 1):
+        self.tags = sorted({tag for _, tags in samples for tag in tags} | {"O"})
+        weights = defaultdict(lambda: defaultdict(float))
+        totals = defaultdict(float)
+        stamps = defaultdict(int)
+        step = 0
+        rng = random.Random(seed)
+        data = list(samples)
+        self.weights = weights
+
+        def update(feature, tag, value):
+            key = (feature, tag)
+            totals[key] += (step - stamps[key]) * weights[feature][tag]
+            stamps[key] = step
+            weights[feature][tag] += value
+
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for words, gold_tags in data:
+                prev, prev2 = "<s>", "<s>"
+                for i, gold in enumerate(gold_tags):
+                    feats = self.features(words, i, prev, prev2)
+                    guess = self._best(feats)
+                    step += 1
+                    if guess != gold:
+                        for f in feats:
+                            update(f, gold, 1.0)
+                            update(f, guess, -1.0)
+                    prev2, prev = prev, gold
+
+        averaged = {}
+        for feature, tag_weights in weights.items():
+            kept = {}
+            for tag, value in tag_weights.items():
+                key = (feature, tag)
+                total = totals[key] + (step - stamps[key]) * value
+                avg = total / step if step else 0.0
+                if avg:
+                    kept[tag] = avg
+            if kept:
+                averaged[feature] = kept
+        self.weights = averaged
+
+    def predict(self, words: List[str]) -> List[str]:
+        tags = []
+        prev, prev2 = "<s>", "<s>"
+        for i in range(len(words)):
+            tag = self._best(self.features(words, i, prev, prev2))
+            tags.append(tag)
+            prev2, prev = prev, tag
+        return tags
+
+
+def _bio_tags(tokens: List[Tuple[str, int, int]], entities: List[dict]) -> List[str]:
+    """Project LUIS character spans (inclusive end) onto BIO token tags."""
+    tags = ["O"] * len(tokens)
+    for entity in entities:
+        name = entity["entity"]
+        if name not in ENTITY_NAMES:
+            continue
+        start, end = entity["startPos"], entity["endPos"] + 1
+        inside = False
+        for i, (_, tok_start, tok_end) in enumerate(tokens):
+            if tok_start < end and tok_end > start and tags[i] == "O":
+                tags[i] = ("I-" if inside else "B-") + name
+                inside = True
+    return tags
+
+
+def resolve_date(text: str) -> dict:
+    """Resolve a tagged date span to a LUIS datetimeV2 entry ({type, timex})."""
+    text = text.lower().strip()
+
+    match = _DURATION_RE.search(text)
+    if match:
+        unit = match.group("unit")[0].upper()
+        return {"type": "duration", "timex": ["P" + match.group("count") + unit]}
+
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        groups = match.groupdict()
+        day = int(groups["day"])
+        if groups.get("month"):
+            month = "%02d" % _MONTHS[groups["month"]]
+        elif groups.get("nmonth"):
+            month = "%02d" % int(groups["nmonth"])
+        else:
+            month = "XX"
+        year = groups.get("year")
+        if year and len(year) == 2:
+            year = "20" + year
+        if not 1 <= day <= 31 or (month != "XX" and not 1 <= int(month) <= 12):
+            return None
+        return {"type": "date", "timex": ["%s-%s-%02d" % (year or "XXXX", month, day)]}
+
+    return None
+
+
+class OfflineRecognizer(Recognizer):
+    """Recognizer answering from a locally trained model instead of the LUIS endpoint.
+
+    Results mirror what ``LuisRecognizer`` (v3, top intent only) returns, so
+    ``LuisHelper.execute_luis_query`` consumes them unchanged.
+    """
+
+    def __init__(
+        self,
+        utterances: List[dict],
+        telemetry_client: BotTelemetryClient = None,
+        intent_threshold: float = 0.5,
+    ):
+        self.telemetry_client = telemetry_client or NullTelemetryClient()
+        self.intent_threshold = intent_threshold
+        self._intents = _IntentClassifier()
+        self._tagger = _SpanTagger()
+        self.train(utterances)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "OfflineRecognizer":
+        with open(path, encoding="utf-8") as utterances_file:
+            utterances = json.load(utterances_file)
+        if isinstance(utterances, dict):
+            # Test sets are exported as {"LabeledTestSetUtterances": [...]}
+            utterances = next(iter(utterances.values()))
+        return cls(utterances, **kwargs)
+
+    def train(self, utterances: List[dict]):
+        intent_samples, tag_samples = [], []
+        for utterance in utterances:
+            tokens = tokenize(utterance["text"])
+            words = [tok for tok, _, _ in tokens]
+            intent_samples.append((words, utterance["intent"]))
+            if words:
+                tag_samples.append((words, _bio_tags(tokens, utterance["entities"])))
+
+        self._intents.train(intent_samples)
+        self._tagger.train(tag_samples)
+
+    def predict(self, text: str) -> Tuple[str, float, Dict[str, object]]:
+        """Return (top intent, score, entities) for a raw utterance."""
+        tokens = tokenize(text or "")
+        words = [tok for tok, _, _ in tokens]
+        if not words:
+            return NONE_INTENT, 1.0, {}
+
+        intent, score = self._intents.predict(words)
+        if score < self.intent_threshold:
+            intent = NONE_INTENT
+
+        entities: Dict[str, object] = {}
+        instances: Dict[str, list] = {}
+        datetimes = []
+        for name, start, end in self._spans(tokens, self._tagger.predict(words)):
+            span = text[start:end]
+            entities.setdefault(name, []).append(span)
+            instances.setdefault(name, []).append(
+                {"type": name, "text": span, "startIndex": start, "endIndex": end}
+            )
+            if name in DATE_ENTITIES:
+                resolved = resolve_date(span)
+                if resolved:
+                    datetimes.append(resolved)
+
+        if datetimes:
+            entities["datetime"] = datetimes
+        entities["$instance"] = instances
+
+        return intent, score, entities
+
+    @staticmethod
+    def _spans(tokens, tags):
+        name, start, end = None, 0, 0
+        for (_, tok_start, tok_end), tag in zip(tokens, tags):
+            if tag.startswith("I-") and name == tag[2:]:
+                end = tok_end
+                continue
+            if name:
+                yield name, start, end
+                name = None
+            if tag != "O":
+                name, start, end = tag[2:], tok_start, tok_end
+        if name:
+            yield name, start, end
+
+    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        utterance = turn_context.activity.text if turn_context.activity else None
+        intent, score, entities = self.predict(utterance)
+
+        self.telemetry_client.track_event(
+            "OfflineRecognizerResult",
+            {"intent": intent, "intentScore": "%.2f" % score},
+        )
+
+        return RecognizerResult(
+            text=utterance,
+            altered_text=None,
+            intents={intent: IntentScore(score)},
+            entities=entities,
+        )
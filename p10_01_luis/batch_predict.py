@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Prédictions LUIS en parallèle (concurrence bornée) pour l'évaluation.
+
+Les résultats sont écrits au fil de l'eau dans un fichier JSONL, avec
+l'indice de l'utterance dans le jeu d'entrée : une exécution interrompue
+reprend là où elle s'était arrêtée (les doublons sont prédits chacun), et
+le résumé compte aussi les prédictions déjà présentes dans le fichier.
+
+    python batch_predict.py --input ../00_data/datasets/utterances_test.json \\
+        --output predictions.jsonl --concurrency 8 --rate 5
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+
+from utils import LuisEnv, get_prediction_url
+from luis_http_client import AsyncHttpClient
+
+
+class RateLimiter:
+    """Espace les requêtes pour ne pas dépasser `rate` requêtes par seconde."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_event_loop().time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def load_utterances(path):
+    """Charge un jeu d'utterances (liste ou export {"LabeledTestSetUtterances": [...]})"""
+    with open(path, encoding="utf-8") as f:
+        utterances = json.load(f)
+
+    if isinstance(utterances, dict):
+        utterances = next(iter(utterances.values()))
+
+    # On accepte aussi une simple liste de textes
+    return [u if isinstance(u, dict) else {"text": u} for u in utterances]
+
+
+def load_done(output):
+    """Renvoie les enregistrements déjà écrits dans le fichier de sortie, par indice d'utterance"""
+    done = {}
+    if not output or not os.path.exists(output):
+        return done
+
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                done[record["index"]] = record
+            except (ValueError, KeyError):
+                # Dernière ligne tronquée par une interruption (ou ligne sans
+                # indice, d'une version précédente : l'utterance est reprédite)
+                continue
+    return done
+
+
+async def predict_many(utterances, concurrency=8, rate=5.0, env=None, output=None, client=None):
+    """Génère les couples (utterance, prédiction) dans l'ordre où ils se terminent.
+
+    Les échecs (après les retries du client) sont renvoyés avec une clé
+    "error" et ne sont pas écrits, pour être rejoués à la reprise.
+    """
+    env = env or LuisEnv()
+    own_client = client is None
+    client = client or AsyncHttpClient()
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    done = load_done(output)
+    pending = [(index, u) for index, u in enumerate(utterances) if index not in done]
+
+    async def predict_one(index, utterance):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                pred = await client.request_json("GET", get_prediction_url(env, utterance["text"]))
+            except Exception as exception:
+                return index, utterance, {"error": str(exception)}
+            return index, utterance, pred
+
+    tasks = [asyncio.ensure_future(predict_one(index, u)) for index, u in pending]
+    out = open(output, "a", encoding="utf-8") if output else None
+    try:
+        for future in asyncio.as_completed(tasks):
+            index, utterance, pred = await future
+            if out and "error" not in pred:
+                record = {
+                    "index": index,
+                    "text": utterance["text"],
+                    "intent": utterance.get("intent"),
+                    "prediction": pred,
+                }
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            yield utterance, pred
+    finally:
+        for task in tasks:
+            task.cancel()
+        if out:
+            out.close()
+        if own_client:
+            await client.close()
+
+
+async def main(args):
+    utterances = load_utterances(args.input)
+    start = time.perf_counter()
+
+    # Les prédictions d'une exécution précédente comptent dans le résumé
+    resumed = [r for index, r in load_done(args.output).items() if index < len(utterances)]
+    total = len(resumed)
+    correct = sum(r["prediction"]["prediction"]["topIntent"] == r.get("intent") for r in resumed)
+    errors = 0
+
+    async for utterance, pred in predict_many(
+        utterances, concurrency=args.concurrency, rate=args.rate, output=args.output
+    ):
+        total += 1
+        if "error" in pred:
+            errors += 1
+            print(f"Erreur : {utterance['text'][:40]!r} : {pred['error']}")
+        elif pred["prediction"]["topIntent"] == utterance.get("intent"):
+            correct += 1
+
+    elapsed = time.perf_counter() - start
+    print(f"{total} prédictions dont {len(resumed)} reprises, en {elapsed:.1f}s ({errors} erreurs).")
+    if total - errors:
+        print(f"Intention correcte : {correct / (total - errors):.2%}")
+
+
+if __name__ == "__main__":
+    # On récupère les arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=os.path.join("..", "00_data", "datasets", "utterances_test.json"))
+    parser.add_argument("--output", default="predictions.jsonl")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=5.0, help="requêtes par seconde")
+    args = parser.parse_args()
+
+    asyncio.get_event_loop().run_until_complete(main(args))
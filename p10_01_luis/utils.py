@@ -1,4 +1,4 @@
-import os,json,requests, time
+import os,json, time, sys
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -11,6 +11,28 @@ import pandas as pd
 
 import urllib
 
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):  
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)       
+    
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))        
+    return str(found_in)
+
+# Pooled keep-alive sessions (timeouts + retries of idempotent requests on 429/5xx) shared with the bot
+find_pckg("luis_http_client.py")
+from luis_http_client import get_authoring_session, get_session
+
 class LuisEnv:
     def __init__(self):
         path = str(Path(os.path.realpath(__file__)).parent)
@@ -129,7 +151,7 @@ def check_response_ok_or_raise_for_status(response):
 
 def get_latest_version(env):
             # On envoie la requête permettant d'exporter le modèle au format json
-    response = requests.get(
+    response = get_session().get(
         url=f"{env.LUIS_AUTH_ENDPOINT}luis/authoring/v3.0-preview/apps/{env.LUIS_APP_ID}/versions?skip=0&take=100",
             headers={
                 "Ocp-Apim-Subscription-Key": env.LUIS_AUTH_KEY,
@@ -146,7 +168,7 @@ def get_params(env, app_version):
     """Renvoie les paramètres de LUIS"""
    
     # On envoie la requête permettant d'exporter le modèle au format json
-    response = requests.get(
+    response = get_authoring_session().get(
         url=f"{env.LUIS_AUTH_ENDPOINT}luis/authoring/v3.0-preview/apps/{env.LUIS_APP_ID}/versions/{app_version}/export",
         params={
             "format": "json"
@@ -170,7 +192,7 @@ def create_new_version(env, app_version, app_params, app_utterances=[]):
     app_params_tmp["utterances"] += app_utterances
     
     # On envoie la requête permettant de créer la nouvelle version
-    response = requests.post(
+    response = get_authoring_session().post(
         url=f"{env.LUIS_AUTH_ENDPOINT}luis/authoring/v3.0-preview/apps/{env.LUIS_APP_ID}/versions/import",
         params={
             "versionId": app_version,
@@ -223,16 +245,19 @@ def deploy_luis(env, app_version, is_staging=True):
     staging = is_staging
     client.apps.publish(env.LUIS_APP_ID, app_version, is_staging=staging)
     
-def get_prediction_luis(env, utterance):
-    """Renvoie une prédiction LUIS"""
+def get_prediction_url(env, utterance):
+    """Renvoie l'URL de prédiction LUIS pour une utterance"""
     query_base = (
     f"{env.LUIS_PRED_ENDPOINT}/luis/prediction/v3.0/apps/{env.LUIS_APP_ID}"
     f"/slots/production/predict?verbose=true&show-all-intents=true&log=true"
     f"&subscription-key={env.LUIS_PRED_KEY}&query="
     )
 
-    query = utterance
-    r = requests.get(query_base + urllib.parse.quote_plus(query))
+    return query_base + urllib.parse.quote_plus(utterance)
+
+def get_prediction_luis(env, utterance):
+    """Renvoie une prédiction LUIS"""
+    r = get_session().get(get_prediction_url(env, utterance))
     pred = json.loads(r.text)
 
 
@@ -276,7 +301,7 @@ def evaluate(env, is_staging, utterances, check_status_period=5):
         slots = "production"
     
     # On envoie la requête permettant de lancer l'évaluation
-    response = requests.post(
+    response = get_authoring_session().post(
         url=f"{env.LUIS_PRED_ENDPOINT}luis/v3.0-preview/apps/{env.LUIS_APP_ID}/slots/{slots}/evaluations",
         headers={
             "Ocp-Apim-Subscription-Key": env.LUIS_PRED_KEY,
@@ -293,7 +318,7 @@ def evaluate(env, is_staging, utterances, check_status_period=5):
     waiting = True
     while waiting:
         # On check le status
-        response = requests.get(
+        response = get_session().get(
             url=f"{env.LUIS_PRED_ENDPOINT}luis/v3.0-preview/apps/{env.LUIS_APP_ID}/slots/{slots}/evaluations/{operation_id}/status",
             headers={
                 "Ocp-Apim-Subscription-Key": env.LUIS_PRED_KEY,
@@ -310,7 +335,7 @@ def evaluate(env, is_staging, utterances, check_status_period=5):
             time.sleep(check_status_period)
         
     # On récupère les résultats de l'évaluation
-    response = requests.get(
+    response = get_session().get(
         url=f"{env.LUIS_PRED_ENDPOINT}luis/v3.0-preview/apps/{env.LUIS_APP_ID}/slots/{slots}/evaluations/{operation_id}/result",
         headers={
             "Ocp-Apim-Subscription-Key": env.LUIS_PRED_KEY,
@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Compare rendering the booking card the old way and from a CardTemplate.
+
+    python -m p10_03_load.bench_cards --number 2000
+
+"legacy" is what ``MainDialog.create_adaptive_card_attachment`` used to do:
+read and parse the JSON file, ``str()`` the dict, one ``re.sub`` per field
+and ``eval`` the result back.
+"""
+import argparse
+import json
+import os
+import re
+import timeit
+
+from helpers.card_templates import CARDS_DIR, CardTemplate
+
+CARD = os.path.join(CARDS_DIR, "bookedFlightCard.json")
+DATA = {
+    "from_city": "Paris",
+    "to_city": "New York",
+    "from_date": "2021-06-01",
+    "to_date": "2021-06-15",
+    "budget": "1500 euros",
+}
+
+
+def legacy_render(data: dict) -> dict:
+    with open(CARD) as card_file:
+        card = json.load(card_file)
+    string_temp = str(card)
+    for key in data:
+        string_temp = re.sub("\\${" + key + "}", str(data[key]), string_temp)
+    return eval(string_temp)  # pylint: disable=eval-used
+
+
+def main(args):
+    template = CardTemplate.from_file(CARD)
+    assert legacy_render(DATA) == template.render(DATA)
+
+    cases = {
+        "legacy": lambda: legacy_render(DATA),
+        "template": lambda: template.render(DATA),
+        "load+compile": lambda: CardTemplate.from_file(CARD),
+    }
+    for name, func in cases.items():
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number
+        print(f"{name:>12}: {best * 1e6:8.1f} us/card")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Time ``LuisHelper.extract_datetimes`` over every date of a labeled dataset.
+
+    python -m p10_03_load.bench_datetimes --dataset 00_data/datasets/utterances_test.json
+
+Date spans are resolved to datetime entities the way the LUIS stand-in does.
+"uncached" clears the timex cache before every utterance, which shows
+what a cache miss costs.
+"""
+import argparse
+import json
+import os
+import timeit
+
+from helpers.luis_helper import LuisHelper, _parse_timex
+from p10_03_load.datasets import DATASETS
+from p10_03_load.luis_stub import _labeled_prediction
+
+
+def load_datetimes(path: str) -> list:
+    with open(path, encoding="utf-8") as dataset:
+        utterances = json.load(dataset)
+    if isinstance(utterances, dict):
+        utterances = next(iter(utterances.values()))
+    entities = [_labeled_prediction(utterance)[2].get("datetime") for utterance in utterances]
+    return [datetimes for datetimes in entities if datetimes]
+
+
+def extract_all(column: list):
+    for datetimes in column:
+        try:
+            LuisHelper.extract_datetimes(datetimes)
+        except ValueError:
+            pass
+
+
+def extract_all_uncached(column: list):
+    for datetimes in column:
+        _parse_timex.cache_clear()
+        try:
+            LuisHelper.extract_datetimes(datetimes)
+        except ValueError:
+            pass
+
+
+def main(args):
+    column = load_datetimes(args.dataset)
+    print(f"{len(column)} utterances with dates in {os.path.basename(args.dataset)}")
+
+    cases = {
+        "uncached": lambda: extract_all_uncached(column),
+        "cached": lambda: extract_all(column),
+        "batch": lambda: LuisHelper.extract_datetimes_batch(column),
+    }
+    for name, func in cases.items():
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number
+        print(f"{name:>9}: {best * 1e6 / len(column):7.1f} us/utterance")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default=os.path.join(DATASETS, "utterances_test.json"))
+    parser.add_argument("--number", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
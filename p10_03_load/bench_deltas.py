@@ -0,0 +1,88 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Bytes written per turn by SqliteStorage and DeltaSqliteStorage.
+
+    python -m p10_03_load.bench_deltas --conversations 200
+
+Replays the conversation state snapshots of p10_03_load/bench_state.py
+for many conversations, one commit per turn of every conversation, and
+reports per turn: the state bytes written to rows, the bytes appended to
+the WAL (what reaches the disk; checkpoints are disabled for the run) and
+the commit time, then the time to read every conversation back.
+"""
+import argparse
+import asyncio
+import copy
+import os
+import tempfile
+import time
+
+from p10_03_load.bench_state import snapshots
+from storage import DeltaSqliteStorage, SqliteStorage, StateCodec
+
+SETUPS = {
+    "rows": lambda path: SqliteStorage(path, flush_interval=60, codec=StateCodec()),
+    "deltas": lambda path: DeltaSqliteStorage(path, flush_interval=60, codec=StateCodec(compress_above=0)),
+}
+
+
+async def run(setup: str, states: list, conversations: int, history: list) -> dict:
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "state.db")
+    storage = SETUPS[setup](path)
+    storage._connection.execute("PRAGMA wal_autocheckpoint=0")  # pylint: disable=protected-access
+    keys = [f"bench/conversations/{index}" for index in range(conversations)]
+
+    row_bytes = 0
+    commit_time = 0.0
+    for state in states:
+        for key in keys:
+            item = copy.copy(state)
+            item["history"] = history
+            await storage.write({key: item})
+        pending = storage._pending  # pylint: disable=protected-access
+        row_bytes += sum(len(value) for value, _, _ in pending.values())
+        start = time.perf_counter()
+        await storage.flush()
+        commit_time += time.perf_counter() - start
+    wal_bytes = os.path.getsize(path + "-wal")
+    stats = storage.stats
+    if "bytes_written" in stats:
+        row_bytes = stats["bytes_written"]
+    await storage.close()
+
+    reader = SETUPS[setup](path)
+    start = time.perf_counter()
+    for key in keys:
+        await reader.read([key])
+    read_time = time.perf_counter() - start
+    await reader.close()
+
+    turns = len(states) * conversations
+    return {
+        "row_bytes": row_bytes / turns,
+        "wal_bytes": wal_bytes / turns,
+        "commit_us": commit_time / turns * 1e6,
+        "read_us": read_time / conversations * 1e6,
+    }
+
+
+async def main(args):
+    states = await snapshots()
+    # Something else kept in the conversation, e.g. a transcript; same for all turns.
+    history = [f"turn {index}: some earlier message text" for index in range(args.history)]
+    print(f"{args.conversations} conversations x {len(states)} turns, one commit per turn")
+    print(f"{'':>8} {'row B/turn':>11} {'WAL B/turn':>11} {'commit us':>10} {'read us':>8}")
+    for setup in SETUPS:
+        result = await run(setup, states, args.conversations, history)
+        print(
+            f"{setup:>8} {result['row_bytes']:11.0f} {result['wal_bytes']:11.0f}"
+            f" {result['commit_us']:10.1f} {result['read_us']:8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--history", type=int, default=0, help="extra lines of unchanging state per conversation")
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
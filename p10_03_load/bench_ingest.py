@@ -0,0 +1,144 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Inbound activity ingestion: legacy path vs helpers/activity_parser.py.
+
+    python -m p10_03_load.bench_ingest --number 2000 --requests 3000
+
+"legacy" is what ``messages()`` did: ``bot_telemetry_middleware`` and the
+handler each ``await req.json()``, then ``Activity().deserialize(body)``.
+"fast" reads the body once, decodes it with ``loads`` and builds the
+activity with ``ActivityParser``.
+
+Part 1 times the per-activity work on realistic payloads. Part 2 serves
+both versions from an aiohttp server (the handler stops after parsing)
+and measures requests per second with ``--concurrency`` keep-alive
+clients.
+"""
+import argparse
+import asyncio
+import json
+import time
+import timeit
+
+import aiohttp
+from aiohttp import web
+from botbuilder.schema import Activity
+
+from helpers.activity_parser import ActivityParser, loads
+
+ACCOUNTS = {
+    "from": {"id": "29:1Yfx2LbfVq0-user", "name": "Ann Example", "aadObjectId": "6f0e4a1c-user", "role": "user"},
+    "recipient": {"id": "28:bot-app-id", "name": "FlyMe", "role": "bot"},
+}
+
+PAYLOADS = {
+    "emulator message": {
+        "type": "message",
+        "id": "f3a0c1d0-b2c1-11eb-9a0e-4bd0b2a3c7d1",
+        "timestamp": "2021-05-12T09:24:31.913Z",
+        "localTimestamp": "2021-05-12T11:24:31+02:00",
+        "localTimezone": "Europe/Paris",
+        "serviceUrl": "http://localhost:59623",
+        "channelId": "emulator",
+        "conversation": {"id": "e13b7e60-b2c1-11eb-8f4c-6d4c4e1e0f1b|livechat"},
+        "textFormat": "plain",
+        "locale": "en-US",
+        "text": "book a flight from Paris to Rome",
+        "attachments": [],
+        "entities": [{"type": "ClientCapabilities", "requiresBotState": True, "supportsListening": True, "supportsTts": True}],
+        "channelData": {"clientActivityID": "1620811471909rjymjyn5m4", "clientTimestamp": "2021-05-12T09:24:31.909Z"},
+        **ACCOUNTS,
+    },
+    "webchat message": {
+        "type": "message",
+        "id": "Kx7hVQ8bI2J4y3K6ZB9aQ-eu|0000003",
+        "timestamp": "2021-05-12T09:25:02.1234567Z",
+        "serviceUrl": "https://europe.directline.botframework.com/",
+        "channelId": "webchat",
+        "conversation": {"id": "Kx7hVQ8bI2J4y3K6ZB9aQ-eu"},
+        "locale": "en-GB",
+        "text": "June 5th",
+        "entities": [{"type": "ClientCapabilities", "requiresBotState": True}],
+        "channelData": {"clientActivityID": "1620811502110ab12cd", "clientTimestamp": "2021-05-12T09:25:02.110Z"},
+        **ACCOUNTS,
+    },
+    "conversationUpdate": {
+        "type": "conversationUpdate",
+        "id": "9f1e2d3c",
+        "timestamp": "2021-05-12T09:24:20.001Z",
+        "serviceUrl": "http://localhost:59623",
+        "channelId": "emulator",
+        "conversation": {"id": "e13b7e60-b2c1-11eb-8f4c-6d4c4e1e0f1b|livechat"},
+        "membersAdded": [ACCOUNTS["from"], ACCOUNTS["recipient"]],
+        **ACCOUNTS,
+    },
+}
+
+
+def legacy(data: bytes) -> Activity:
+    json.loads(data)  # bot_telemetry_middleware
+    return Activity().deserialize(json.loads(data))
+
+
+def part1(args):
+    parser = ActivityParser()
+    print(f"per activity, best of {args.repeat} (us):")
+    print(f"  {'payload':<20} {'legacy':>8} {'fast':>8}")
+    for name, payload in PAYLOADS.items():
+        data = json.dumps(payload).encode("utf-8")
+        times = []
+        for func in (lambda: legacy(data), lambda: parser.parse(loads(data))):
+            times.append(min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number)
+        print(f"  {name:<20} {times[0] * 1e6:8.1f} {times[1] * 1e6:8.1f}")
+    print(f"  parser: {parser.stats}")
+
+
+async def part2(args):
+    parser = ActivityParser()
+
+    async def legacy_handler(req: web.Request) -> web.Response:
+        await req.json()
+        Activity().deserialize(await req.json())
+        return web.Response()
+
+    async def fast_handler(req: web.Request) -> web.Response:
+        parser.parse(loads(await req.read()))
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post("/legacy", legacy_handler)
+    app.router.add_post("/fast", fast_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+
+    data = json.dumps(PAYLOADS["webchat message"]).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    print(f"aiohttp server, {args.requests} requests, {args.concurrency} clients:")
+    async with aiohttp.ClientSession() as session:
+        for path in ("legacy", "fast") * 2:
+            remaining = [args.requests]
+
+            async def client():
+                while remaining[0] > 0:
+                    remaining[0] -= 1
+                    async with session.post(f"http://127.0.0.1:{port}/{path}", data=data, headers=headers) as response:
+                        await response.read()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(args.concurrency)))
+            print(f"  {path:<8} {args.requests / (time.perf_counter() - start):8.0f} requests/s")
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    arguments = parser.parse_args()
+    part1(arguments)
+    asyncio.get_event_loop().run_until_complete(part2(arguments))
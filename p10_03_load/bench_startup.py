@@ -0,0 +1,158 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Cold start of the bot: import-time breakdown and time to serve.
+
+    python -m p10_03_load.bench_startup --report p10_03_load/startup_report.txt
+
+Part 1 runs ``python -X importtime -c "import app"`` and sums the self
+time of every module by top-level package, then lists the slowest direct
+imports of ``app``. Part 2 starts ``python -m aiohttp.web`` with
+``app:init_func`` and ``fast_start:init_func`` and times, from the spawn,
+when the port accepts connections, when ``/ready`` answers 200 and how
+long the first activity takes.
+"""
+import argparse
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import aiohttp
+
+from p10_03_load.load_generator import FakeConnector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def importtime(module: str = "app", env: Dict[str, str] = None) -> List[Tuple[int, int, int, str]]:
+    """(self us, cumulative us, depth, module) for every module imported."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True, check=True,
+    )
+    rows = []
+    for line in process.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def importtime_report(rows: List[Tuple[int, int, int, str]], module: str = "app", top: int = 15) -> List[str]:
+    packages = defaultdict(int)
+    for self_us, _, _, name in rows:
+        packages[name.split(".")[0]] += self_us
+    total = sum(packages.values())
+
+    lines = [f"import {module}: {total / 1000:.0f} ms, {len(rows)} modules", "", "self time by top-level package:"]
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {self_us / 1000:8.1f} ms  {100 * self_us / total:5.1f}%  {package}")
+
+    # Rows are printed children first: the module's own imports are the depth 1
+    # rows right before it. A package imported first pays for what it shares
+    # with later ones.
+    lines += ["", f"slowest direct imports of {module} (cumulative):"]
+    direct = []
+    end = max(index for index, row in enumerate(rows) if row[2] == 0 and row[3] == module)
+    for row in reversed(rows[:end]):
+        if row[2] == 0:
+            break
+        if row[2] == 1:
+            direct.append(row)
+    for _, cumulative, _, name in sorted(direct, key=lambda row: -row[1])[:top]:
+        lines.append(f"  {cumulative / 1000:8.1f} ms  {name}")
+    return lines
+
+
+def _activity(service_url: str) -> dict:
+    return {
+        "type": "message",
+        "id": str(uuid.uuid4()),
+        "channelId": "bench",
+        "serviceUrl": service_url,
+        "from": {"id": "user"},
+        "recipient": {"id": "bot"},
+        "conversation": {"id": str(uuid.uuid4())},
+        "text": "hello",
+    }
+
+
+async def time_to_serve(
+    target: str, port: int, env: Dict[str, str], service_url: str, timeout: float = 120
+) -> Dict[str, float]:
+    """Seconds from spawning the server to: port bound, /ready 200, first activity answered."""
+    timings: Dict[str, float] = {}
+    start = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "aiohttp.web", "-H", "127.0.0.1", "-P", str(port), target,
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() - start < timeout:
+                if "bound" not in timings:
+                    try:
+                        _, writer = await asyncio.open_connection("127.0.0.1", port)
+                        writer.close()
+                        timings["bound"] = time.monotonic() - start
+                    except OSError:
+                        await asyncio.sleep(0.005)
+                        continue
+                if "first_activity" not in timings:
+                    await session.post(base + "/api/messages", json=_activity(service_url))
+                    timings["first_activity"] = time.monotonic() - start
+                async with session.get(base + "/ready") as response:
+                    if response.status == 200:
+                        timings["ready"] = time.monotonic() - start
+                        break
+                await asyncio.sleep(0.01)
+    finally:
+        process.terminate()
+        await process.wait()
+    return timings
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main(args):
+    env = dict(os.environ)
+    # Offline: no Application Insights, no bot authentication.
+    env.update({"APPINSIGHTS_INSTRUMENTATIONKEY": "", "CHATBOT_BOT_ID": "", "CHATBOT_BOT_PASSWORD": ""})
+
+    lines = importtime_report(importtime("app", env), top=args.top)
+    connector = FakeConnector()
+    await connector.start()
+    lines += ["", f"time to serve, best of {args.repeat} (s):", f"  {'target':<22} {'bound':>7} {'first':>7} {'ready':>7}"]
+    for target in ("app:init_func", "fast_start:init_func"):
+        runs = [await time_to_serve(target, _free_port(), env, connector.url) for _ in range(args.repeat)]
+        best = {key: min(run.get(key, float("nan")) for run in runs) for key in ("bound", "first_activity", "ready")}
+        lines.append(f"  {target:<22} {best['bound']:7.2f} {best['first_activity']:7.2f} {best['ready']:7.2f}")
+
+    await connector.stop()
+
+    report = "\n".join(lines) + "\n"
+    print(report, end="")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            report_file.write(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report", default=None, help="also write the report to this file")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
@@ -0,0 +1,80 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Size and encode/decode time of conversation state, jsonpickle vs StateCodec.
+
+    python -m p10_03_load.bench_state --number 500
+
+Plays one booking conversation against a MemoryStorage and snapshots the
+conversation state after every turn. "jsonpickle" is what SqliteStorage
+(and BlobStorage) write; "deepcopy" is what MemoryStorage pays on every
+write; the codec rows are StateCodec without and with compression.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import timeit
+
+from botbuilder.core import ConversationState, MemoryStorage, UserState
+from botbuilder.core.adapters import TestAdapter
+from jsonpickle import encode
+from jsonpickle.unpickler import Unpickler
+
+from bots import DialogAndWelcomeBot
+from config import DefaultConfig
+from dialogs import BookingDialog, MainDialog
+from helpers.fast_path_router import FastPathRouter
+from storage import StateCodec
+
+TURNS = ["hi", "book a flight", "Paris", "Rome", "June 5th 2025", "June 20th 2025"]
+
+
+async def snapshots() -> list:
+    storage = MemoryStorage()
+    router = FastPathRouter.from_file(DefaultConfig().FAST_PATH_RULES, "on")
+    bot = DialogAndWelcomeBot(
+        ConversationState(storage), UserState(storage), MainDialog(None, BookingDialog(), fast_path_router=router), None
+    )
+    adapter = TestAdapter(bot.on_turn)
+    states = []
+    for text in TURNS:
+        await adapter.receive_activity(text)
+        states.append(copy.deepcopy(storage.memory["test/conversations/Convo1"]))
+    return states
+
+
+def main(args):
+    states = asyncio.get_event_loop().run_until_complete(snapshots())
+    codecs = {
+        "codec": StateCodec(compress_above=0),
+        "codec+zlib": StateCodec(compress_above=args.compress_above),
+    }
+    cases = {
+        "jsonpickle": (encode, lambda text: Unpickler().restore(json.loads(text))),
+        "deepcopy": (copy.deepcopy, None),
+    }
+    cases.update({name: (codec.encode, codec.decode) for name, codec in codecs.items()})
+
+    print(f"{len(states)} turns: {', '.join(TURNS)}")
+    print(f"{'':>12} {'bytes/turn':>11} {'max':>6} {'encode us':>10} {'decode us':>10}")
+    for name, (encoder, decoder) in cases.items():
+        encoded = [encoder(state) for state in states]
+        sizes = [len(value) for value in encoded] if isinstance(encoded[0], (str, bytes)) else None
+        encode_time = min(
+            timeit.repeat(lambda: [encoder(state) for state in states], number=args.number, repeat=args.repeat)
+        ) / (args.number * len(states))
+        decode_time = float("nan")
+        if decoder is not None:
+            decode_time = min(
+                timeit.repeat(lambda: [decoder(value) for value in encoded], number=args.number, repeat=args.repeat)
+            ) / (args.number * len(states))
+        size = f"{sum(sizes) / len(sizes):11.0f} {max(sizes):6d}" if sizes else f"{'-':>11} {'-':>6}"
+        print(f"{name:>12} {size} {encode_time * 1e6:10.1f} {decode_time * 1e6:10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--compress-above", type=int, default=1024)
+    main(parser.parse_args())
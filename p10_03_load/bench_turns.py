@@ -0,0 +1,100 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Cost of state handling in the dialog turn loop, per storage setup.
+
+    python -m p10_03_load.bench_turns --conversations 50
+
+Plays the same booking turns through ``DialogAndWelcomeBot`` and a
+``TestAdapter`` with:
+
+- "memory": MemoryStorage with ConversationState/UserState, as shipped by
+  the Bot Framework (jsonpickle hashes on load and save, deep copies);
+- "codec": the same over a CodecStorage;
+- "cache": CachedConversationState/CachedUserState over a StateCache.
+
+Reports the whole turn and the state load/save part (``bot_state_seconds``)
+in microseconds, then, in a separate pass under tracemalloc, the peak memory
+allocated during a turn on top of what was live before it.
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from botbuilder.core import ConversationState, MemoryStorage, UserState
+from botbuilder.core.adapters import TestAdapter
+
+from bots import DialogAndWelcomeBot
+from config import DefaultConfig
+from dialogs import BookingDialog, MainDialog
+from helpers.fast_path_router import FastPathRouter
+from helpers.metrics import STATE_SECONDS
+from storage import CachedConversationState, CachedUserState, CodecStorage, StateCache
+
+TURNS = ["hi", "book a flight", "Paris", "Rome", "June 5th 2025", "June 20th 2025"]
+
+SETUPS = {
+    "memory": lambda: (MemoryStorage(), ConversationState, UserState),
+    "codec": lambda: (CodecStorage(MemoryStorage()), ConversationState, UserState),
+    "cache": lambda: (StateCache(sweep_interval=0), CachedConversationState, CachedUserState),
+}
+
+
+def _state_seconds() -> float:
+    return sum(STATE_SECONDS.labels(operation).sum for operation in ("load", "save"))
+
+
+async def run(setup: str, conversations: int, traced: bool = False) -> dict:
+    storage, conversation_state, user_state = SETUPS[setup]()
+    router = FastPathRouter.from_file(DefaultConfig().FAST_PATH_RULES, "on")
+    dialog = MainDialog(None, BookingDialog(), fast_path_router=router)
+    bot = DialogAndWelcomeBot(conversation_state(storage), user_state(storage), dialog, None)
+    adapters = [TestAdapter(bot.on_turn) for _ in range(conversations)]
+    for index, adapter in enumerate(adapters):
+        adapter.template.conversation.id = f"conversation-{index}"
+
+    state_before = _state_seconds()
+    peaks = []
+    start = time.perf_counter()
+    for text in TURNS:
+        for adapter in adapters:
+            if traced:
+                # Also resets the peak.
+                tracemalloc.clear_traces()
+            await adapter.receive_activity(text)
+            if traced:
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            adapter.activity_buffer.clear()
+    elapsed = time.perf_counter() - start
+
+    turns = conversations * len(TURNS)
+    if traced:
+        return {"peak_kb": sum(peaks) / len(peaks) / 1024}
+    return {
+        "turn_us": elapsed / turns * 1e6,
+        "state_us": (_state_seconds() - state_before) / turns * 1e6,
+    }
+
+
+async def main(args):
+    # First run of each setup only warms the recognizers and imports.
+    for setup in SETUPS:
+        await run(setup, 2)
+    print(f"{args.conversations} conversations x {len(TURNS)} turns, best of {args.repeat}")
+    print(f"{'':>8} {'turn us':>9} {'state us':>9} {'peak KB':>9}")
+    for setup in SETUPS:
+        runs = [await run(setup, args.conversations) for _ in range(args.repeat)]
+        best = {key: min(result[key] for result in runs) for key in runs[0]}
+        tracemalloc.start()
+        try:
+            best.update(await run(setup, args.conversations, traced=True))
+        finally:
+            tracemalloc.stop()
+        print(f"{setup:>8} {best['turn_us']:9.0f} {best['state_us']:9.0f} {best['peak_kb']:9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.get_event_loop().run_until_complete(main(parser.parse_args()))
@@ -0,0 +1,347 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Replay multi-turn booking conversations against ``/api/messages``.
+
+Conversations are built from the labeled datasets: a greeting, an opening
+utterance, then whatever slot the bot asks for next (cities, dates, budget)
+until it books or gives up. Replies are received by a fake connector
+service, so the bot runs its normal outbound path.
+
+By default the bot (``app.init_func``) and the LUIS stand-in run inside
+this process, which also lets us report memory growth:
+
+    python -m p10_03_load.load_generator --conversations 10,50,100 --concurrency 25
+
+A turn answered 503 with Retry-After (admission control, see
+helpers/admission.py) is sent again after that delay, as a channel would,
+up to MAX_RETRIES times; "rejected" counts those answers. ``--luis-tps``
+makes the LUIS stand-in answer 429 above that rate.
+
+Use ``--bot-url`` to target an already running bot instead; it must run
+with empty CHATBOT_BOT_ID/CHATBOT_BOT_PASSWORD to accept unauthenticated
+activities (and an empty APPINSIGHTS_INSTRUMENTATIONKEY when offline).
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from p10_03_load.datasets import DATASETS
+
+CHANNEL_ID = "loadtest"
+MAX_TURNS = 12
+MAX_RETRIES = 5
+
+# Bot prompt (lower-cased substring) -> slot the simulated user answers with.
+PROMPT_SLOTS = [
+    ("from what city", "from_city"),
+    ("to what city", "to_city"),
+    ("when do you want to leave", "from_date"),
+    ("when do you want to come back", "to_date"),
+    ("travel date", "from_date"),
+    ("budget", "budget"),
+    ("please confirm", "confirm"),
+]
+DONE_PROMPTS = ("flight is booked", "did not understand", "what else can i do")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        # ru_maxrss is a high-water mark, good enough where /proc is missing.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class ConversationSource:
+    """Samples openings and slot answers from the labeled utterances."""
+
+    def __init__(self, datasets: str = DATASETS, seed: int = 1):
+        utterances = []
+        for name in ("utterances_train.json", "utterances_test.json"):
+            with open(os.path.join(datasets, name), encoding="utf-8") as dataset_file:
+                data = json.load(dataset_file)
+            utterances.extend(next(iter(data.values())) if isinstance(data, dict) else data)
+
+        self.rng = random.Random(seed)
+        self.openings = [u["text"] for u in utterances if u["intent"] != "None"]
+        self.greetings = [u["text"] for u in utterances if u["intent"] == "None"]
+        self.slots = defaultdict(list)
+        for utterance in utterances:
+            for entity in utterance["entities"]:
+                value = utterance["text"][entity["startPos"]:entity["endPos"] + 1]
+                if entity["entity"] in ("from_city", "to_city"):
+                    self.slots["city"].append(value)
+                elif entity["entity"] == "budget":
+                    self.slots["budget"].append(value)
+
+    def opening(self) -> str:
+        return self.rng.choice(self.openings)
+
+    def greeting(self) -> str:
+        return self.rng.choice(self.greetings)
+
+    def answer(self, slot: str) -> str:
+        if slot in ("from_city", "to_city"):
+            return self.rng.choice(self.slots["city"])
+        if slot in ("from_date", "to_date"):
+            # DateResolverDialog only accepts definite dates.
+            day = datetime.now() + timedelta(days=self.rng.randint(7, 300))
+            return day.strftime("%d %B %Y")
+        if slot == "budget":
+            return self.rng.choice(self.slots["budget"] or ["500"])
+        return "yes"
+
+
+class FakeConnector:
+    """Minimal Bot Connector service collecting the bot's replies."""
+
+    def __init__(self):
+        self.replies: Dict[str, List[dict]] = defaultdict(list)
+        self.runner = None
+        self.url = None
+
+    async def receive(self, request: web.Request) -> web.Response:
+        activity = await request.json()
+        self.replies[request.match_info["conversation_id"]].append(activity)
+        return web.json_response({"id": str(uuid.uuid4())})
+
+    def take(self, conversation_id: str) -> List[dict]:
+        return self.replies.pop(conversation_id, [])
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        app = web.Application()
+        app.router.add_post("/v3/conversations/{conversation_id}/activities", self.receive)
+        app.router.add_post("/v3/conversations/{conversation_id}/activities/{activity_id}", self.receive)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.turns = 0
+        self.errors = 0
+        self.rejected = 0
+        self.conversations = 0
+        self.booked = 0
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            "conversations": self.conversations,
+            "turns": self.turns,
+            "booked": self.booked,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "error_rate": self.errors / self.turns if self.turns else 0.0,
+            "turns_per_s": self.turns / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p95_ms": percentile(self.latencies, 95) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+        }
+
+
+def make_activity(connector_url: str, conversation_id: str, activity_type: str, text: str = None) -> dict:
+    activity = {
+        "type": activity_type,
+        "id": str(uuid.uuid4()),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "serviceUrl": connector_url,
+        "channelId": CHANNEL_ID,
+        "from": {"id": "user-" + conversation_id, "name": "User"},
+        "conversation": {"id": conversation_id},
+        "recipient": {"id": "bot", "name": "Bot"},
+        "locale": "en-US",
+    }
+    if text is not None:
+        activity["text"] = text
+    if activity_type == "conversationUpdate":
+        activity["membersAdded"] = [activity["from"], activity["recipient"]]
+    return activity
+
+
+def next_user_text(source: ConversationSource, replies: List[dict]) -> str:
+    """Answer the last prompt, or None when the conversation is over."""
+    text = " ".join(r.get("text") or "" for r in replies if r.get("type") == "message").lower()
+    if any(done in text for done in DONE_PROMPTS):
+        return None
+    for prompt, slot in reversed(PROMPT_SLOTS):
+        if prompt in text:
+            return source.answer(slot)
+    return None
+
+
+async def run_conversation(
+    session: aiohttp.ClientSession,
+    bot_url: str,
+    connector: FakeConnector,
+    source: ConversationSource,
+    stats: LoadStats,
+):
+    conversation_id = str(uuid.uuid4())
+    script = [("conversationUpdate", None), ("message", source.greeting()), ("message", source.opening())]
+
+    turns = 0
+    while script and turns < MAX_TURNS:
+        activity_type, text = script.pop(0)
+        payload = make_activity(connector.url, conversation_id, activity_type, text)
+
+        start = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            retry_after = None
+            try:
+                async with session.post(bot_url, json=payload) as response:
+                    await response.read()
+                    failed = response.status >= 400
+                    if response.status == 503 and "Retry-After" in response.headers:
+                        retry_after = float(response.headers["Retry-After"])
+            except aiohttp.ClientError:
+                failed = True
+            if retry_after is None or attempt == MAX_RETRIES:
+                break
+            stats.rejected += 1
+            await asyncio.sleep(retry_after)
+        stats.latencies.append(time.perf_counter() - start)
+        stats.turns += 1
+        turns += 1
+
+        replies = connector.take(conversation_id)
+        if failed or any("encountered an error" in (r.get("text") or "") for r in replies):
+            stats.errors += 1
+            break
+        if any("flight is booked" in (r.get("text") or "") for r in replies):
+            stats.booked += 1
+            break
+
+        if not script and activity_type == "message":
+            answer = next_user_text(source, replies)
+            if answer is not None:
+                script.append(("message", answer))
+
+    stats.conversations += 1
+
+
+async def run_stage(bot_url: str, connector: FakeConnector, source: ConversationSource, conversations: int, concurrency: int) -> dict:
+    stats = LoadStats()
+    semaphore = asyncio.Semaphore(concurrency)
+    connector_limit = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector_limit) as session:
+        async def bounded():
+            async with semaphore:
+                await run_conversation(session, bot_url, connector, source, stats)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[bounded() for _ in range(conversations)])
+        elapsed = time.perf_counter() - start
+
+    return stats.report(elapsed)
+
+
+async def start_in_process_bot(luis_latency: str, luis_tps: float = 0.0) -> (str, list):
+    """Start the LUIS stand-in and app.init_func on ephemeral ports."""
+    from p10_03_load.luis_stub import LuisStub, parse_latency
+
+    stub = LuisStub.from_datasets(latency=parse_latency(luis_latency), tps=luis_tps)
+    stub_runner = web.AppRunner(stub.app(), access_log=None)
+    await stub_runner.setup()
+    stub_site = web.TCPSite(stub_runner, "127.0.0.1", 0)
+    await stub_site.start()
+    stub_port = stub_site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+
+    # Configuration is read when app is imported.
+    os.environ["LUIS_PRED_ENDPOINT"] = f"http://127.0.0.1:{stub_port}"
+    os.environ["CHATBOT_BOT_ID"] = ""
+    os.environ["CHATBOT_BOT_PASSWORD"] = ""
+    os.environ["APPINSIGHTS_INSTRUMENTATIONKEY"] = ""
+    import app  # pylint: disable=import-outside-toplevel
+
+    bot_runner = web.AppRunner(app.init_func(None), access_log=None)
+    await bot_runner.setup()
+    bot_site = web.TCPSite(bot_runner, "127.0.0.1", 0)
+    await bot_site.start()
+    bot_port = bot_site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+
+    return f"http://127.0.0.1:{bot_port}/api/messages", [bot_runner, stub_runner]
+
+
+async def main(args):
+    connector = FakeConnector()
+    await connector.start()
+
+    runners = []
+    bot_url = args.bot_url
+    if not bot_url:
+        bot_url, runners = await start_in_process_bot(args.luis_latency, args.luis_tps)
+
+    source = ConversationSource(seed=args.seed)
+    in_process = not args.bot_url
+    gc.collect()
+    baseline = rss_mb()
+    total = 0
+
+    try:
+        for conversations in args.conversations:
+            if in_process:
+                sys.modules["app"].LOOP_LAG.max = 0.0
+            report = await run_stage(bot_url, connector, source, conversations, args.concurrency)
+            total += conversations
+            if in_process:
+                # Includes the load generator itself, which shares the loop.
+                report["loop_lag_max_ms"] = sys.modules["app"].LOOP_LAG.max * 1000
+                gc.collect()
+                growth = rss_mb() - baseline
+                report["rss_growth_mb"] = growth
+                report["kb_per_conversation"] = growth * 1024 / total
+            print(json.dumps(report))
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+        await connector.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bot-url", default=None, help="e.g. http://localhost:8000/api/messages")
+    parser.add_argument(
+        "--conversations", default="10,50,100",
+        type=lambda value: [int(v) for v in value.split(",")],
+        help="comma separated conversation counts, run one stage after the other",
+    )
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--luis-latency", default="lognormal:0.08,0.4", help="in-process LUIS stand-in latency")
+    parser.add_argument("--luis-tps", type=float, default=0.0, help="LUIS stand-in rate limit (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.get_event_loop().run_until_complete(main(args))
@@ -0,0 +1,221 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Local stand-in for the LUIS v3 prediction endpoint.
+
+Answers ``POST`` (``LuisRecognizer``) and ``GET`` (``get_prediction_luis``)
+prediction requests from the labeled utterances in ``00_data/datasets``;
+anything else is predicted by the in-process ``OfflineRecognizer``. Latency,
+error rate and throttling are configurable so the bot can be load-tested
+without LUIS quota:
+
+    python -m p10_03_load.luis_stub --port 8081 --latency lognormal:0.08,0.4 \\
+        --error-rate 0.01 --tps 50
+    LUIS_PRED_ENDPOINT=http://localhost:8081 python app.py
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+from typing import Callable, Dict, List
+
+from aiohttp import web
+
+from helpers.recognition_cache import normalize_text
+from offline_recognizer import ENTITY_NAMES, DATE_ENTITIES, OfflineRecognizer, resolve_date
+from p10_03_load.datasets import DATASETS
+
+_PREDICT_PATH_RE = re.compile(
+    r"/+luis/prediction/v3\.0/apps/(?P<app_id>[^/]+)/(?:slots|versions)/(?P<slot>[^/]+)/predict$"
+)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Build a sampler from ``fixed:s``, ``uniform:lo,hi``, ``normal:mu,sigma``
+    or ``lognormal:median,sigma`` (all in seconds)."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second with bursts up to ``rate``."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def _labeled_prediction(utterance: dict):
+    """(intent, score, entities) in OfflineRecognizer.predict form for a labeled utterance."""
+    text = utterance["text"]
+    entities, instances, datetimes = {}, {}, []
+    for entity in utterance["entities"]:
+        name = entity["entity"]
+        if name not in ENTITY_NAMES:
+            continue
+        start, end = entity["startPos"], entity["endPos"] + 1
+        span = text[start:end]
+        entities.setdefault(name, []).append(span)
+        instances.setdefault(name, []).append(
+            {"type": name, "text": span, "startIndex": start, "endIndex": end}
+        )
+        if name in DATE_ENTITIES:
+            resolved = resolve_date(span)
+            if resolved:
+                datetimes.append(resolved)
+
+    if datetimes:
+        entities["datetime"] = datetimes
+    entities["$instance"] = instances
+    return utterance["intent"], 0.99, entities
+
+
+def to_luis_v3(query: str, intent: str, score: float, entities: dict) -> dict:
+    """Shape a prediction like the raw LUIS v3 JSON response."""
+    raw_entities: Dict[str, object] = {}
+    raw_instances: Dict[str, List[dict]] = {}
+
+    for name, values in entities.items():
+        if name == "$instance":
+            continue
+        if name == "datetime":
+            raw_entities["datetimeV2"] = [
+                {"type": dt["type"], "values": [{"timex": t, "resolution": []} for t in dt["timex"]]}
+                for dt in values
+            ]
+        else:
+            raw_entities[name] = values
+
+    for name, instances in entities.get("$instance", {}).items():
+        raw_instances[name] = [
+            {
+                "type": name,
+                "text": inst["text"],
+                "startIndex": inst["startIndex"],
+                "length": inst["endIndex"] - inst["startIndex"],
+                "modelTypeId": 1,
+                "modelType": "Entity Extractor",
+                "recognitionSources": ["model"],
+            }
+            for inst in instances
+        ]
+    raw_entities["$instance"] = raw_instances
+
+    return {
+        "query": query,
+        "prediction": {
+            "topIntent": intent,
+            "intents": {intent: {"score": score}},
+            "entities": raw_entities,
+        },
+    }
+
+
+class LuisStub:
+    def __init__(
+        self,
+        utterances: List[dict],
+        recognizer: OfflineRecognizer = None,
+        latency: Callable[[], float] = lambda: 0.0,
+        error_rate: float = 0.0,
+        tps: float = 0.0,
+    ):
+        self._labeled = {normalize_text(u["text"]): u for u in utterances}
+        self._recognizer = recognizer
+        self.latency = latency
+        self.error_rate = error_rate
+        self._bucket = TokenBucket(tps) if tps else None
+        self.stats = {"requests": 0, "labeled": 0, "predicted": 0, "throttled": 0, "errors": 0}
+
+    @classmethod
+    def from_datasets(cls, datasets: str = DATASETS, **kwargs) -> "LuisStub":
+        utterances = []
+        for name in ("utterances_train.json", "utterances_test.json"):
+            with open(os.path.join(datasets, name), encoding="utf-8") as dataset_file:
+                data = json.load(dataset_file)
+            utterances.extend(next(iter(data.values())) if isinstance(data, dict) else data)
+
+        recognizer = OfflineRecognizer.from_file(os.path.join(datasets, "utterances_train.json"))
+        return cls(utterances, recognizer, **kwargs)
+
+    def predict(self, query: str) -> dict:
+        labeled = self._labeled.get(normalize_text(query))
+        if labeled is not None:
+            self.stats["labeled"] += 1
+            return to_luis_v3(query, *_labeled_prediction(labeled))
+
+        self.stats["predicted"] += 1
+        if self._recognizer is None:
+            return to_luis_v3(query, "None", 1.0, {})
+        return to_luis_v3(query, *self._recognizer.predict(query))
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.path == "/stats":
+            return web.json_response(self.stats)
+        if not _PREDICT_PATH_RE.match(request.path):
+            raise web.HTTPNotFound()
+
+        self.stats["requests"] += 1
+        await asyncio.sleep(self.latency())
+
+        if self._bucket is not None and not self._bucket.take():
+            self.stats["throttled"] += 1
+            return web.json_response(
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                status=429,
+                headers={"Retry-After": "1"},
+            )
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"error": {"code": "500"}}, status=500)
+
+        if request.method == "POST":
+            query = (await request.json()).get("query", "")
+        else:
+            query = request.query.get("query", "")
+
+        return web.json_response(self.predict(query))
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:s | uniform:lo,hi | normal:mu,sigma | lognormal:median,sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tps", type=float, default=0.0, help="requests per second before answering 429 (0 = unlimited)")
+    args = parser.parse_args()
+
+    stub = LuisStub.from_datasets(
+        latency=parse_latency(args.latency), error_rate=args.error_rate, tps=args.tps
+    )
+    web.run_app(stub.app(), host=args.host, port=args.port)
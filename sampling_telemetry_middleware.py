@@ -0,0 +1,201 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""TelemetryLoggerMiddleware that samples routine turns and trims their text."""
+import contextvars
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict
+
+from botbuilder.core import BotTelemetryClient, TurnContext
+from botbuilder.core.telemetry_constants import TelemetryConstants
+from botbuilder.core.telemetry_logger_middleware import TelemetryLoggerMiddleware
+from botbuilder.schema import Activity
+
+TEXT_PROPERTIES = (TelemetryConstants.TEXT_PROPERTY, TelemetryConstants.SPEAK_PROPERTY)
+TEXT_HASH_PROPERTY = "textHash"
+
+
+class _Turn:
+    __slots__ = ("keep", "received")
+
+    def __init__(self, keep: bool):
+        self.keep = keep
+        # Receive event of a dropped turn, logged after all if the turn fails.
+        self.received: Activity = None
+
+
+# Set by on_turn and read by the send/update/delete hooks, which do not get
+# the turn context. on_turn_error runs in the same task after on_turn has
+# returned, so the value is deliberately not reset.
+_CURRENT_TURN = contextvars.ContextVar("sampling_telemetry_turn", default=None)
+
+
+class SamplingTelemetryLoggerMiddleware(TelemetryLoggerMiddleware):
+    """Logs the receive/send events of a sample of turns.
+
+    A ``sample_rate`` share of the turns is kept (all their events); once
+    more than ``target_turns_per_second`` turns arrive (measured over
+    ``window`` seconds), the rate is scaled down so the logged volume stays
+    around the target. Turns that raise are always logged, along with the
+    exception. Dialog telemetry (waterfall events, the "YES answer"/"NO
+    answer" traces) goes straight to the telemetry client and is not sampled.
+
+    Text longer than ``max_text_length`` is truncated and a ``textHash`` of
+    the full text added; with ``hash_text`` the text is replaced by its hash.
+    """
+
+    def __init__(
+        self,
+        telemetry_client: BotTelemetryClient,
+        log_personal_information: bool,
+        sample_rate: float = 1.0,
+        target_turns_per_second: float = 0,
+        window: float = 10,
+        max_text_length: int = 256,
+        hash_text: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(telemetry_client, log_personal_information)
+        self.sample_rate = sample_rate
+        self.target_turns_per_second = target_turns_per_second
+        self.window = window
+        self.max_text_length = max_text_length
+        self.hash_text = hash_text
+        self._clock = clock
+
+        self.effective_rate = sample_rate
+        self._window_start = clock()
+        self._window_turns = 0
+        # Keeps exactly `rate` of the turns without randomness.
+        self._credit = 0.0
+
+        self.turns = 0
+        self.turns_kept = 0
+        self.events_logged = 0
+        self.events_sampled_out = 0
+        self.errors = 0
+        self.texts_trimmed = 0
+        self.chars_trimmed = 0
+        self.logging_time = 0.0
+
+    def _adapt(self):
+        now = self._clock()
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+        observed = self._window_turns / elapsed
+        if self.target_turns_per_second and observed > self.target_turns_per_second:
+            self.effective_rate = self.sample_rate * self.target_turns_per_second / observed
+        else:
+            self.effective_rate = self.sample_rate
+        self._window_start = now
+        self._window_turns = 0
+
+    def _sample(self) -> bool:
+        self.turns += 1
+        self._window_turns += 1
+        self._adapt()
+
+        self._credit += self.effective_rate
+        if self._credit >= 1:
+            self._credit -= 1
+            self.turns_kept += 1
+            return True
+        return False
+
+    async def on_turn(self, context: TurnContext, logic_fn: Callable[[TurnContext], Awaitable]):
+        turn = _Turn(self._sample())
+        _CURRENT_TURN.set(turn)
+        try:
+            await super().on_turn(context, logic_fn)
+        except Exception as error:
+            self.errors += 1
+            if not turn.keep:
+                # The error messages sent by on_turn_error are logged too.
+                turn.keep = True
+                if turn.received is not None:
+                    self.events_sampled_out -= 1
+                    await self._log(super().on_receive_activity, turn.received)
+            properties = {TelemetryConstants.CONVERSATION_ID_PROPERTY: context.activity.conversation.id}
+            self.telemetry_client.track_exception(type(error), error, error.__traceback__, properties)
+            raise
+
+    def _kept(self) -> bool:
+        turn = _CURRENT_TURN.get()
+        return turn is None or turn.keep
+
+    async def _log(self, track: Callable[[Activity], Awaitable], activity: Activity):
+        start = time.perf_counter()
+        await track(activity)
+        self.logging_time += time.perf_counter() - start
+        self.events_logged += 1
+
+    async def on_receive_activity(self, activity: Activity) -> None:
+        if not self._kept():
+            _CURRENT_TURN.get().received = activity
+            self.events_sampled_out += 1
+            return
+        await self._log(super().on_receive_activity, activity)
+
+    async def on_send_activity(self, activity: Activity) -> None:
+        if not self._kept():
+            self.events_sampled_out += 1
+            return
+        await self._log(super().on_send_activity, activity)
+
+    async def on_update_activity(self, activity: Activity) -> None:
+        if not self._kept():
+            self.events_sampled_out += 1
+            return
+        await self._log(super().on_update_activity, activity)
+
+    async def on_delete_activity(self, activity: Activity) -> None:
+        if not self._kept():
+            self.events_sampled_out += 1
+            return
+        await self._log(super().on_delete_activity, activity)
+
+    def _trim(self, properties: Dict[str, str]) -> Dict[str, str]:
+        for name in TEXT_PROPERTIES:
+            text = properties.get(name)
+            if not text or (not self.hash_text and len(text) <= self.max_text_length):
+                continue
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+            properties[TEXT_HASH_PROPERTY] = digest
+            trimmed = "" if self.hash_text else text[:self.max_text_length] + "..."
+            self.texts_trimmed += 1
+            self.chars_trimmed += max(0, len(text) - len(trimmed))
+            if self.hash_text:
+                del properties[name]
+            else:
+                properties[name] = trimmed
+        return properties
+
+    async def fill_receive_event_properties(
+        self, activity: Activity, additional_properties: Dict[str, str] = None
+    ) -> Dict[str, str]:
+        return self._trim(await super().fill_receive_event_properties(activity, additional_properties))
+
+    async def fill_send_event_properties(
+        self, activity: Activity, additional_properties: Dict[str, str] = None
+    ) -> Dict[str, str]:
+        return self._trim(await super().fill_send_event_properties(activity, additional_properties))
+
+    async def fill_update_event_properties(
+        self, activity: Activity, additional_properties: Dict[str, str] = None
+    ) -> Dict[str, str]:
+        return self._trim(await super().fill_update_event_properties(activity, additional_properties))
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "turns": self.turns,
+            "turns_kept": self.turns_kept,
+            "effective_rate": self.effective_rate,
+            "events_logged": self.events_logged,
+            "events_sampled_out": self.events_sampled_out,
+            "errors": self.errors,
+            "texts_trimmed": self.texts_trimmed,
+            "chars_trimmed": self.chars_trimmed,
+            "logging_time": self.logging_time,
+        }
@@ -1 +1,3 @@
-python3.8 -m aiohttp.web -H 0.0.0.0 -P 8000 app:init_func
+python3.8 -m aiohttp.web -H 0.0.0.0 -P 8000 fast_start:init_func
+# Without background loading: python3.8 -m aiohttp.web -H 0.0.0.0 -P 8000 app:init_func
+# Multi-core: WORKERS=4 STORAGE=sqlite python3.8 launcher.py --port 8000
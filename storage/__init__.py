@@ -0,0 +1,21 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Storage module."""
+from .codec_storage import CodecStorage
+from .delta_sqlite_storage import DeltaSqliteStorage
+from .evicting_memory_storage import EvictingMemoryStorage
+from .sqlite_storage import SqliteStorage
+from .state_cache import CachedConversationState, CachedUserState, StateCache, save_all_changes
+from .state_codec import StateCodec
+
+__all__ = [
+    "CachedConversationState",
+    "CachedUserState",
+    "CodecStorage",
+    "DeltaSqliteStorage",
+    "EvictingMemoryStorage",
+    "SqliteStorage",
+    "StateCache",
+    "StateCodec",
+    "save_all_changes",
+]
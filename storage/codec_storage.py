@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Storage wrapper keeping state items encoded with a StateCodec."""
+from typing import Dict, List
+
+from botbuilder.core import Storage
+
+from .sqlite_storage import _get_e_tag, _set_e_tag
+from .state_codec import StateCodec
+
+
+class CodecStorage(Storage):
+    """Stores every item in ``storage`` as ``{"e_tag": ..., "state": bytes}``.
+
+    Works under any ``Storage``: the inner storage only sees small dicts of
+    bytes (cheap for ``MemoryStorage`` to deep-copy) and keeps handling
+    e_tags. An e_tag the inner storage sets on the envelope it was given
+    (``SqliteStorage`` does) is copied back to the written item;
+    ``MemoryStorage`` tags its own copy, so the item keeps its old e_tag
+    until it is read again. Values written before the codec was enabled are
+    returned unchanged.
+    """
+
+    def __init__(self, storage: Storage, codec: StateCodec = None):
+        self.storage = storage
+        self.codec = codec or StateCodec()
+
+    async def read(self, keys: List[str]) -> Dict[str, object]:
+        items = await self.storage.read(keys)
+        for key, value in items.items():
+            if isinstance(value, dict) and isinstance(value.get("state"), bytes):
+                item = self.codec.decode(value["state"])
+                e_tag = value.get("e_tag")
+                if e_tag is not None:
+                    _set_e_tag(item, e_tag)
+                items[key] = item
+        return items
+
+    async def write(self, changes: Dict[str, object]):
+        if changes is None:
+            raise Exception("Changes are required when writing")
+
+        envelopes = {}
+        for key, item in changes.items():
+            e_tag = _get_e_tag(item)
+            if isinstance(item, dict) and "e_tag" in item:
+                item = {k: v for k, v in item.items() if k != "e_tag"}
+            envelope = {"state": self.codec.encode(item)}
+            if e_tag is not None:
+                envelope["e_tag"] = e_tag
+            envelopes[key] = envelope
+
+        await self.storage.write(envelopes)
+
+        for key, envelope in envelopes.items():
+            e_tag = envelope.get("e_tag")
+            if e_tag is not None and e_tag != _get_e_tag(changes[key]):
+                _set_e_tag(changes[key], e_tag)
+
+    async def delete(self, keys: List[str]):
+        await self.storage.delete(keys)
+
+    async def close(self):
+        close = getattr(self.storage, "close", None)
+        if close is not None:
+            await close()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        stats = dict(getattr(self.storage, "stats", {}))
+        stats.update({f"codec_{name}": value for name, value in self.codec.stats.items()})
+        return stats
@@ -0,0 +1,195 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""SqliteStorage appending per-write deltas instead of rewriting rows."""
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Tuple
+
+from .sqlite_storage import SqliteStorage, _Pending
+from .state_codec import StateCodec
+
+
+def make_delta(base: bytes, value: bytes) -> bytes:
+    """``value`` deflated with ``base`` as preset dictionary (none for ``b""``)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, base)
+    return compressor.compress(value) + compressor.flush()
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    decompressor = zlib.decompressobj(-15, base)
+    return decompressor.decompress(delta) + decompressor.flush()
+
+
+class _Head(NamedTuple):
+    seq: int
+    e_tag: str
+    value: bytes
+    deltas: int
+    delta_bytes: int
+
+
+class DeltaSqliteStorage(SqliteStorage):
+    """SqliteStorage keeping an append-only log of each key's state.
+
+    Each commit of a key appends one row to ``state_log``: the encoded
+    state deflated with the previous value as dictionary (a delta: a
+    booking turn changes one slot and the top of the dialog stack), or
+    deflated on its own (a snapshot). Reads replay the deltas after the
+    latest snapshot. The codec should not compress (the default one does
+    not): compressed values make poor dictionaries.
+
+    A key is compacted, a snapshot written and its older rows deleted, once
+    it has ``snapshot_every`` deltas or its deltas outweigh the value. A
+    snapshot is also written when this process does not know the latest
+    row of the key (restart, another process wrote it). Rows of the plain
+    ``state`` table are read and replaced by the log on their next write.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 0.05,
+        codec: StateCodec = None,
+        snapshot_every: int = 16,
+        max_heads: int = 10000,
+    ):
+        super(DeltaSqliteStorage, self).__init__(path, flush_interval, codec or StateCodec(compress_above=0))
+        self.snapshot_every = snapshot_every
+        self.max_heads = max_heads
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS state_log (key TEXT NOT NULL, seq INTEGER NOT NULL, e_tag TEXT NOT NULL,"
+            " snapshot INTEGER NOT NULL, value BLOB NOT NULL, PRIMARY KEY (key, seq))"
+        )
+        # Latest row of recently used keys; only touched on the executor thread.
+        self._heads: Dict[str, _Head] = OrderedDict()
+
+        self.snapshots = 0
+        self.deltas = 0
+        self.compacted_rows = 0
+        self.bytes_logical = 0
+        self.bytes_written = 0
+
+    def _remember(self, key: str, head: _Head):
+        self._heads[key] = head
+        self._heads.move_to_end(key)
+        while len(self._heads) > self.max_heads:
+            self._heads.popitem(last=False)
+
+    def _select(self, keys: List[str]) -> Dict[str, Tuple[str, bytes]]:
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connection.execute(
+            f"SELECT key, seq, e_tag, snapshot, value FROM state_log WHERE key IN ({placeholders})"
+            " AND seq >= (SELECT MAX(seq) FROM state_log AS latest WHERE latest.key = state_log.key"
+            " AND latest.snapshot = 1) ORDER BY key, seq",
+            keys,
+        )
+        heads: Dict[str, _Head] = {}
+        for key, seq, e_tag, snapshot, data in rows:
+            if snapshot:
+                heads[key] = _Head(seq, e_tag, apply_delta(b"", data), 0, 0)
+            else:
+                head = heads[key]
+                heads[key] = _Head(
+                    seq, e_tag, apply_delta(head.value, data), head.deltas + 1, head.delta_bytes + len(data)
+                )
+
+        found = {}
+        for key, head in heads.items():
+            self._remember(key, head)
+            found[key] = (head.e_tag, head.value)
+
+        legacy = [key for key in keys if key not in found]
+        if legacy:
+            found.update(super(DeltaSqliteStorage, self)._select(legacy))
+        return found
+
+    def _commit(self, batch: Dict[str, _Pending]) -> int:
+        conflicts = 0
+        heads: Dict[str, _Head] = {}
+        # snapshots, deltas, compacted rows, logical bytes, bytes written
+        counts = [0, 0, 0, 0, 0]
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for key, (value, e_tag, expected) in batch.items():
+                if value is None:
+                    cursor.execute("DELETE FROM state_log WHERE key = ?", (key,))
+                    cursor.execute("DELETE FROM state WHERE key = ?", (key,))
+                    heads[key] = None
+                    continue
+
+                latest = cursor.execute(
+                    "SELECT seq, e_tag FROM state_log WHERE key = ? ORDER BY seq DESC LIMIT 1", (key,)
+                ).fetchone()
+                if latest is None:
+                    legacy = cursor.execute("SELECT e_tag FROM state WHERE key = ?", (key,)).fetchone()
+                    latest = (0, legacy[0] if legacy else None)
+                seq, current = latest
+                if expected is not None and current != expected:
+                    conflicts += 1
+                    continue
+
+                head = self._heads.get(key)
+                data = None
+                if (
+                    head is not None
+                    and (head.seq, head.e_tag) == (seq, current)
+                    and head.deltas < self.snapshot_every
+                    and head.delta_bytes < len(value)
+                ):
+                    data = make_delta(head.value, value)
+
+                if data is None or len(data) >= len(value):
+                    snapshot = make_delta(b"", value)
+                    cursor.execute(
+                        "INSERT INTO state_log (key, seq, e_tag, snapshot, value) VALUES (?, ?, ?, 1, ?)",
+                        (key, seq + 1, e_tag, snapshot),
+                    )
+                    cursor.execute("DELETE FROM state_log WHERE key = ? AND seq <= ?", (key, seq))
+                    counts[2] += cursor.rowcount
+                    if not seq:
+                        cursor.execute("DELETE FROM state WHERE key = ?", (key,))
+                    heads[key] = _Head(seq + 1, e_tag, value, 0, 0)
+                    counts[0] += 1
+                    counts[4] += len(snapshot)
+                else:
+                    cursor.execute(
+                        "INSERT INTO state_log (key, seq, e_tag, snapshot, value) VALUES (?, ?, ?, 0, ?)",
+                        (key, seq + 1, e_tag, data),
+                    )
+                    heads[key] = _Head(seq + 1, e_tag, value, head.deltas + 1, head.delta_bytes + len(data))
+                    counts[1] += 1
+                    counts[4] += len(data)
+                counts[3] += len(value)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+        self.snapshots += counts[0]
+        self.deltas += counts[1]
+        self.compacted_rows += counts[2]
+        self.bytes_logical += counts[3]
+        self.bytes_written += counts[4]
+        for key, head in heads.items():
+            if head is None:
+                self._heads.pop(key, None)
+            else:
+                self._remember(key, head)
+        return conflicts
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        stats = super(DeltaSqliteStorage, self).stats
+        stats.update(
+            {
+                "snapshots": self.snapshots,
+                "deltas": self.deltas,
+                "compacted_rows": self.compacted_rows,
+                "bytes_logical": self.bytes_logical,
+                "bytes_written": self.bytes_written,
+                # Bytes appended per byte of state written: 1.0 rewrites whole values.
+                "write_amplification": self.bytes_written / self.bytes_logical if self.bytes_logical else 0.0,
+            }
+        )
+        return stats
@@ -0,0 +1,122 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""MemoryStorage that forgets idle conversations."""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+from botbuilder.core import MemoryStorage, StoreItem
+
+
+class EvictingMemoryStorage(MemoryStorage):
+    """MemoryStorage bounded by idle time and entry count.
+
+    Keys are kept in least-recently-used order. Entries not read or written
+    for ``idle_ttl`` seconds are removed by a background sweeper every
+    ``sweep_interval`` seconds (and are never returned once expired), and
+    the least recently used entries are dropped as soon as more than
+    ``max_entries`` are resident. Zero disables either limit.
+    """
+
+    def __init__(
+        self,
+        idle_ttl: float = 3600,
+        max_entries: int = 10000,
+        sweep_interval: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super(EvictingMemoryStorage, self).__init__(OrderedDict())
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._last_access: Dict[str, float] = {}
+        self._sweeper: asyncio.Task = None
+
+        self.expired = 0
+        self.evicted = 0
+        self.sweeps = 0
+
+    def _touch(self, key: str):
+        self.memory.move_to_end(key)
+        self._last_access[key] = self._clock()
+
+    def _is_expired(self, key: str, now: float) -> bool:
+        return bool(self.idle_ttl) and now - self._last_access[key] >= self.idle_ttl
+
+    def _remove(self, key: str):
+        del self.memory[key]
+        del self._last_access[key]
+
+    async def read(self, keys: List[str]):
+        self._ensure_sweeper()
+        now = self._clock()
+        for key in keys or []:
+            if key in self.memory:
+                if self._is_expired(key, now):
+                    self._remove(key)
+                    self.expired += 1
+                else:
+                    self._touch(key)
+        return await super(EvictingMemoryStorage, self).read(keys)
+
+    async def write(self, changes: Dict[str, StoreItem]):
+        self._ensure_sweeper()
+        await super(EvictingMemoryStorage, self).write(changes)
+        for key in changes:
+            self._touch(key)
+        self._evict()
+
+    def _evict(self):
+        while self.max_entries and len(self.memory) > self.max_entries:
+            key = next(iter(self.memory))
+            self._remove(key)
+            self.evicted += 1
+
+    async def delete(self, keys: List[str]):
+        await super(EvictingMemoryStorage, self).delete(keys)
+        for key in keys:
+            self._last_access.pop(key, None)
+
+    def sweep(self) -> int:
+        """Drop every idle entry; returns how many were removed."""
+        if not self.idle_ttl:
+            return 0
+
+        now = self._clock()
+        removed = 0
+        # Oldest first: stop at the first entry that is still fresh.
+        while self.memory:
+            key = next(iter(self.memory))
+            if not self._is_expired(key, now):
+                break
+            self._remove(key)
+            removed += 1
+
+        self.expired += removed
+        self.sweeps += 1
+        return removed
+
+    def _ensure_sweeper(self):
+        if self.idle_ttl and self.sweep_interval and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.ensure_future(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "resident": len(self.memory),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "sweeps": self.sweeps,
+        }
@@ -0,0 +1,264 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Durable SQLite storage with write-behind batching."""
+import asyncio
+import json
+import sqlite3
+import sys
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from botbuilder.core import Storage
+from jsonpickle import encode
+from jsonpickle.unpickler import Unpickler
+
+from .state_codec import StateCodec
+
+# value (None for a delete), new e_tag, e_tag the row must still have (None = don't check)
+_Pending = Tuple[str, str, str]
+
+
+def _get_e_tag(item: object) -> str:
+    if isinstance(item, dict):
+        return item.get("e_tag", None)
+    return getattr(item, "e_tag", None)
+
+
+def _set_e_tag(item: object, e_tag: str):
+    if isinstance(item, dict):
+        item["e_tag"] = e_tag
+    elif item is not None:
+        item.e_tag = e_tag
+
+
+class SqliteStorage(Storage):
+    """Storage persisted in a SQLite database in WAL mode.
+
+    Writes are serialized (jsonpickle, as BlobStorage does) immediately and
+    queued; a background task commits the queue in one transaction every
+    ``flush_interval`` seconds, so repeated writes to the same key between
+    two commits cost a single row update. Reads see queued writes.
+
+    E-tags are checked against the latest value known to this process when
+    ``write`` is called (raising ``KeyError`` like ``MemoryStorage``) and
+    again at commit time, so a row changed by another process is not
+    overwritten. Call ``close`` on shutdown to flush the queue.
+
+    With a ``codec`` values are written as BLOBs in its binary format;
+    rows written as jsonpickle text are still read, and the other way round.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.05, codec: StateCodec = None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.codec = codec
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-storage")
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, e_tag TEXT NOT NULL, value TEXT NOT NULL)"
+        )
+
+        self._pending: Dict[str, _Pending] = {}
+        self._flushing: Dict[str, _Pending] = {}
+        self._e_tags: Dict[str, str] = {}
+        self._flusher: asyncio.Task = None
+        self._wakeup: asyncio.Event = None
+
+        self.writes = 0
+        self.coalesced = 0
+        self.commits = 0
+        self.rows_written = 0
+        self.conflicts = 0
+
+    async def _run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, func, *args)
+
+    def _select(self, keys: List[str]) -> Dict[str, Tuple[str, str]]:
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connection.execute(
+            f"SELECT key, e_tag, value FROM state WHERE key IN ({placeholders})", keys
+        )
+        return {key: (e_tag, value) for key, e_tag, value in rows}
+
+    def _encode(self, item: object):
+        return self.codec.encode(item) if self.codec is not None else encode(item)
+
+    def _queued(self, key: str) -> _Pending:
+        if key in self._pending:
+            return self._pending[key]
+        return self._flushing.get(key)
+
+    async def read(self, keys: List[str]) -> Dict[str, object]:
+        if not keys:
+            return {}
+
+        found: Dict[str, Tuple[str, str]] = {}
+        missing = []
+        for key in keys:
+            queued = self._queued(key)
+            if queued is None:
+                missing.append(key)
+            elif queued[0] is not None:
+                found[key] = (queued[1], queued[0])
+
+        if missing:
+            found.update(await self._run(self._select, missing))
+
+        items = {}
+        for key, (e_tag, value) in found.items():
+            if isinstance(value, bytes):
+                # Also readable after switching the codec off.
+                item = (self.codec or StateCodec()).decode(value)
+            else:
+                item = Unpickler().restore(json.loads(value))
+            _set_e_tag(item, e_tag)
+            self._e_tags[key] = e_tag
+            items[key] = item
+        return items
+
+    async def write(self, changes: Dict[str, object]):
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        if not changes:
+            return
+
+        unknown = [key for key in changes if self._queued(key) is None and key not in self._e_tags]
+        if unknown:
+            for key, (e_tag, _) in (await self._run(self._select, unknown)).items():
+                self._e_tags[key] = e_tag
+
+        for key, item in changes.items():
+            e_tag = _get_e_tag(item)
+            if e_tag == "":
+                raise Exception("sqlite_storage.write(): etag missing")
+
+            current = self._e_tags.get(key)
+            if e_tag not in (None, "*") and current is not None and e_tag != current:
+                raise KeyError("Etag conflict.\nOriginal: %s\r\nCurrent: %s" % (e_tag, current))
+
+            new_e_tag = uuid.uuid4().hex
+            if isinstance(item, dict):
+                value = self._encode({k: v for k, v in item.items() if k != "e_tag"})
+            else:
+                value = self._encode(item)
+            # Later writes of the same object in this turn must match the new e_tag.
+            _set_e_tag(item, new_e_tag)
+
+            previous = self._pending.get(key)
+            if previous is not None:
+                self.coalesced += 1
+                # The row in the database still carries the e_tag checked by the first queued write.
+                expected = previous[2]
+            else:
+                expected = current if e_tag not in (None, "*") else None
+
+            self._pending[key] = (value, new_e_tag, expected)
+            self._e_tags[key] = new_e_tag
+            self.writes += 1
+
+        self._schedule_flush()
+
+    async def delete(self, keys: List[str]):
+        for key in keys:
+            self._pending[key] = (None, None, None)
+            self._e_tags.pop(key, None)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+        self._wakeup.set()
+
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _commit(self, batch: Dict[str, _Pending]) -> int:
+        conflicts = 0
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for key, (value, e_tag, expected) in batch.items():
+                if value is None:
+                    cursor.execute("DELETE FROM state WHERE key = ?", (key,))
+                elif expected is None:
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO state (key, e_tag, value) VALUES (?, ?, ?)",
+                        (key, e_tag, value),
+                    )
+                else:
+                    cursor.execute(
+                        "UPDATE state SET e_tag = ?, value = ? WHERE key = ? AND e_tag = ?",
+                        (e_tag, value, key, expected),
+                    )
+                    if cursor.rowcount == 0:
+                        conflicts += 1
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return conflicts
+
+    async def flush(self):
+        """Commit every queued write now."""
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        try:
+            conflicts = await self._run(self._commit, batch)
+        except Exception:  # pylint: disable=broad-except
+            print("\n [SqliteStorage] commit failed, retrying later", file=sys.stderr)
+            traceback.print_exc()
+            # Requeue the batch under the writes queued since, which keep their
+            # value and e_tag but must expect the e_tag still in the database.
+            for key, pending in batch.items():
+                newer = self._pending.get(key)
+                if newer is None:
+                    self._pending[key] = pending
+                elif newer[0] is not None:
+                    self._pending[key] = (newer[0], newer[1], pending[2])
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return
+        finally:
+            self._flushing = {}
+
+        self.commits += 1
+        self.rows_written += len(batch)
+        if conflicts:
+            self.conflicts += conflicts
+            print(f"\n [SqliteStorage] {conflicts} write(s) lost to an e_tag conflict", file=sys.stderr)
+
+    async def close(self):
+        """Flush queued writes and close the database."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        await self._run(self._connection.close)
+        self._executor.shutdown()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        stats = {
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "commits": self.commits,
+            "rows_written": self.rows_written,
+            "conflicts": self.conflicts,
+            "queued": len(self._pending),
+        }
+        if self.codec is not None:
+            stats.update({f"codec_{name}": value for name, value in self.codec.stats.items()})
+        return stats
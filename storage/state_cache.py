@@ -0,0 +1,183 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""In-memory state kept as encoded snapshots, in front of an optional durable storage."""
+import time
+from typing import Callable, Dict, List
+
+from botbuilder.core import BotState, ConversationState, Storage, TurnContext, UserState
+from botbuilder.core.bot_state import CachedBotState
+
+from .evicting_memory_storage import EvictingMemoryStorage
+from .sqlite_storage import _get_e_tag, _set_e_tag
+from .state_codec import StateCodec
+
+
+class StateCache(EvictingMemoryStorage):
+    """EvictingMemoryStorage holding each item as ``{"e_tag": ..., "state": bytes}``.
+
+    The bytes are a ``StateCodec`` snapshot and are never mutated: ``read``
+    decodes a fresh object for the caller (nothing is shared between turns
+    and nothing is deep-copied), ``write`` encodes the item and skips it when
+    the snapshot is byte-for-byte unchanged.
+
+    With a ``storage`` the cache reads through to it on a miss and writes
+    changed items to it, all keys of a ``write`` in one call; its e_tags
+    are kept with the snapshots. Eviction then only drops cached copies.
+    The cache must be the only writer of the conversations it holds, as
+    with the launcher's conversation-affine workers.
+    """
+
+    def __init__(
+        self,
+        storage: Storage = None,
+        codec: StateCodec = None,
+        idle_ttl: float = 3600,
+        max_entries: int = 10000,
+        sweep_interval: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super(StateCache, self).__init__(idle_ttl, max_entries, sweep_interval, clock)
+        self.storage = storage
+        self.codec = codec or StateCodec()
+
+        self.hits = 0
+        self.misses = 0
+        self.unchanged = 0
+        self.written = 0
+
+    def _decode(self, envelope: dict) -> object:
+        item = self.codec.decode(envelope["state"])
+        if envelope["e_tag"] is not None:
+            _set_e_tag(item, envelope["e_tag"])
+        return item
+
+    def _encode(self, item: object) -> bytes:
+        if isinstance(item, dict) and "e_tag" in item:
+            item = {k: v for k, v in item.items() if k != "e_tag"}
+        return self.codec.encode(item)
+
+    def _store(self, key: str, envelope: dict):
+        self.memory[key] = envelope
+        self._touch(key)
+        self._evict()
+
+    async def read(self, keys: List[str]) -> Dict[str, object]:
+        envelopes = await super(StateCache, self).read(keys)
+        self.hits += len(envelopes)
+        items = {key: self._decode(envelope) for key, envelope in envelopes.items()}
+
+        missing = [key for key in keys or [] if key not in envelopes]
+        if missing and self.storage is not None:
+            self.misses += len(missing)
+            for key, item in (await self.storage.read(missing)).items():
+                self._store(key, {"e_tag": _get_e_tag(item), "state": self._encode(item)})
+                items[key] = item
+        return items
+
+    async def write(self, changes: Dict[str, object]):
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        self._ensure_sweeper()
+
+        changed: Dict[str, bytes] = {}
+        for key, item in changes.items():
+            state = self._encode(item)
+            current = self.memory.get(key)
+            if current is not None and current["state"] == state:
+                self.unchanged += 1
+                self._touch(key)
+            else:
+                changed[key] = state
+        if not changed:
+            return
+
+        self.written += len(changed)
+        if self.storage is None:
+            # MemoryStorage checks and assigns the e_tags of the envelopes.
+            await super(StateCache, self).write(
+                {key: {"e_tag": _get_e_tag(changes[key]), "state": state} for key, state in changed.items()}
+            )
+            return
+
+        await self.storage.write({key: changes[key] for key in changed})
+        for key, state in changed.items():
+            self._store(key, {"e_tag": _get_e_tag(changes[key]), "state": state})
+
+    async def delete(self, keys: List[str]):
+        await super(StateCache, self).delete(keys)
+        if self.storage is not None:
+            await self.storage.delete(keys)
+
+    async def close(self):
+        await super(StateCache, self).close()
+        close = getattr(self.storage, "close", None)
+        if close is not None:
+            await close()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        stats = super(StateCache, self).stats
+        stats.update(
+            {"hits": self.hits, "misses": self.misses, "unchanged": self.unchanged, "written": self.written}
+        )
+        stats.update({f"codec_{name}": value for name, value in self.codec.stats.items()})
+        if self.storage is not None:
+            stats.update({f"storage_{name}": value for name, value in getattr(self.storage, "stats", {}).items()})
+        return stats
+
+
+class _UnhashedBotState(CachedBotState):
+    """Cached state whose changes are detected by ``StateCache.write``.
+
+    ``CachedBotState`` flattens the whole state with jsonpickle on load,
+    before saving and after saving to compare hashes.
+    """
+
+    def compute_hash(self, obj: object) -> str:
+        return None
+
+    @property
+    def is_changed(self) -> bool:
+        return True
+
+
+class _StateCacheMixin:
+    """Skips jsonpickle hashing of the state when the storage is a StateCache."""
+
+    async def load(self, turn_context: TurnContext, force: bool = False) -> None:
+        # pylint: disable=no-member
+        if not isinstance(self._storage, StateCache):
+            await super().load(turn_context, force)
+            return
+
+        cached_state = self.get_cached_state(turn_context)
+        if force or not cached_state or not cached_state.state:
+            storage_key = self.get_storage_key(turn_context)
+            items = await self._storage.read([storage_key])
+            turn_context.turn_state[self._context_service_key] = _UnhashedBotState(items.get(storage_key))
+
+
+class CachedConversationState(_StateCacheMixin, ConversationState):
+    """ConversationState for a StateCache."""
+
+
+class CachedUserState(_StateCacheMixin, UserState):
+    """UserState for a StateCache."""
+
+
+async def save_all_changes(turn_context: TurnContext, *bot_states: BotState, force: bool = False):
+    """Save the changes of several BotStates with one write per storage."""
+    writes = {}
+    for bot_state in bot_states:
+        cached_state = bot_state.get_cached_state(turn_context)
+        if cached_state is None or not (force or cached_state.is_changed):
+            continue
+        storage = bot_state._storage  # pylint: disable=protected-access
+        changes, cached_states = writes.setdefault(id(storage), (storage, {}, []))[1:]
+        changes[bot_state.get_storage_key(turn_context)] = cached_state.state
+        cached_states.append(cached_state)
+
+    for storage, changes, cached_states in writes.values():
+        await storage.write(changes)
+        for cached_state in cached_states:
+            cached_state.hash = cached_state.compute_hash(cached_state.state)
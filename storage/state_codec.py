@@ -0,0 +1,434 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+"""Compact binary encoding of bot state.
+
+jsonpickle writes a conversation's dialog stack as nested JSON naming the
+class of every object and every attribute of the prompt activities, most
+of them null. ``StateCodec`` writes a tagged binary format instead:
+
+- the dialog stack (``DialogState``/``DialogInstance``), ``BookingDetails``
+  (its ``SCHEMA``) and ``PromptOptions`` as fixed field lists;
+- Bot Framework schema models (``Activity``...) as their non-null fields;
+- dialog ids and state keys known in advance as one-byte references to
+  ``KNOWN_STRINGS``, other strings once per payload then by index;
+- anything else through jsonpickle.
+
+Payloads start with a version byte; payloads above ``compress_above``
+bytes are zlib-compressed when that makes them smaller. Objects seen
+twice in one payload are written once and referenced, so shared
+references survive a round trip as with ``copy.deepcopy``.
+"""
+import enum
+import importlib
+import json
+import struct
+import time
+import zlib
+from typing import Callable, Dict, List
+
+from botbuilder.dialogs import DialogInstance, DialogState
+from botbuilder.dialogs.prompts import PromptOptions
+from jsonpickle import encode as jsonpickle_encode
+from jsonpickle.unpickler import Unpickler
+from msrest.serialization import Model
+
+from booking_details import BookingDetails
+
+VERSION = 1
+_COMPRESSED = 0x80
+
+# Version 1 table: never reorder or remove entries; new ones go at the end.
+KNOWN_STRINGS = (
+    "",
+    "DialogState",
+    "dialogs",
+    "options",
+    "state",
+    "values",
+    "instanceId",
+    "stepIndex",
+    "MainDialog",
+    "WFDialog",
+    "BookingDialog",
+    "WaterfallDialog",
+    "WaterfallDialog2",
+    "DateResolverDialog_from_date",
+    "DateResolverDialog_to_date",
+    "TextPrompt",
+    "DateTimePrompt",
+    "ConfirmPrompt",
+    "botbuilder.schema._models_py3:Activity",
+    "botbuilder.schema._connector_client_enums:ActivityTypes",
+    "botbuilder.schema._connector_client_enums:InputHints",
+    "message",
+    "acceptingInput",
+    "expectingInput",
+    "ignoringInput",
+    "text",
+    "type",
+    "input_hint",
+    "speak",
+)
+_KNOWN_INDEX = {string: index for index, string in enumerate(KNOWN_STRINGS)}
+
+# Tags
+_NONE, _TRUE, _FALSE, _INT, _FLOAT, _STR, _STR_REF, _KNOWN = range(8)
+_LIST, _TUPLE, _DICT, _BYTES, _REF = range(8, 13)
+_DIALOG_STATE, _DIALOG_INSTANCE, _BOOKING, _PROMPT_OPTIONS, _MODEL, _ENUM, _PICKLED = range(13, 20)
+
+_DOUBLE = struct.Struct("<d")
+
+_PROMPT_OPTIONS_FIELDS = ("prompt", "retry_prompt", "choices", "style", "validations", "number_of_attempts")
+
+
+def _class_path(cls: type) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+_CLASSES: Dict[str, type] = {}
+
+
+def _load_class(path: str) -> type:
+    cls = _CLASSES.get(path)
+    if cls is None:
+        module, _, name = path.partition(":")
+        cls = importlib.import_module(module)
+        for part in name.split("."):
+            cls = getattr(cls, part)
+        _CLASSES[path] = cls
+    return cls
+
+
+class _Writer:
+    __slots__ = ("out", "strings", "objects")
+
+    def __init__(self):
+        self.out = bytearray()
+        self.strings: Dict[str, int] = {}
+        self.objects: Dict[int, int] = {}
+
+    def uint(self, value: int):
+        out = self.out
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def string(self, value: str):
+        known = _KNOWN_INDEX.get(value)
+        if known is not None:
+            self.out.append(_KNOWN)
+            self.uint(known)
+            return
+        index = self.strings.get(value)
+        if index is not None:
+            self.out.append(_STR_REF)
+            self.uint(index)
+            return
+        self.strings[value] = len(self.strings)
+        data = value.encode("utf-8")
+        self.out.append(_STR)
+        self.uint(len(data))
+        self.out += data
+
+    def shared(self, value) -> bool:
+        """Write a back reference if ``value`` was written already."""
+        index = self.objects.get(id(value))
+        if index is not None:
+            self.out.append(_REF)
+            self.uint(index)
+            return True
+        self.objects[id(value)] = len(self.objects)
+        return False
+
+    def value(self, value):
+        # Exact type checks first: they cover nearly everything in dialog state.
+        kind = type(value)
+        if value is None:
+            self.out.append(_NONE)
+        elif kind is str:
+            self.string(value)
+        elif kind is bool:
+            self.out.append(_TRUE if value else _FALSE)
+        elif kind is int:
+            self.out.append(_INT)
+            self.uint(value * 2 if value >= 0 else -value * 2 - 1)
+        elif kind is float:
+            self.out.append(_FLOAT)
+            self.out += _DOUBLE.pack(value)
+        elif kind is bytes:
+            self.out.append(_BYTES)
+            self.uint(len(value))
+            self.out += value
+        elif self.shared(value):
+            return
+        else:
+            encoder = _ENCODERS.get(kind)
+            if encoder is not None:
+                encoder(self, value)
+            elif isinstance(value, Model):
+                self._model(value)
+            elif isinstance(value, enum.Enum):
+                self.out.append(_ENUM)
+                self.string(_class_path(kind))
+                self.value(value.value)
+            else:
+                self.out.append(_PICKLED)
+                self.string(jsonpickle_encode(value))
+
+    def items(self, values):
+        self.uint(len(values))
+        for item in values:
+            self.value(item)
+
+    def _list(self, value: list):
+        self.out.append(_LIST)
+        self.items(value)
+
+    def _tuple(self, value: tuple):
+        self.out.append(_TUPLE)
+        self.items(value)
+
+    def _dict(self, value: dict):
+        self.out.append(_DICT)
+        self.uint(len(value))
+        for key, item in value.items():
+            self.value(key)
+            self.value(item)
+
+    def _dialog_state(self, value: DialogState):
+        self.out.append(_DIALOG_STATE)
+        self.uint(len(value.dialog_stack))
+        for instance in value.dialog_stack:
+            self.value(instance)
+
+    def _dialog_instance(self, value: DialogInstance):
+        self.out.append(_DIALOG_INSTANCE)
+        self.value(value.id)
+        self.value(value.state)
+
+    def _booking(self, value: BookingDetails):
+        self.out.append(_BOOKING)
+        self.items([getattr(value, name) for name in BookingDetails.SCHEMA])
+
+    def _prompt_options(self, value: PromptOptions):
+        self.out.append(_PROMPT_OPTIONS)
+        self.items([getattr(value, name) for name in _PROMPT_OPTIONS_FIELDS])
+
+    def _model(self, value: Model):
+        fields = {
+            name: getattr(value, name)
+            for name in value._attribute_map  # pylint: disable=protected-access
+            if getattr(value, name, None) is not None
+        }
+        # msrest keeps unknown keys (channel data of entities, mentions...) in
+        # additional_properties, which is not part of _attribute_map.
+        additional_properties = getattr(value, "additional_properties", None)
+        if additional_properties:
+            fields["additional_properties"] = additional_properties
+        else:
+            fields.pop("additional_properties", None)
+        self.out.append(_MODEL)
+        self.string(_class_path(type(value)))
+        self.uint(len(fields))
+        for name, item in fields.items():
+            self.string(name)
+            self.value(item)
+
+
+_ENCODERS: Dict[type, Callable[[_Writer, object], None]] = {
+    list: _Writer._list,
+    tuple: _Writer._tuple,
+    dict: _Writer._dict,
+    DialogState: _Writer._dialog_state,
+    DialogInstance: _Writer._dialog_instance,
+    BookingDetails: _Writer._booking,
+    PromptOptions: _Writer._prompt_options,
+}
+
+
+class _Reader:
+    __slots__ = ("data", "pos", "strings", "objects")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+        self.strings: List[str] = []
+        self.objects: List[object] = []
+
+    def uint(self) -> int:
+        data = self.data
+        result = shift = 0
+        while True:
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def raw(self, size: int) -> bytes:
+        start = self.pos
+        self.pos += size
+        if self.pos > len(self.data):
+            raise ValueError("Truncated state payload")
+        return self.data[start:self.pos]
+
+    def shared(self, value):
+        self.objects.append(value)
+        return value
+
+    def value(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag == _STR:
+            value = self.raw(self.uint()).decode("utf-8")
+            self.strings.append(value)
+            return value
+        if tag == _KNOWN:
+            return KNOWN_STRINGS[self.uint()]
+        if tag == _STR_REF:
+            return self.strings[self.uint()]
+        if tag == _NONE:
+            return None
+        if tag == _TRUE:
+            return True
+        if tag == _FALSE:
+            return False
+        if tag == _INT:
+            value = self.uint()
+            return value >> 1 if not value & 1 else -((value + 1) >> 1)
+        if tag == _FLOAT:
+            return _DOUBLE.unpack(self.raw(_DOUBLE.size))[0]
+        if tag == _BYTES:
+            return bytes(self.raw(self.uint()))
+        if tag == _REF:
+            return self.objects[self.uint()]
+        if tag == _DICT:
+            value = self.shared({})
+            for _ in range(self.uint()):
+                key = self.value()
+                value[key] = self.value()
+            return value
+        if tag == _LIST:
+            value = self.shared([])
+            value.extend(self.value() for _ in range(self.uint()))
+            return value
+        if tag == _TUPLE:
+            # Cannot be filled after creation: register a placeholder first.
+            index = len(self.objects)
+            self.objects.append(None)
+            value = tuple(self.value() for _ in range(self.uint()))
+            self.objects[index] = value
+            return value
+        if tag == _DIALOG_STATE:
+            value = self.shared(DialogState())
+            for _ in range(self.uint()):
+                value.dialog_stack.append(self.value())
+            return value
+        if tag == _DIALOG_INSTANCE:
+            value = self.shared(DialogInstance())
+            value.id = self.value()
+            value.state = self.value()
+            return value
+        if tag == _BOOKING:
+            value = self.shared(BookingDetails())
+            self._fields(value, BookingDetails.SCHEMA)
+            return value
+        if tag == _PROMPT_OPTIONS:
+            value = self.shared(PromptOptions())
+            self._fields(value, _PROMPT_OPTIONS_FIELDS)
+            return value
+        if tag == _MODEL:
+            index = len(self.objects)
+            self.objects.append(None)
+            cls = _load_class(self.value())
+            fields = {}
+            for _ in range(self.uint()):
+                name = self.value()
+                fields[name] = self.value()
+            additional_properties = None
+            if "additional_properties" not in cls._attribute_map:  # pylint: disable=protected-access
+                additional_properties = fields.pop("additional_properties", None)
+            value = cls(**fields)
+            if additional_properties is not None:
+                value.additional_properties = additional_properties
+            self.objects[index] = value
+            return value
+        if tag == _ENUM:
+            index = len(self.objects)
+            self.objects.append(None)
+            cls = _load_class(self.value())
+            value = cls(self.value())
+            self.objects[index] = value
+            return value
+        if tag == _PICKLED:
+            return self.shared(Unpickler().restore(json.loads(self.value())))
+        raise ValueError(f"Unknown state tag {tag}")
+
+    def _fields(self, value, names):
+        count = self.uint()
+        for index in range(count):
+            item = self.value()
+            # Fields written by a newer schema than this one are skipped.
+            if index < len(names):
+                setattr(value, names[index], item)
+
+
+class StateCodec:
+    """Encodes state items to bytes and back."""
+
+    def __init__(self, compress_above: int = 1024, compression_level: int = 1):
+        self.compress_above = compress_above
+        self.compression_level = compression_level
+
+        self.encoded = 0
+        self.decoded = 0
+        self.compressed = 0
+        self.bytes_encoded = 0
+        self.encode_time = 0.0
+        self.decode_time = 0.0
+
+    def encode(self, value) -> bytes:
+        start = time.perf_counter()
+        writer = _Writer()
+        writer.value(value)
+        body = bytes(writer.out)
+        header = VERSION
+        if self.compress_above and len(body) > self.compress_above:
+            packed = zlib.compress(body, self.compression_level)
+            if len(packed) < len(body):
+                body = packed
+                header |= _COMPRESSED
+                self.compressed += 1
+        payload = bytes((header,)) + body
+
+        self.encoded += 1
+        self.bytes_encoded += len(payload)
+        self.encode_time += time.perf_counter() - start
+        return payload
+
+    def decode(self, payload: bytes):
+        start = time.perf_counter()
+        header = payload[0]
+        if header & ~_COMPRESSED != VERSION:
+            raise ValueError(f"Unsupported state format version {header & ~_COMPRESSED}")
+        body = payload[1:]
+        if header & _COMPRESSED:
+            body = zlib.decompress(body)
+        value = _Reader(body).value()
+
+        self.decoded += 1
+        self.decode_time += time.perf_counter() - start
+        return value
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "compressed": self.compressed,
+            "bytes_encoded": self.bytes_encoded,
+            "encode_time": self.encode_time,
+            "decode_time": self.decode_time,
+        }
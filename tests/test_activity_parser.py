@@ -0,0 +1,94 @@
+import unittest
+
+from botbuilder.schema import Activity
+from msrest.serialization import Model
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from helpers.activity_parser import ActivityParser, loads
+
+MESSAGE = {
+    "type": "message",
+    "id": "f3a0c1d0",
+    "timestamp": "2021-05-12T09:24:31.9134567Z",
+    "localTimestamp": "2021-05-12T11:24:31+02:00",
+    "serviceUrl": "http://localhost:59623",
+    "channelId": "emulator",
+    "from": {"id": "user", "name": "Ann", "role": "user"},
+    "conversation": {"id": "conv|livechat", "isGroup": False, "tenantId": "tenant"},
+    "recipient": {"id": "bot", "name": "FlyMe", "role": "bot"},
+    "locale": "en-US",
+    "text": "book a flight",
+    "attachments": [],
+    "entities": [{"type": "ClientCapabilities", "requiresBotState": True}],
+    "channelData": {"clientActivityID": "1620811471909"},
+    "somethingNew": {"nested": [1, 2]},
+}
+
+
+def as_tree(value):
+    if isinstance(value, Model):
+        return type(value).__name__, {name: as_tree(item) for name, item in vars(value).items()}
+    if isinstance(value, list):
+        return [as_tree(item) for item in value]
+    return value
+
+
+class ActivityParserTest(unittest.TestCase):
+    """Tests for the inbound activity builder."""
+
+    def assert_same_as_msrest(self, parser, body):
+        self.assertEqual(as_tree(Activity().deserialize(body)), as_tree(parser.parse(body)))
+
+    def test_message_is_built_directly(self):
+        parser = ActivityParser()
+        self.assert_same_as_msrest(parser, MESSAGE)
+        activity = parser.parse(MESSAGE)
+        self.assertEqual("Ann", activity.from_property.name)
+        self.assertEqual(2021, activity.timestamp.year)
+        self.assertEqual({"somethingNew": {"nested": [1, 2]}}, activity.additional_properties)
+        self.assertEqual({"fast": 2, "fallback": 0}, parser.stats)
+
+    def test_conversation_update(self):
+        parser = ActivityParser()
+        body = {"type": "conversationUpdate", "membersAdded": [{"id": "user"}, {"id": "bot"}], "conversation": {"id": "c"}}
+        self.assert_same_as_msrest(parser, body)
+        self.assertEqual(["user", "bot"], [member.id for member in parser.parse(body).members_added])
+
+    def test_other_payloads_fall_back_to_msrest(self):
+        parser = ActivityParser()
+        bodies = [
+            dict(MESSAGE, attachments=[{"contentType": "image/png", "contentUrl": "http://example.com/a.png"}]),
+            dict(MESSAGE, text=5),
+            dict(MESSAGE, conversation={"id": "c", "isGroup": "false"}),
+        ]
+        for body in bodies:
+            self.assert_same_as_msrest(parser, body)
+        self.assertEqual(0, parser.stats["fast"])
+
+    def test_loads(self):
+        self.assertEqual({"text": "é"}, loads('{"text": "é"}'.encode("utf-8")))
+        with self.assertRaises(ValueError):
+            loads(b"{not json")
@@ -0,0 +1,182 @@
+import asyncio
+
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+# name of the package to add
+path = find_pckg("helpers")
+
+from botbuilder.core import ConversationState, MemoryStorage, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs import DialogInstance, DialogState
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+
+from helpers.admission import (
+    IN_DIALOG,
+    NEW,
+    AdmissionController,
+    AdmissionPriorityMiddleware,
+    AdmissionRejected,
+)
+
+
+class Turns:
+    """Turns that run until released, recording the order they started in."""
+
+    def __init__(self):
+        self.started = []
+        self.release = asyncio.Event()
+
+    def turn(self, name):
+        async def run():
+            self.started.append(name)
+            await self.release.wait()
+            return name
+        return run
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class AdmissionControllerTest(AsyncTestCase):
+    """Tests for the turn admission controller."""
+
+    async def test_concurrency_limit_and_queue(self):
+        controller = AdmissionController(2, max_queue=1)
+        turns = Turns()
+        tasks = [asyncio.ensure_future(controller.run(f"c{i}", turns.turn(i))) for i in range(4)]
+        await settle()
+
+        self.assertEqual([0, 1], turns.started)
+        self.assertEqual({"running": 2, "waiting": 1}, {k: controller.stats[k] for k in ("running", "waiting")})
+        with self.assertRaises(AdmissionRejected) as raised:
+            await tasks[3]
+        self.assertEqual("queue_full", raised.exception.reason)
+        self.assertEqual(2, raised.exception.retry_after)
+
+        turns.release.set()
+        self.assertEqual([0, 1, 2], await asyncio.gather(*tasks[:3]))
+        self.assertEqual(0, controller.stats["running"])
+        self.assertEqual(3, controller.stats["admitted"])
+        self.assertEqual(1, controller.stats["rejected_queue_full"])
+
+    async def test_in_dialog_conversations_go_first(self):
+        controller = AdmissionController(1, max_queue=2)
+        controller.set_priority("booking", IN_DIALOG)
+        turns = Turns()
+        running = asyncio.ensure_future(controller.run("first", turns.turn("first")))
+        await settle()
+        new = [asyncio.ensure_future(controller.run(f"new{i}", turns.turn(f"new{i}"))) for i in range(2)]
+        await settle()
+        booking = asyncio.ensure_future(controller.run("booking", turns.turn("booking")))
+        await settle()
+
+        # The queue was full: the newest new conversation's turn made room.
+        with self.assertRaises(AdmissionRejected) as raised:
+            await new[1]
+        self.assertEqual("displaced", raised.exception.reason)
+
+        turns.release.set()
+        await asyncio.gather(running, new[0], booking)
+        self.assertEqual(["first", "booking", "new0"], turns.started)
+
+        # A new conversation cannot displace anyone.
+        controller.set_priority("booking", NEW)
+        self.assertEqual(NEW, controller.priority("booking"))
+        self.assertEqual(0, controller.stats["in_dialog_conversations"])
+
+    async def test_wait_timeout_and_cancellation(self):
+        controller = AdmissionController(1, max_queue=5, max_wait=0.02)
+        turns = Turns()
+        running = asyncio.ensure_future(controller.run("a", turns.turn("a")))
+        await settle()
+        with self.assertRaises(AdmissionRejected) as raised:
+            await controller.run("b", turns.turn("b"))
+        self.assertEqual("timeout", raised.exception.reason)
+
+        cancelled = asyncio.ensure_future(controller.run("c", turns.turn("c")))
+        await settle()
+        cancelled.cancel()
+        await settle()
+        self.assertEqual(0, controller.stats["waiting"])
+
+        turns.release.set()
+        await running
+        self.assertEqual("d", await controller.run("d", turns.turn("d")))
+        self.assertEqual(0, controller.stats["running"])
+
+    async def test_rejected_waiter_cancelled_before_resuming(self):
+        controller = AdmissionController(1, max_queue=5)
+        turns = Turns()
+        running = asyncio.ensure_future(controller.run("a", turns.turn("a")))
+        await settle()
+        expired = asyncio.ensure_future(controller.run("b", turns.turn("b")))
+        await settle()
+
+        # Expires, then the request is cancelled before the task resumes.
+        controller._expire(NEW, controller._waiting[NEW][0])
+        expired.cancel()
+        await settle()
+        self.assertEqual(1, controller.stats["running"])
+
+        later = asyncio.ensure_future(controller.run("c", turns.turn("c")))
+        await settle()
+        self.assertEqual(["a"], turns.started)
+
+        turns.release.set()
+        await asyncio.gather(running, later)
+        self.assertEqual(0, controller.stats["running"])
+
+
+class AdmissionPriorityMiddlewareTest(AsyncTestCase):
+    """Tests for recording which conversations are in the middle of a booking."""
+
+    async def run_turn(self, stack):
+        controller = AdmissionController(1)
+        conversation_state = ConversationState(MemoryStorage())
+        middleware = AdmissionPriorityMiddleware(controller, conversation_state, ["BookingDialog"])
+        activity = Activity(
+            type=ActivityTypes.message,
+            channel_id="test",
+            conversation=ConversationAccount(id="conv"),
+            from_property=ChannelAccount(id="user"),
+        )
+        context = TurnContext(TestAdapter(), activity)
+
+        async def logic():
+            await conversation_state.load(context)
+            if stack is not None:
+                conversation_state.get(context)["DialogState"] = stack
+
+        await middleware.on_turn(context, logic)
+        return controller.priority("test/conv")
+
+    async def test_nested_booking_dialog(self):
+        inner = DialogState([DialogInstance("BookingDialog", {"dialogs": DialogState([DialogInstance("TextPrompt", {})])})])
+        stack = DialogState([DialogInstance("MainDialog", {"dialogs": inner})])
+        self.assertEqual(IN_DIALOG, await self.run_turn(stack))
+
+    async def test_other_dialogs(self):
+        self.assertEqual(NEW, await self.run_turn(DialogState([DialogInstance("MainDialog", {})])))
+        self.assertEqual(NEW, await self.run_turn(None))
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import time
+from argparse import Namespace
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("luis_http_client.py")
+find_pckg("batch_predict.py", os.path.join(path, "p10_01_luis"))
+
+from batch_predict import RateLimiter, load_done, main, predict_many
+from luis_http_client import AsyncHttpClient, HttpClientOptions
+
+UTTERANCES = [
+    {"text": "book a flight", "intent": "BookFlight"},
+    {"text": "hello", "intent": "None"},
+    {"text": "book a flight", "intent": "BookFlight"},
+]
+
+
+class FakeEnv:
+    LUIS_APP_ID = "app"
+    LUIS_PRED_KEY = "key"
+
+    def __init__(self, endpoint):
+        self.LUIS_PRED_ENDPOINT = endpoint
+
+
+class BatchPredictTest(AsyncTestCase):
+    """Tests for the bounded-concurrency LUIS batch predictor."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "predictions.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def start_server(self, statuses=None, failing=()):
+        calls = []
+        statuses = list(statuses or [])
+
+        async def predict(request):
+            query = request.query["query"]
+            calls.append(query)
+            status = statuses.pop(0) if statuses else 200
+            if status != 200 or query in failing:
+                return web.Response(status=status if status != 200 else 400)
+            intent = "BookFlight" if "book" in query else "None"
+            return web.json_response({"query": query, "prediction": {"topIntent": intent}})
+
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", predict)
+        server = TestServer(app)
+        await server.start_server()
+        return server, calls
+
+    async def run_batch(self, server, utterances=UTTERANCES, rate=0.0, retries=0):
+        client = AsyncHttpClient(HttpClientOptions(retries=retries, backoff_factor=0))
+        env = FakeEnv(str(server.make_url("")).rstrip("/"))
+        try:
+            return [
+                item
+                async for item in predict_many(
+                    utterances, concurrency=2, rate=rate, env=env, output=self.output, client=client
+                )
+            ], client
+        finally:
+            await client.close()
+
+    async def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(50)
+        start = time.perf_counter()
+        await asyncio.gather(*[limiter.wait() for _ in range(5)])
+        self.assertGreaterEqual(time.perf_counter() - start, 4 / 50 - 0.005)
+
+    async def test_transient_errors_are_retried(self):
+        server, calls = await self.start_server(statuses=[503])
+        results, client = await self.run_batch(server, retries=2)
+        await server.close()
+
+        self.assertEqual(3, len(results))
+        self.assertFalse(any("error" in pred for _, pred in results))
+        self.assertEqual(1, client.retries)
+        self.assertEqual(4, len(calls))
+
+    async def test_resume_replays_failures_and_keeps_duplicates(self):
+        server, calls = await self.start_server(failing={"hello"})
+        results, _ = await self.run_batch(server)
+        await server.close()
+
+        # Both "book a flight" lines are predicted and written; the failure is not.
+        self.assertEqual(["book a flight", "book a flight", "hello"], sorted(calls))
+        self.assertEqual(1, sum("error" in pred for _, pred in results))
+        self.assertEqual([0, 2], sorted(load_done(self.output)))
+
+        server, calls = await self.start_server()
+        results, _ = await self.run_batch(server)
+        await server.close()
+
+        self.assertEqual(["hello"], calls)
+        self.assertEqual([0, 1, 2], sorted(load_done(self.output)))
+
+    async def test_summary_includes_resumed_predictions(self):
+        input_path = os.path.join(self.directory.name, "utterances.json")
+        with open(input_path, "w", encoding="utf-8") as f:
+            json.dump(UTTERANCES, f)
+        with open(self.output, "w", encoding="utf-8") as f:
+            for index, utterance in enumerate(UTTERANCES):
+                intent = "None" if index == 2 else utterance["intent"]
+                record = dict(utterance, index=index, prediction={"prediction": {"topIntent": intent}})
+                f.write(json.dumps(record) + "\n")
+
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            await main(Namespace(input=input_path, output=self.output, concurrency=2, rate=0.0))
+
+        self.assertIn("3 prédictions dont 3 reprises", printed.getvalue())
+        self.assertIn("Intention correcte : 66.67%", printed.getvalue())
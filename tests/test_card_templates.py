@@ -0,0 +1,92 @@
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("cards")
+
+from booking_details import BookingDetails
+from dialogs import BookingDialog, MainDialog
+from helpers.card_templates import CardTemplate, CardTemplates
+
+
+class CardTemplateTest(AsyncTestCase):
+    """Tests for the precompiled card templates."""
+
+    def test_render_fills_slots_without_touching_the_template(self):
+        template = CardTemplate(
+            {
+                "body": [
+                    {"text": "${city}"},
+                    {"text": "From ${city} for ${budget}!", "size": 3},
+                ],
+                "title": "static",
+            }
+        )
+        self.assertEqual({"city", "budget"}, template.fields)
+
+        card = template.render({"city": "Paris", "budget": 100})
+        self.assertEqual(
+            {
+                "body": [{"text": "Paris"}, {"text": "From Paris for 100!", "size": 3}],
+                "title": "static",
+            },
+            card,
+        )
+        self.assertEqual("${city}", template.card["body"][0]["text"])
+
+        card["body"].append({})
+        self.assertEqual("", template.render({})["body"][0]["text"])
+        self.assertEqual(2, len(template.render({})["body"]))
+
+    def test_cards_directory(self):
+        templates = CardTemplates.from_directory()
+        self.assertIn("bookedFlightCard", templates)
+        self.assertIn("welcomeCard", templates)
+        self.assertEqual(
+            {"from_city", "to_city", "from_date", "to_date", "budget"},
+            templates["bookedFlightCard"].fields,
+        )
+
+    def test_booking_attachment(self):
+        dialog = MainDialog(None, BookingDialog())
+        details = BookingDetails("Paris", "Rome", "2021-06-01", "2021-06-15", "500")
+
+        attachment = dialog.create_adaptive_card_attachment(details)
+
+        self.assertEqual("application/vnd.microsoft.card.adaptive", attachment.content_type)
+        texts = []
+
+        def collect(node):
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    if key == "text":
+                        texts.append(value)
+                    collect(value)
+            elif isinstance(node, list):
+                for value in node:
+                    collect(value)
+
+        collect(attachment.content)
+        self.assertFalse([text for text in texts if "${" in text])
+        self.assertEqual(2, texts.count("Paris"))
+        self.assertIn("500", texts)
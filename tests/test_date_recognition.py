@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from aiounittest import AsyncTestCase
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.dialogs.prompts import PromptValidatorContext
+from botbuilder.schema import Activity, ActivityTypes
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from dialogs import DateResolverDialog
+from helpers import date_recognition
+from helpers.date_recognition import DateRecognizer, OffloadedDateTimePrompt
+from helpers.loop_lag import LoopLagMonitor
+from helpers.metrics import Histogram
+
+
+def context(text):
+    return TurnContext(TestAdapter(), Activity(type=ActivityTypes.message, text=text))
+
+
+class DateRecognitionTest(AsyncTestCase):
+    """Tests for date recognition off the event loop."""
+
+    async def test_inline_results_are_cached(self):
+        date_recognition._CACHE.clear()
+        recognizer = DateRecognizer()
+
+        values, definite = await recognizer.recognize("June 5th 2021")
+        self.assertEqual("2021-06-05", values[0]["timex"])
+        self.assertTrue(definite)
+
+        values, definite = await recognizer.recognize("June 5th")
+        self.assertEqual("XXXX-06-05", values[0]["timex"])
+        self.assertFalse(definite)
+
+        self.assertEqual(([], False), await recognizer.recognize("no date here"))
+        await recognizer.recognize("June 5th 2021")
+        self.assertEqual(3, len(date_recognition._CACHE))
+        self.assertEqual(0, recognizer.stats["offloaded"])
+
+    async def test_prompt_recognition_feeds_the_validator(self):
+        prompt = OffloadedDateTimePrompt("DateTimePrompt")
+        turn_context = context("the 12th of August 2022")
+
+        recognized = await prompt.on_recognize(turn_context, {}, None)
+        self.assertTrue(recognized.succeeded)
+        self.assertEqual("2022-08-12", recognized.value[0].timex)
+        self.assertTrue(recognized.definite)
+
+        validator_context = PromptValidatorContext(turn_context, recognized, {}, None)
+        self.assertTrue(await DateResolverDialog.datetime_prompt_validator(validator_context))
+
+        recognized.definite = False
+        self.assertFalse(await DateResolverDialog.datetime_prompt_validator(validator_context))
+
+        recognized = await prompt.on_recognize(context("hello"), {}, None)
+        self.assertFalse(recognized.succeeded)
+
+    async def test_process_pool(self):
+        recognizer = DateRecognizer(processes=1)
+        await recognizer.start()
+        try:
+            values, definite = await recognizer.recognize("June 5th 2021")
+            self.assertEqual("2021-06-05", values[0]["timex"])
+            self.assertTrue(definite)
+            self.assertEqual(1, recognizer.stats["offloaded"])
+        finally:
+            await recognizer.close()
+
+    async def test_loop_lag_monitor(self):
+        histogram = Histogram("test_lag_seconds", "test")
+        monitor = LoopLagMonitor(interval=0.01, histogram=histogram)
+        monitor.start()
+        await asyncio.sleep(0.03)
+        time.sleep(0.1)  # Blocks the loop.
+        await asyncio.sleep(0.03)
+        await monitor.stop()
+
+        self.assertGreaterEqual(monitor.max, 0.05)
+        self.assertEqual(monitor.samples, sum(histogram._default.counts))
@@ -0,0 +1,114 @@
+import tempfile
+
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("storage")
+
+from booking_details import BookingDetails
+from storage import DeltaSqliteStorage, SqliteStorage
+
+SLOTS = ["Paris", "Rome", "2025-06-05", "2025-06-20", "500 euros"]
+
+
+def booking_state(filled: int) -> dict:
+    details = BookingDetails(*SLOTS[:filled])
+    return {"DialogState": {"stack": ["MainDialog", "BookingDialog"], "step": filled, "details": details}}
+
+
+class DeltaSqliteStorageTest(AsyncTestCase):
+    """Tests for the append-only SQLite storage."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "state.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def rows(self, storage, key="conv"):
+        return storage._connection.execute(
+            "SELECT seq, snapshot FROM state_log WHERE key = ? ORDER BY seq", (key,)
+        ).fetchall()
+
+    async def test_turns_are_appended_as_deltas(self):
+        storage = DeltaSqliteStorage(self.path, flush_interval=60)
+        for filled in range(len(SLOTS) + 1):
+            await storage.write({"conv": booking_state(filled)})
+            await storage.flush()
+
+        self.assertEqual([(1, 1), (2, 0), (3, 0), (4, 0), (5, 0), (6, 0)], self.rows(storage))
+        self.assertLess(storage.stats["write_amplification"], 0.6)
+        await storage.close()
+
+        # Replayed by a new process from the snapshot and the deltas.
+        storage = DeltaSqliteStorage(self.path)
+        details = (await storage.read(["conv"]))["conv"]["DialogState"]["details"]
+        self.assertEqual("500 euros", details.budget)
+        self.assertEqual("Rome", details.to_city)
+        await storage.close()
+
+    async def test_compaction(self):
+        storage = DeltaSqliteStorage(self.path, flush_interval=60, snapshot_every=2)
+        for filled in range(5):
+            await storage.write({"conv": booking_state(filled)})
+            await storage.flush()
+
+        # Snapshot, two deltas, then a new snapshot replacing them.
+        self.assertEqual([(4, 1), (5, 0)], self.rows(storage))
+        self.assertEqual(3, storage.stats["compacted_rows"])
+        self.assertEqual("2025-06-20", (await storage.read(["conv"]))["conv"]["DialogState"]["details"].to_date)
+        await storage.close()
+
+    async def test_e_tags_and_delete(self):
+        storage = DeltaSqliteStorage(self.path, flush_interval=60)
+        item = {"count": 1}
+        await storage.write({"conv": item})
+        await storage.flush()
+        with self.assertRaises(KeyError):
+            await storage.write({"conv": {"count": 2, "e_tag": "stale"}})
+
+        item["count"] = 2
+        await storage.write({"conv": item})
+        await storage.delete(["conv"])
+        await storage.flush()
+        self.assertEqual({}, await storage.read(["conv"]))
+        self.assertEqual([], self.rows(storage))
+        await storage.close()
+
+    async def test_reads_and_replaces_plain_rows(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conv": booking_state(1)})
+        await storage.close()
+
+        storage = DeltaSqliteStorage(self.path, flush_interval=60)
+        item = (await storage.read(["conv"]))["conv"]
+        self.assertEqual("Paris", item["DialogState"]["details"].from_city)
+        item["DialogState"]["step"] = 2
+        await storage.write({"conv": item})
+        await storage.flush()
+
+        self.assertEqual([(1, 1)], self.rows(storage))
+        self.assertIsNone(storage._connection.execute("SELECT 1 FROM state WHERE key = 'conv'").fetchone())
+        await storage.close()
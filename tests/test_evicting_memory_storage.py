@@ -0,0 +1,71 @@
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("storage")
+
+from storage import EvictingMemoryStorage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class EvictingMemoryStorageTest(AsyncTestCase):
+    """Tests for idle eviction and the entry cap."""
+
+    async def test_sweeper_drops_idle_entries_only(self):
+        clock = FakeClock()
+        storage = EvictingMemoryStorage(idle_ttl=10, sweep_interval=0, clock=clock)
+        await storage.write({"old": {"step": 1}, "busy": {"step": 1}})
+
+        clock.now = 8
+        await storage.read(["busy"])
+        clock.now = 12
+
+        self.assertEqual(1, storage.sweep())
+        self.assertEqual(["busy"], list(storage.memory))
+        self.assertEqual(1, storage.stats["expired"])
+
+    async def test_expired_entry_is_not_returned(self):
+        clock = FakeClock()
+        storage = EvictingMemoryStorage(idle_ttl=10, sweep_interval=0, clock=clock)
+        await storage.write({"conv": {"step": 1}})
+
+        clock.now = 10
+        self.assertEqual({}, await storage.read(["conv"]))
+
+    async def test_entry_cap_evicts_least_recently_used(self):
+        storage = EvictingMemoryStorage(max_entries=2, sweep_interval=0)
+        await storage.write({"a": {}})
+        await storage.write({"b": {}})
+        await storage.read(["a"])
+        await storage.write({"c": {}})
+
+        self.assertEqual(["a", "c"], list(storage.memory))
+        self.assertEqual(1, storage.stats["evicted"])
+        self.assertEqual(2, storage.stats["resident"])
@@ -0,0 +1,104 @@
+from aiounittest import AsyncTestCase
+from botbuilder.core import IntentScore, Recognizer, RecognizerResult, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("fast_path_rules.json")
+
+from helpers.fast_path_router import FastPathRouter
+from helpers.luis_helper import Intent
+
+RULES = os.path.join(path, "fast_path_rules.json")
+
+
+class FakeRecognizer(Recognizer):
+    def __init__(self, intent):
+        self.intent = intent
+        self.calls = 0
+
+    async def recognize(self, turn_context: TurnContext) -> RecognizerResult:
+        self.calls += 1
+        return RecognizerResult(
+            text=turn_context.activity.text,
+            intents={self.intent: IntentScore(0.9)},
+            entities={},
+        )
+
+
+def context(text):
+    return TurnContext(TestAdapter(), Activity(type=ActivityTypes.message, text=text))
+
+
+class FastPathRouterTest(AsyncTestCase):
+    """Tests for the local intent rules."""
+
+    def test_rules_file(self):
+        router = FastPathRouter.from_file(RULES)
+
+        self.assertEqual(Intent.NONE_INTENT.value, router.classify("Hello, there!"))
+        self.assertEqual(Intent.NONE_INTENT.value, router.classify("Heyyyy there"))
+        self.assertEqual(Intent.NONE_INTENT.value, router.classify("  Thank you so much. "))
+        self.assertEqual(Intent.BOOK_FLIGHT.value, router.classify("I'd like to book a flight!"))
+        # Anything carrying details goes to LUIS.
+        self.assertIsNone(router.classify("Hi, book a flight from Paris to Rome"))
+        self.assertIsNone(router.classify(""))
+
+    def test_ambiguous_match_falls_through(self):
+        router = FastPathRouter({"None": {"patterns": ["^go"]}, "ReserverVoyage": {"patterns": ["paris$"]}})
+
+        self.assertIsNone(router.classify("go to paris"))
+        self.assertEqual(1, router.stats["ambiguous"])
+
+    async def test_on_mode_bypasses_luis(self):
+        router = FastPathRouter.from_file(RULES, mode="on")
+        recognizer = FakeRecognizer(Intent.BOOK_FLIGHT.value)
+
+        intent, details = await router.execute_luis_query(recognizer, context("hi"))
+        self.assertEqual((Intent.NONE_INTENT.value, None), (intent, details))
+
+        intent, details = await router.execute_luis_query(recognizer, context("book a flight"))
+        self.assertEqual(Intent.BOOK_FLIGHT.value, intent)
+        self.assertEqual("", details.from_city)
+        self.assertEqual(0, recognizer.calls)
+
+        intent, _ = await router.execute_luis_query(recognizer, context("from Paris to Rome"))
+        self.assertEqual(Intent.BOOK_FLIGHT.value, intent)
+        self.assertEqual(1, recognizer.calls)
+        self.assertAlmostEqual(2 / 3, router.stats["bypass_rate"])
+
+    async def test_shadow_mode_compares_with_luis(self):
+        router = FastPathRouter.from_file(RULES, mode="shadow")
+        recognizer = FakeRecognizer(Intent.NONE_INTENT.value)
+
+        await router.execute_luis_query(recognizer, context("hello"))
+        await router.execute_luis_query(recognizer, context("book a trip"))
+        await router.execute_luis_query(recognizer, context("from Paris to Rome"))
+
+        stats = router.stats
+        self.assertEqual(3, recognizer.calls)
+        self.assertEqual(0, stats["bypassed"])
+        self.assertEqual(2, stats["shadow_compared"])
+        self.assertEqual(0.5, stats["agreement"])
+        self.assertEqual({"ReserverVoyage->None": 1}, stats["disagreements"])
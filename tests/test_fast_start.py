@@ -0,0 +1,123 @@
+import asyncio
+import tempfile
+import threading
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("fast_start.py")
+
+from fast_start import LazyApp, module_imports
+
+FAKE_APP = '''
+from aiohttp import web
+
+@web.middleware
+async def tag(request, handler):
+    response = await handler(request)
+    response.headers["X-Tagged"] = "1"
+    return response
+
+async def hello(request):
+    return web.Response(text="hello " + (await request.text()))
+
+def init_func(argv):
+    app = web.Application(middlewares=[tag])
+    app.router.add_post("/api/messages", hello)
+    return app
+'''
+
+
+class FastStartTest(AsyncTestCase):
+    """Tests for loading the bot after binding the port."""
+
+    def test_module_imports(self):
+        imports = module_imports(os.path.join(path, "app.py"))
+        self.assertIn("dialogs", imports)
+        self.assertIn("botbuilder.core", imports)
+        self.assertNotIn("app", imports)
+
+    async def test_requests_wait_for_the_app(self):
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, "fake_bot_app.py"), "w") as module:
+            module.write(FAKE_APP)
+        sys.path.insert(0, directory)
+
+        warming = threading.Event()
+        lazy = LazyApp("fake_bot_app", warm_ups=[lambda: warming.wait(5)], ready_timeout=5)
+        app = web.Application()
+        app.router.add_get("/ready", lazy.readiness)
+        app.router.add_route("*", "/{path:.*}", lazy.handle)
+        app.on_startup.append(lazy.on_startup)
+        app.on_cleanup.append(lazy.on_cleanup)
+
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        try:
+            response = await client.post("/api/messages", data="bot")
+            self.assertEqual(200, response.status)
+            self.assertEqual("hello bot", await response.text())
+            self.assertEqual("1", response.headers["X-Tagged"])
+            self.assertEqual(404, (await client.get("/missing")).status)
+            self.assertEqual(405, (await client.get("/api/messages")).status)
+
+            response = await client.get("/ready")
+            self.assertEqual(503, response.status)
+            self.assertEqual("warming", (await response.json())["stage"])
+
+            warming.set()
+            for _ in range(100):
+                if lazy.ready:
+                    break
+                await asyncio.sleep(0.01)
+            response = await client.get("/ready")
+            self.assertEqual(200, response.status)
+            self.assertIn("importing", (await response.json())["timings"])
+        finally:
+            warming.set()
+            await client.close()
+            sys.path.remove(directory)
+
+    async def test_failed_load(self):
+        lazy = LazyApp("no_such_bot_module", warm_ups=[], ready_timeout=5)
+        app = web.Application()
+        app.router.add_get("/ready", lazy.readiness)
+        app.router.add_route("*", "/{path:.*}", lazy.handle)
+        app.on_startup.append(lazy.on_startup)
+
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        try:
+            for _ in range(100):
+                if lazy.stage == "failed":
+                    break
+                await asyncio.sleep(0.01)
+            response = await client.post("/api/messages", data="bot")
+            self.assertEqual(503, response.status)
+            self.assertIn("Retry-After", response.headers)
+            self.assertIn("ModuleNotFoundError", (await (await client.get("/ready")).json())["error"])
+        finally:
+            await client.close()
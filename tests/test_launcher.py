@@ -0,0 +1,251 @@
+import asyncio
+import json
+
+import aiohttp
+from aiohttp import web
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("launcher.py")
+
+from launcher import Dispatcher, conversation_key
+
+
+class FakeWorker:
+    """In-process stand-in for an app:init_func worker."""
+
+    def __init__(self, name):
+        self.name = name
+        self.seen = []
+        self.headers = []
+        self.runner = None
+        self.url = None
+        self.port = None
+        self.stopping = False
+        self.exited = asyncio.Event()
+
+    async def handle(self, request):
+        key = conversation_key(await request.read())
+        self.seen.append(key)
+        self.headers.append(request.headers)
+        await asyncio.sleep(0.01)
+        if key == "busy":
+            return web.Response(status=503, headers={"Retry-After": "2"})
+        return web.json_response({"worker": self.name})
+
+    async def name_handler(self, request):
+        return web.json_response({"worker": self.name})
+
+    async def ready(self, request):
+        return web.json_response({"ready": True, "stage": "ready"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/api/messages", self.handle)
+        app.router.add_get("/metrics", self.name_handler)
+        app.router.add_route("*", "/admin/profile", self.name_handler)
+        app.router.add_get("/ready", self.ready)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        return self
+
+    async def wait(self):
+        await self.exited.wait()
+        return 0
+
+    async def stop(self):
+        self.stopping = True
+        self.exited.set()
+        await self.runner.cleanup()
+
+
+def activity(conversation_id):
+    return {"type": "message", "text": "hi", "conversation": {"id": conversation_id}}
+
+
+class DispatcherTest(AsyncTestCase):
+    """Tests for the conversation-affine dispatcher."""
+
+    async def serve(self, dispatcher):
+        runner = web.AppRunner(dispatcher.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return runner, f"http://127.0.0.1:{port}/api/messages"
+
+    def test_conversation_key(self):
+        self.assertEqual("abc", conversation_key(json.dumps(activity("abc")).encode()))
+        self.assertEqual("", conversation_key(b"not json"))
+        self.assertEqual("", conversation_key(b'{"type": "message"}'))
+
+    async def test_turns_of_a_conversation_reach_the_same_worker(self):
+        workers = [await FakeWorker(i).start() for i in range(3)]
+        dispatcher = Dispatcher(workers)
+        runner, url = await self.serve(dispatcher)
+
+        conversations = [f"conversation-{i}" for i in range(12)]
+        async with aiohttp.ClientSession() as session:
+            async def post(conversation_id):
+                async with session.post(url, json=activity(conversation_id)) as response:
+                    return (await response.json())["worker"]
+
+            answers = await asyncio.gather(*[post(c) for c in conversations * 3])
+
+        for i, conversation_id in enumerate(conversations):
+            self.assertEqual({answers[i]}, {answers[i + 12], answers[i + 24]})
+            self.assertEqual(dispatcher.route(conversation_id), answers[i])
+        self.assertGreater(len(set(answers)), 1)
+
+        await runner.cleanup()
+        await dispatcher.close()
+
+    async def test_other_paths(self):
+        workers = [await FakeWorker(i).start() for i in range(3)]
+        dispatcher = Dispatcher(workers)
+        runner, url = await self.serve(dispatcher)
+        base = url[: -len("/api/messages")]
+
+        async with aiohttp.ClientSession() as session:
+            async def get(path):
+                async with session.get(base + path) as response:
+                    return response.status, await response.json()
+
+            self.assertEqual((200, {"worker": 0}), await get("/metrics"))
+            self.assertEqual((200, {"worker": 2}), await get("/metrics?worker=2"))
+            self.assertEqual(400, (await get("/metrics?worker=3"))[0])
+            self.assertEqual(
+                {"worker": dispatcher.route("abc")}, (await get("/admin/profile?conversation_id=abc"))[1]
+            )
+
+            status, body = await get("/ready")
+            self.assertEqual(200, status)
+            self.assertEqual(3, len(body["workers"]))
+            await workers[1].runner.cleanup()
+            status, body = await get("/ready")
+            self.assertEqual(503, status)
+            self.assertEqual([True, False, True], [worker["ready"] for worker in body["workers"]])
+
+        self.assertEqual([0, 0, 0], dispatcher.stats["served"])
+        await runner.cleanup()
+        await dispatcher.close()
+
+    async def test_headers_are_forwarded(self):
+        worker = await FakeWorker(0).start()
+        dispatcher = Dispatcher([worker])
+        runner, url = await self.serve(dispatcher)
+
+        async with aiohttp.ClientSession() as session:
+            headers = {"Authorization": "Bearer token", "X-Profile-Turn": "secret", "Connection": "keep-alive"}
+            async with session.post(url, json=activity("busy"), headers=headers) as response:
+                self.assertEqual(503, response.status)
+                self.assertEqual("2", response.headers["Retry-After"])
+
+        forwarded = worker.headers[0]
+        self.assertEqual("Bearer token", forwarded["Authorization"])
+        self.assertEqual("secret", forwarded["X-Profile-Turn"])
+        self.assertEqual("application/json", forwarded["Content-Type"])
+        self.assertNotIn(f"127.0.0.1:{runner.addresses[0][1]}", forwarded.get("Host", ""))
+
+        await runner.cleanup()
+        await dispatcher.close()
+
+    async def test_large_bodies_are_refused(self):
+        worker = await FakeWorker(0).start()
+        dispatcher = Dispatcher([worker], max_body_size=1024)
+        runner, url = await self.serve(dispatcher)
+
+        big = json.dumps(dict(activity("c"), text="x" * 2000)).encode()
+
+        async def chunked():
+            yield big
+
+        async with aiohttp.ClientSession() as session:
+            for data in (big, chunked()):
+                async with session.post(url, data=data, headers={"Content-Type": "application/json"}) as response:
+                    self.assertEqual(413, response.status)
+        self.assertEqual([], worker.seen)
+
+        await runner.cleanup()
+        await dispatcher.close()
+
+    async def test_failed_restarts_are_retried(self):
+        attempts = []
+
+        async def spawn():
+            attempts.append(len(attempts))
+            if len(attempts) < 3:
+                raise RuntimeError("Worker did not start")
+            return await FakeWorker("new").start()
+
+        crashed = await FakeWorker("crashed").start()
+        dispatcher = Dispatcher([crashed], spawn)
+        dispatcher.restart_delay = 0.01
+        dispatcher.start_watching()
+        # Exits without being asked to.
+        crashed.exited.set()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if dispatcher.restarted:
+                break
+
+        self.assertEqual(1, dispatcher.restarted)
+        self.assertEqual(2, dispatcher.stats["restart_failures"])
+        self.assertEqual("new", dispatcher.slots[0].worker.name)
+
+        await crashed.runner.cleanup()
+        await dispatcher.close()
+
+    async def test_recycle_after_max_requests(self):
+        spawned = []
+
+        async def spawn():
+            worker = await FakeWorker(f"new-{len(spawned)}").start()
+            spawned.append(worker)
+            return worker
+
+        old = await FakeWorker("old").start()
+        dispatcher = Dispatcher([old], spawn, max_requests=3)
+        runner, url = await self.serve(dispatcher)
+
+        async with aiohttp.ClientSession() as session:
+            statuses = []
+            for _ in range(5):
+                async with session.post(url, json=activity("c")) as response:
+                    statuses.append(response.status)
+                # Let the recycling task run.
+                await asyncio.sleep(0.05)
+
+        self.assertEqual([200] * 5, statuses)
+        self.assertEqual(1, dispatcher.recycled)
+        self.assertTrue(old.stopping)
+        self.assertEqual(3, len(old.seen))
+        self.assertEqual(2, len(spawned[0].seen))
+
+        await runner.cleanup()
+        await dispatcher.close()
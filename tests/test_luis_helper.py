@@ -0,0 +1,79 @@
+from aiounittest import AsyncTestCase
+from datetime import datetime
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from helpers.luis_helper import LuisHelper, _parse_timex
+
+NOW = datetime(2021, 6, 10, 15, 30)
+
+
+def entity(kind, timex):
+    return {"type": kind, "timex": [timex]}
+
+
+class ExtractDatetimesTest(AsyncTestCase):
+    """Tests for the date range resolution."""
+
+    def test_combinations(self):
+        cases = [
+            ([entity("daterange", "(2021-08-27,2021-08-30,P3D)")], ("27-08-2021", "30-08-2021")),
+            ([entity("duration", "P2W")], ("10-06-2021", "24-06-2021")),
+            ([entity("date", "XXXX-08-27"), entity("date", "XXXX-07-02")], ("02-07-2021", "27-08-2021")),
+            ([entity("date", "2022-01-31"), entity("duration", "P1M")], ("31-01-2022", "28-02-2022")),
+            ([entity("duration", "P3D"), entity("date", "XXXX-08-27")], ("27-08-2021", "30-08-2021")),
+            ([entity("date", "XXXX-08-27")], ("", "")),
+            ([entity("duration", "P3D"), entity("duration", "P3D")], ("", "")),
+        ]
+        for datetimes, expected in cases:
+            self.assertEqual(expected, LuisHelper.extract_datetimes(datetimes, NOW), datetimes)
+
+    def test_timex_components_are_cached(self):
+        _parse_timex.cache_clear()
+        LuisHelper.extract_datetimes([entity("date", "XXXX-08-27"), entity("duration", "P3D")], NOW)
+        LuisHelper.extract_datetimes([entity("duration", "P3D"), entity("date", "XXXX-08-27")], NOW)
+
+        info = _parse_timex.cache_info()
+        self.assertEqual((2, 2), (info.hits, info.misses))
+
+    def test_batch(self):
+        column = [
+            [entity("duration", "P2W")],
+            None,
+            [entity("date", "XXXX-06-31"), entity("duration", "P3D")],
+            [entity("duration", "P2W")],
+        ]
+        expected = [("10-06-2021", "24-06-2021"), ("", ""), ("", ""), ("10-06-2021", "24-06-2021")]
+
+        self.assertEqual(expected, LuisHelper.extract_datetimes_batch(column, NOW))
+
+        try:
+            import pandas as pd
+        except ImportError:
+            return
+        frame = LuisHelper.extract_datetimes_batch(pd.Series(column, index=[5, 6, 7, 8]), NOW)
+        self.assertEqual([5, 6, 7, 8], list(frame.index))
+        self.assertEqual([pair[0] for pair in expected], list(frame["from_date"]))
+        self.assertEqual([pair[1] for pair in expected], list(frame["to_date"]))
@@ -0,0 +1,130 @@
+import time
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from aiounittest import AsyncTestCase
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("luis_http_client.py")
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer
+from luis_http_client import AsyncHttpClient, HttpClientOptions, create_session
+
+PREDICTION = {
+    "query": "hi",
+    "prediction": {
+        "topIntent": "None",
+        "intents": {"None": {"score": 0.9}},
+        "entities": {},
+    },
+}
+
+
+class LuisHttpClientTest(AsyncTestCase):
+    """Tests for the pooled LUIS HTTP clients."""
+
+    async def start_server(self, statuses, headers=None):
+        calls = []
+
+        async def predict(request):
+            calls.append(request.path)
+            status = statuses.pop(0) if statuses else 200
+            if status != 200:
+                return web.Response(status=status, headers=headers)
+            return web.json_response(PREDICTION)
+
+        app = web.Application()
+        app.router.add_post("/{tail:.*}", predict)
+        server = TestServer(app)
+        await server.start_server()
+        return server, calls
+
+    def test_session_applies_default_timeout(self):
+        session = create_session(HttpClientOptions(connect_timeout=1, read_timeout=2))
+        self.assertEqual((1, 2), session.timeout)
+        retry = session.get_adapter("https://").max_retries
+        self.assertEqual(3, retry.total)
+        # A timed-out import or evaluation may have been accepted: never sent twice.
+        self.assertTrue(retry.is_retry("GET", 503))
+        self.assertFalse(retry.is_retry("POST", 503))
+
+        session = create_session(HttpClientOptions(connect_timeout=1, read_timeout=2), read_timeout=120)
+        self.assertEqual((1, 120), session.timeout)
+
+    async def test_retries_throttled_requests(self):
+        server, calls = await self.start_server([429, 503])
+        client = AsyncHttpClient(HttpClientOptions(retries=3, backoff_factor=0))
+        try:
+            result = await client.request_json("POST", str(server.make_url("/predict")))
+        finally:
+            await client.close()
+            await server.close()
+
+        self.assertEqual(PREDICTION, result)
+        self.assertEqual(3, len(calls))
+        self.assertEqual(2, client.retries)
+
+    async def test_retries_stop_at_the_total_timeout(self):
+        server, calls = await self.start_server([429, 429], headers={"Retry-After": "60"})
+        client = AsyncHttpClient(HttpClientOptions(retries=3, total_timeout=1))
+        start = time.perf_counter()
+        try:
+            with self.assertRaises(aiohttp.ClientResponseError) as raised:
+                await client.request_json("POST", str(server.make_url("/predict")))
+        finally:
+            await client.close()
+            await server.close()
+
+        self.assertEqual(429, raised.exception.status)
+        self.assertEqual(1, len(calls))
+        self.assertLess(time.perf_counter() - start, 1)
+
+    async def test_recognizer_reuses_pooled_session(self):
+        server, calls = await self.start_server([])
+        config = DefaultConfig()
+        config.LUIS_PRED_ENDPOINT = str(server.make_url("")).rstrip("/")
+        recognizer = FlightBookingRecognizer(config)
+        try:
+            for text in ("hi", "hello"):
+                activity = Activity(
+                    type=ActivityTypes.message,
+                    text=text,
+                    from_property=ChannelAccount(id="user"),
+                    recipient=ChannelAccount(id="bot"),
+                    conversation=ConversationAccount(id="conversation"),
+                )
+                result = await recognizer.recognize(TurnContext(TestAdapter(), activity))
+                self.assertIn("None", result.intents)
+            session = recognizer._http_client.session
+        finally:
+            await recognizer.close()
+            await server.close()
+
+        self.assertEqual(2, len(calls))
+        self.assertTrue(session.closed)
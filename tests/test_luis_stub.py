@@ -0,0 +1,101 @@
+from aiohttp.test_utils import TestServer
+from aiounittest import AsyncTestCase
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("p10_03_load")
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.luis_helper import LuisHelper, Intent
+from luis_http_client import HttpClientOptions
+from p10_03_load.luis_stub import LuisStub
+
+UTTERANCES = [
+    {
+        "text": "I'd like to book a trip from Chicago to San Diego between August 26th and September 5th.",
+        "intent": "ReserverVoyage",
+        "entities": [
+            {"entity": "from_city", "startPos": 29, "endPos": 35, "children": []},
+            {"entity": "to_city", "startPos": 40, "endPos": 48, "children": []},
+            {"entity": "from_date", "startPos": 58, "endPos": 68, "children": []},
+            {"entity": "to_date", "startPos": 74, "endPos": 86, "children": []},
+        ],
+    },
+    {"text": "Good morning.", "intent": "None", "entities": []},
+]
+
+
+def make_context(text: str) -> TurnContext:
+    activity = Activity(
+        type=ActivityTypes.message,
+        text=text,
+        from_property=ChannelAccount(id="user"),
+        recipient=ChannelAccount(id="bot"),
+        conversation=ConversationAccount(id="conversation"),
+    )
+    return TurnContext(TestAdapter(), activity)
+
+
+class LuisStubTest(AsyncTestCase):
+    """The bot's recognizer runs unchanged against the local LUIS stand-in."""
+
+    async def start(self, stub: LuisStub) -> FlightBookingRecognizer:
+        self.server = TestServer(stub.app())
+        await self.server.start_server()
+        config = DefaultConfig()
+        config.LUIS_PRED_ENDPOINT = str(self.server.make_url("/"))
+        config.LUIS_HTTP_OPTIONS = HttpClientOptions(retries=0)
+        return FlightBookingRecognizer(config)
+
+    async def test_labeled_utterance_through_luis_helper(self):
+        recognizer = await self.start(LuisStub(UTTERANCES))
+        try:
+            intent, details = await LuisHelper.execute_luis_query(
+                recognizer, make_context(UTTERANCES[0]["text"])
+            )
+        finally:
+            await recognizer.close()
+            await self.server.close()
+
+        self.assertEqual(Intent.BOOK_FLIGHT.value, intent)
+        self.assertEqual("Chicago", details.from_city)
+        self.assertEqual("San Diego", details.to_city)
+        self.assertNotEqual("", details.from_date)
+        self.assertNotEqual("", details.to_date)
+
+    async def test_throttling_answers_429(self):
+        stub = LuisStub(UTTERANCES, tps=1)
+        recognizer = await self.start(stub)
+        try:
+            await recognizer.recognize(make_context("Good morning."))
+            with self.assertRaises(Exception):
+                await recognizer.recognize(make_context("Hi there"))
+        finally:
+            await recognizer.close()
+            await self.server.close()
+
+        self.assertEqual(1, stub.stats["throttled"])
@@ -0,0 +1,74 @@
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from helpers.metrics import Counter, Gauge, Histogram, Registry, STEP_SECONDS, timed_step
+
+
+class MetricsTest(AsyncTestCase):
+    """Tests for the Prometheus metrics registry."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        lines = registry.render().splitlines()
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("latency_seconds_sum 3.65", lines)
+        self.assertIn("latency_seconds_count 4", lines)
+
+    def test_labels_and_stats(self):
+        registry = Registry()
+        counter = registry.register(Counter("intents_total", "Intents.", ["intent"]))
+        gauge = registry.register(Gauge("in_flight", "In flight."))
+        registry.register_stats("cache", "Cache.", lambda: {"hits": 3, "version": ("app", "v1")})
+
+        counter.labels("Book\"Flight").inc()
+        counter.labels("Book\"Flight").inc(2)
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        lines = registry.render().splitlines()
+        self.assertIn('intents_total{intent="Book\\"Flight"} 3', lines)
+        self.assertIn("in_flight 1", lines)
+        self.assertIn('cache{stat="hits"} 3', lines)
+        self.assertFalse(any("version" in line for line in lines))
+        with self.assertRaises(ValueError):
+            counter.labels()
+
+    async def test_timed_step_keeps_step_name(self):
+        async def greet_step(step_context):
+            return step_context * 2
+
+        timed = timed_step("TestDialog", greet_step)
+
+        self.assertEqual(4, await timed(2))
+        self.assertEqual(greet_step.__qualname__, timed.__qualname__)
+        self.assertEqual(1, sum(STEP_SECONDS.labels("TestDialog", "greet_step").counts))
@@ -0,0 +1,76 @@
+import json
+
+from aiounittest import AsyncTestCase
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("offline_recognizer.py")
+
+from offline_recognizer import OfflineRecognizer, resolve_date
+from helpers.luis_helper import LuisHelper, Intent
+
+DATASETS = os.path.join(path, "00_data", "datasets")
+
+
+class OfflineRecognizerTest(AsyncTestCase):
+    """Tests for the in-process recognizer."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.recognizer = OfflineRecognizer.from_file(
+            os.path.join(DATASETS, "utterances_train.json")
+        )
+
+    def test_intent_accuracy_on_test_set(self):
+        with open(os.path.join(DATASETS, "utterances_test.json")) as test_file:
+            utterances = json.load(test_file)["LabeledTestSetUtterances"]
+
+        correct = sum(
+            self.recognizer.predict(u["text"])[0] == u["intent"] for u in utterances
+        )
+        self.assertGreaterEqual(correct / len(utterances), 0.9)
+
+    def test_resolve_date(self):
+        self.assertEqual({"type": "date", "timex": ["XXXX-08-26"]}, resolve_date("August 26th"))
+        self.assertEqual({"type": "date", "timex": ["2022-02-22"]}, resolve_date("22/2/2022"))
+        self.assertEqual({"type": "date", "timex": ["XXXX-XX-24"]}, resolve_date("24th"))
+        self.assertEqual({"type": "duration", "timex": ["P3D"]}, resolve_date("3 days"))
+        self.assertIsNone(resolve_date("as soon as possible"))
+
+    async def test_result_consumed_by_luis_helper(self):
+        activity = Activity(
+            type=ActivityTypes.message,
+            text="I'd like to book a trip from Chicago to San Diego between August 26th and September 5th.",
+        )
+        context = TurnContext(TestAdapter(), activity)
+
+        intent, details = await LuisHelper.execute_luis_query(self.recognizer, context)
+
+        self.assertEqual(Intent.BOOK_FLIGHT.value, intent)
+        self.assertEqual("Chicago", details.from_city)
+        self.assertEqual("San Diego", details.to_city)
+        self.assertTrue(details.from_date)
+        self.assertTrue(details.to_date)
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import pstats
+import tempfile
+
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from helpers.profiler import TurnProfiler
+
+
+def busy_recognizer(n=20000):
+    return sum(i * i for i in range(n))
+
+
+async def turn():
+    await asyncio.sleep(0)
+    return busy_recognizer()
+
+
+class TurnProfilerTest(AsyncTestCase):
+    """Tests for the on-demand turn profiler."""
+
+    async def test_disarmed_profiler_returns_the_turn(self):
+        profiler = TurnProfiler()
+        self.assertIs(turn, profiler.wrap("conversation", turn))
+
+    async def test_cprofile_next_turns_of_one_conversation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = TurnProfiler(tmp)
+            profiler.arm(turns=2, conversation_id="target")
+
+            self.assertIs(turn, profiler.wrap("other", turn))
+            for _ in range(3):
+                await profiler.wrap("target", turn)()
+
+            self.assertEqual(2, profiler.stats["profiled"])
+            self.assertFalse(profiler.armed)
+            self.assertEqual(2, len(os.listdir(tmp)))
+
+            stats = pstats.Stats(profiler.last_path)
+            self.assertTrue(any(func[2] == "busy_recognizer" for func in stats.stats))
+
+    async def test_sampler_writes_folded_stacks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = TurnProfiler(tmp, mode="sample", interval=0.0005)
+
+            async def slow_turn():
+                for _ in range(10):
+                    busy_recognizer(200000)
+                    await asyncio.sleep(0)
+
+            await profiler.wrap("conversation", slow_turn, force=True)()
+
+            self.assertTrue(profiler.last_path.endswith(".folded"))
+            with open(profiler.last_path) as folded:
+                lines = folded.read().splitlines()
+            self.assertTrue(lines)
+            self.assertTrue(any("busy_recognizer" in line for line in lines))
+            self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+
+    async def test_overlapping_turns_are_not_nested(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = TurnProfiler(tmp)
+            profiler.arm(turns=2)
+
+            first, second = profiler.wrap("a", turn), profiler.wrap("b", turn)
+            await asyncio.gather(first(), second())
+
+            self.assertEqual(1, profiler.stats["profiled"])
+            self.assertEqual(1, profiler.stats["skipped"])
+            # The skipped turn is given back to the next one.
+            self.assertTrue(profiler.armed)
+
+    async def test_skipped_last_turn_stays_with_its_conversation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = TurnProfiler(tmp)
+            profiler.arm(turns=1, conversation_id="target")
+
+            forced, selected = profiler.wrap("other", turn, force=True), profiler.wrap("target", turn)
+            await asyncio.gather(forced(), selected())
+
+            self.assertEqual(1, profiler.stats["skipped"])
+            self.assertEqual("target", profiler.stats["conversation_id"])
+            self.assertIs(turn, profiler.wrap("other", turn))
+
+    async def test_rearming_with_another_mode_during_a_turn(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = TurnProfiler(tmp)
+            profiler.arm(turns=1)
+
+            async def rearming_turn():
+                profiler.arm(turns=1, mode="sample")
+                return await turn()
+
+            await profiler.wrap("conversation", rearming_turn)()
+
+            self.assertTrue(profiler.last_path.endswith(".pstats"))
+            self.assertFalse(profiler._active)
+            await profiler.wrap("conversation", turn)()
+            self.assertTrue(profiler.last_path.endswith(".folded"))
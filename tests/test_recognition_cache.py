@@ -0,0 +1,143 @@
+from aiounittest import AsyncTestCase
+from botbuilder.core import IntentScore, RecognizerResult, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.recognition_cache import RecognitionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingRecognizer:
+    def __init__(self):
+        self.calls = 0
+        self.results = []
+
+    async def predict(self, utterance: str) -> dict:
+        self.calls += 1
+        return {"query": utterance}
+
+    async def recognize_prediction(self, turn_context: TurnContext, luis_result: dict) -> RecognizerResult:
+        result = RecognizerResult(text=turn_context.activity.text, intents={"None": IntentScore(1.0)}, entities={})
+        self.results.append(result)
+        return result
+
+
+def make_context(text: str) -> TurnContext:
+    return TurnContext(TestAdapter(), Activity(type=ActivityTypes.message, text=text))
+
+
+class RecognitionCacheTest(AsyncTestCase):
+    """Tests for the recognition cache."""
+
+    def test_hit_after_put_with_exact_text(self):
+        cache = RecognitionCache()
+        prediction = {"query": "Hi"}
+        cache.put("Hi", prediction)
+
+        self.assertIs(prediction, cache.get("Hi"))
+        self.assertEqual(1, cache.hits)
+        # Its text and entity offsets belong to "Hi".
+        self.assertIsNone(cache.get("  hi "))
+        self.assertIsNone(cache.get("hello"))
+        self.assertEqual(2, cache.misses)
+
+    def test_lru_eviction(self):
+        cache = RecognitionCache(max_size=2)
+        cache.put("a", {"query": "a"})
+        cache.put("b", {"query": "b"})
+        cache.get("a")
+        cache.put("c", {"query": "c"})
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(1, cache.evictions)
+
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache = RecognitionCache(ttl=10, clock=clock)
+        cache.put("a", {"query": "a"})
+
+        clock.now = 9
+        self.assertIsNotNone(cache.get("a"))
+        clock.now = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(1, cache.expirations)
+        self.assertEqual(0, len(cache))
+
+    def test_version_change_invalidates(self):
+        cache = RecognitionCache(version="0.1")
+        cache.put("a", {"query": "a"})
+        cache.set_version("0.2")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(1, cache.invalidations)
+
+    async def test_recognizer_queries_luis_once_per_utterance(self):
+        recognizer = FlightBookingRecognizer(DefaultConfig())
+        counting = CountingRecognizer()
+        recognizer._recognizer = counting
+
+        await recognizer.recognize(make_context("book a flight"))
+        await recognizer.recognize(make_context("book a flight"))
+        self.assertEqual(1, counting.calls)
+        result = await recognizer.recognize(make_context("Book a  flight"))
+        self.assertEqual("Book a  flight", result.text)
+        self.assertEqual(2, counting.calls)
+
+        recognizer.app_version = "0.2"
+        await recognizer.recognize(make_context("book a flight"))
+        self.assertEqual(3, counting.calls)
+
+    async def test_each_hit_builds_its_own_result(self):
+        recognizer = FlightBookingRecognizer(DefaultConfig())
+        counting = CountingRecognizer()
+        recognizer._recognizer = counting
+
+        first = await recognizer.recognize(make_context("book a flight"))
+        second = await recognizer.recognize(make_context("book a flight"))
+
+        self.assertEqual(1, counting.calls)
+        # The hit is traced and logged like a miss and shares nothing with it.
+        self.assertEqual([first, second], counting.results)
+        self.assertIsNot(first, second)
+
+    def test_app_version_without_luis(self):
+        config = DefaultConfig()
+        config.RECOGNIZER = "offline"
+        recognizer = FlightBookingRecognizer(config)
+
+        recognizer.app_version = "0.2"
+        self.assertIsNone(recognizer.app_version)
@@ -0,0 +1,128 @@
+from aiounittest import AsyncTestCase
+from botbuilder.core import MessageFactory, NullTelemetryClient, TurnContext
+from botbuilder.core.adapters import TestAdapter
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("sampling_telemetry_middleware.py")
+
+from sampling_telemetry_middleware import SamplingTelemetryLoggerMiddleware
+
+
+class RecordingTelemetryClient(NullTelemetryClient):
+    def __init__(self):
+        self.events = []
+        self.exceptions = []
+
+    def track_event(self, name, properties=None, measurements=None):
+        self.events.append((name, properties))
+
+    def track_exception(self, exception_type=None, value=None, trace=None, properties=None, measurements=None):
+        self.exceptions.append(value)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def echo(context: TurnContext):
+    if context.activity.text == "boom":
+        raise ValueError("boom")
+    await context.send_activity(MessageFactory.text("echo " + context.activity.text))
+
+
+class SamplingTelemetryLoggerMiddlewareTest(AsyncTestCase):
+    """Tests for the sampling telemetry middleware."""
+
+    def adapter(self, middleware):
+        adapter = TestAdapter(echo)
+        adapter.use(middleware)
+        return adapter
+
+    async def test_sample_rate_keeps_whole_turns(self):
+        client = RecordingTelemetryClient()
+        middleware = SamplingTelemetryLoggerMiddleware(client, True, sample_rate=0.25)
+        adapter = self.adapter(middleware)
+
+        for i in range(8):
+            await adapter.receive_activity(f"hello {i}")
+
+        self.assertEqual(2, middleware.stats["turns_kept"])
+        self.assertEqual(4, len(client.events))
+        self.assertEqual(12, middleware.stats["events_sampled_out"])
+        # Receive and send of the same turn are kept together.
+        self.assertEqual(["BotMessageReceived", "BotMessageSend"] * 2, [name for name, _ in client.events])
+
+    async def test_rate_adapts_to_load(self):
+        clock = Clock()
+        middleware = SamplingTelemetryLoggerMiddleware(
+            RecordingTelemetryClient(), True, target_turns_per_second=2, window=10, clock=clock
+        )
+        adapter = self.adapter(middleware)
+
+        # 40 turns in 10 seconds is twice the target.
+        for i in range(40):
+            clock.now = i * 0.25
+            await adapter.receive_activity("hi")
+        clock.now = 10
+        await adapter.receive_activity("hi")
+        self.assertAlmostEqual(0.5, middleware.effective_rate, places=1)
+
+        # Back under the target: everything is logged again.
+        clock.now = 100
+        await adapter.receive_activity("hi")
+        self.assertEqual(1.0, middleware.effective_rate)
+
+    async def test_errors_are_always_logged(self):
+        client = RecordingTelemetryClient()
+        middleware = SamplingTelemetryLoggerMiddleware(client, True, sample_rate=0.0)
+        adapter = self.adapter(middleware)
+
+        await adapter.receive_activity("hello")
+        with self.assertRaises(ValueError):
+            await adapter.receive_activity("boom")
+
+        self.assertEqual([("BotMessageReceived", "boom")], [(n, p["text"]) for n, p in client.events])
+        self.assertEqual(1, len(client.exceptions))
+        self.assertEqual(1, middleware.stats["errors"])
+
+    async def test_long_text_is_trimmed(self):
+        client = RecordingTelemetryClient()
+        middleware = SamplingTelemetryLoggerMiddleware(client, True, max_text_length=10)
+        adapter = self.adapter(middleware)
+
+        await adapter.receive_activity("a" * 50)
+
+        received = client.events[0][1]
+        self.assertEqual("a" * 10 + "...", received["text"])
+        self.assertIn("textHash", received)
+        self.assertEqual(2, middleware.stats["texts_trimmed"])
+
+        hashing = SamplingTelemetryLoggerMiddleware(client, True, hash_text=True)
+        properties = hashing._trim({"text": "short"})
+        self.assertNotIn("text", properties)
+        self.assertEqual(16, len(properties["textHash"]))
@@ -0,0 +1,166 @@
+import asyncio
+
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from botbuilder.core import TurnContext
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ActivityTypes, ChannelAccount, ConversationAccount
+
+from config import DefaultConfig
+from flight_booking_recognizer import FlightBookingRecognizer
+from helpers.single_flight import SingleFlight
+
+
+class SingleFlightTest(AsyncTestCase):
+    """Tests for in-flight request coalescing."""
+
+    async def test_concurrent_calls_share_one_task(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+
+        self.assertEqual(["result"] * 5, results)
+        self.assertEqual(1, len(calls))
+        self.assertEqual(4, flight.coalesced)
+        self.assertEqual(0, flight.in_flight)
+
+    async def test_cancelling_one_waiter_keeps_others(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual("result", await second)
+        self.assertTrue(first.cancelled())
+
+    async def test_last_waiter_cancels_underlying_task(self):
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def work():
+            started.set()
+            await asyncio.sleep(10)
+
+        waiter = asyncio.ensure_future(flight.do("key", work))
+        await started.wait()
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+        self.assertEqual(0, flight.in_flight)
+
+    async def test_caller_after_last_waiter_cancelled_starts_new_task(self):
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            return "result"
+
+        waiter = asyncio.ensure_future(flight.do("key", slow))
+        await started.wait()
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        # Same key before the cancelled task's done-callback has run.
+        self.assertEqual("result", await flight.do("key", fast))
+        self.assertEqual(2, flight.started)
+
+    async def test_recognizer_shares_luis_call_not_turn_context(self):
+        calls = []
+        release = asyncio.Event()
+
+        async def predict(request):
+            calls.append(request.path)
+            await release.wait()
+            prediction = {"topIntent": "None", "intents": {"None": {"score": 0.9}}, "entities": {}}
+            return web.json_response({"query": "hi", "prediction": prediction})
+
+        app = web.Application()
+        app.router.add_post("/{tail:.*}", predict)
+        server = TestServer(app)
+        await server.start_server()
+        config = DefaultConfig()
+        config.LUIS_PRED_ENDPOINT = str(server.make_url("")).rstrip("/")
+        recognizer = FlightBookingRecognizer(config)
+
+        def context(conversation_id):
+            adapter = TestAdapter(send_trace_activities=True)
+            activity = Activity(
+                type=ActivityTypes.message,
+                text="hi",
+                from_property=ChannelAccount(id="user"),
+                recipient=ChannelAccount(id="bot"),
+                conversation=ConversationAccount(id=conversation_id),
+            )
+            return adapter, TurnContext(adapter, activity)
+
+        try:
+            first_adapter, first = context("first")
+            second_adapter, second = context("second")
+            leader = asyncio.ensure_future(recognizer.recognize(first))
+            follower = asyncio.ensure_future(recognizer.recognize(second))
+            while not calls:
+                await asyncio.sleep(0.01)
+
+            # The first turn ends before LUIS answers; the second still gets its result.
+            leader.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            result = await follower
+        finally:
+            await recognizer.close()
+            await server.close()
+
+        self.assertEqual(1, len(calls))
+        self.assertIn("None", result.intents)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual([], [a.type for a in first_adapter.activity_buffer])
+        self.assertEqual([ActivityTypes.trace], [a.type for a in second_adapter.activity_buffer])
@@ -0,0 +1,143 @@
+import asyncio
+import sqlite3
+import threading
+import tempfile
+
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("storage")
+
+from booking_details import BookingDetails
+from storage import SqliteStorage
+
+
+class SqliteStorageTest(AsyncTestCase):
+    """Tests for the durable SQLite storage."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "state.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_round_trip_survives_restart(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conv": {"details": BookingDetails(from_city="Paris")}})
+        await storage.close()
+
+        storage = SqliteStorage(self.path)
+        items = await storage.read(["conv", "missing"])
+        await storage.close()
+
+        self.assertEqual(["conv"], list(items))
+        self.assertEqual("Paris", items["conv"]["details"].from_city)
+        self.assertTrue(items["conv"]["e_tag"])
+
+    async def test_writes_to_same_key_are_coalesced(self):
+        storage = SqliteStorage(self.path, flush_interval=60)
+        state = {"count": 0}
+        for count in range(5):
+            state["count"] = count
+            await storage.write({"conv": state})
+
+        self.assertEqual(4, (await storage.read(["conv"]))["conv"]["count"])
+        await storage.flush()
+        await storage.close()
+
+        self.assertEqual(4, storage.coalesced)
+        self.assertEqual(1, storage.rows_written)
+
+    async def test_stale_e_tag_is_rejected(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conv": {"step": 1}})
+        first = (await storage.read(["conv"]))["conv"]
+        second = (await storage.read(["conv"]))["conv"]
+
+        await storage.write({"conv": first})
+        with self.assertRaises(KeyError):
+            await storage.write({"conv": second})
+
+        second["e_tag"] = "*"
+        await storage.write({"conv": second})
+        await storage.close()
+
+    async def test_delete(self):
+        storage = SqliteStorage(self.path)
+        await storage.write({"conv": {"step": 1}})
+        await storage.flush()
+        await storage.delete(["conv"])
+
+        self.assertEqual({}, await storage.read(["conv"]))
+        await storage.close()
+
+    def fail_next_commit(self, storage, release: threading.Event = None):
+        commit = storage._commit
+
+        def failing(batch):
+            storage._commit = commit
+            if release is not None:
+                release.wait(1)
+            raise sqlite3.OperationalError("database is locked")
+
+        storage._commit = failing
+
+    async def test_write_queued_during_failed_commit(self):
+        storage = SqliteStorage(self.path, flush_interval=60)
+        await storage.write({"conv": {"v": 1}})
+        await storage.flush()
+        item = (await storage.read(["conv"]))["conv"]
+
+        item["v"] = 2
+        await storage.write({"conv": item})
+        release = threading.Event()
+        self.fail_next_commit(storage, release)
+        flushing = asyncio.ensure_future(storage.flush())
+        await asyncio.sleep(0.01)
+        # Queued while the commit of v=2 is running.
+        item["v"] = 3
+        await storage.write({"conv": item})
+        release.set()
+        await flushing
+        await storage.flush()
+        await storage.close()
+
+        self.assertEqual(0, storage.conflicts)
+        storage = SqliteStorage(self.path)
+        self.assertEqual(3, (await storage.read(["conv"]))["conv"]["v"])
+        await storage.close()
+
+    async def test_failed_commit_is_retried(self):
+        storage = SqliteStorage(self.path, flush_interval=0.01)
+        self.fail_next_commit(storage)
+        await storage.write({"conv": {"v": 1}})
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if storage.commits:
+                break
+
+        self.assertEqual(1, storage.commits)
+        self.assertEqual(0, storage.stats["queued"])
+        await storage.close()
@@ -0,0 +1,100 @@
+from aiounittest import AsyncTestCase
+from botbuilder.core import MemoryStorage
+from botbuilder.core.adapters import TestAdapter
+from pathlib import Path
+import os, sys
+import tempfile
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("storage")
+
+from bots import DialogAndWelcomeBot
+from dialogs import BookingDialog, MainDialog
+from helpers.fast_path_router import FastPathRouter
+from storage import CachedConversationState, CachedUserState, SqliteStorage, StateCache
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self):
+        super(CountingStorage, self).__init__()
+        self.writes = []
+
+    async def write(self, changes):
+        self.writes.append(sorted(changes))
+        await super(CountingStorage, self).write(changes)
+
+
+class StateCacheTest(AsyncTestCase):
+    """Tests for the snapshot state cache."""
+
+    async def test_reads_are_private_copies(self):
+        cache = StateCache(sweep_interval=0)
+        await cache.write({"conv": {"slots": ["Paris"]}})
+
+        first = (await cache.read(["conv"]))["conv"]
+        first["slots"].append("Rome")
+        self.assertEqual({"slots": ["Paris"]}, (await cache.read(["conv"]))["conv"])
+
+    async def test_unchanged_items_are_not_written(self):
+        backing = CountingStorage()
+        cache = StateCache(backing, sweep_interval=0)
+        await cache.write({"conv": {"step": 1}, "user": {"name": "Ann"}})
+        await cache.write({"conv": {"step": 2}, "user": {"name": "Ann"}})
+
+        self.assertEqual([["conv", "user"], ["conv"]], backing.writes)
+        self.assertEqual(1, cache.stats["unchanged"])
+
+    async def test_read_through_and_eviction(self):
+        database = os.path.join(tempfile.mkdtemp(), "state.db")
+        backing = SqliteStorage(database, flush_interval=0)
+        cache = StateCache(backing, max_entries=1, sweep_interval=0)
+        await cache.write({"a": {"step": 1}})
+        await cache.write({"b": {"step": 2}})
+        self.assertEqual(["b"], list(cache.memory))
+
+        item = (await cache.read(["a"]))["a"]
+        self.assertEqual(1, item["step"])
+        self.assertEqual(1, cache.stats["misses"])
+
+        # The backing storage's e_tag travels with the cached snapshot.
+        item["step"] = 3
+        await cache.write({"a": item})
+        self.assertEqual(3, (await backing.read(["a"]))["a"]["step"])
+        with self.assertRaises(KeyError):
+            await cache.write({"a": {"step": 4, "e_tag": "stale"}})
+        await cache.close()
+
+    async def test_booking_turns(self):
+        backing = CountingStorage()
+        cache = StateCache(backing, sweep_interval=0)
+        conversation_state, user_state = CachedConversationState(cache), CachedUserState(cache)
+        router = FastPathRouter.from_file(os.path.join(path, "fast_path_rules.json"), "on")
+        dialog = MainDialog(None, BookingDialog(), fast_path_router=router)
+        adapter = TestAdapter(DialogAndWelcomeBot(conversation_state, user_state, dialog, None).on_turn)
+
+        for text in ("hi", "book a flight", "Paris"):
+            await adapter.receive_activity(text)
+        adapter.activity_buffer.clear()
+        await adapter.receive_activity("Rome")
+        self.assertIn("When", adapter.get_next_activity().text)
+        self.assertEqual(4, len(backing.writes))
+        self.assertTrue(all(keys == ["test/conversations/Convo1"] for keys in backing.writes))
@@ -0,0 +1,155 @@
+import json
+
+from aiounittest import AsyncTestCase
+from botbuilder.core import ConversationState, MemoryStorage, UserState
+from botbuilder.core.adapters import TestAdapter
+from botbuilder.schema import Activity, ChannelAccount
+from jsonpickle import encode
+from pathlib import Path
+import os, sys
+import tempfile
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("storage")
+
+from booking_details import BookingDetails
+from bots import DialogAndWelcomeBot
+from dialogs import BookingDialog, MainDialog
+from helpers.fast_path_router import FastPathRouter
+from storage import CodecStorage, SqliteStorage, StateCodec
+from storage import state_codec
+
+
+async def run_conversation(storage, texts):
+    conversation_state, user_state = ConversationState(storage), UserState(storage)
+    router = FastPathRouter.from_file(os.path.join(path, "fast_path_rules.json"), "on")
+    dialog = MainDialog(None, BookingDialog(), fast_path_router=router)
+    bot = DialogAndWelcomeBot(conversation_state, user_state, dialog, None)
+    adapter = TestAdapter(bot.on_turn)
+    for text in texts:
+        await adapter.receive_activity(text)
+    return adapter
+
+
+def as_json(value):
+    return json.loads(encode(value, make_refs=False))
+
+
+class StateCodecTest(AsyncTestCase):
+    """Tests for the binary state codec."""
+
+    async def test_round_trip_of_a_booking_in_progress(self):
+        storage = MemoryStorage()
+        await run_conversation(storage, ["hi", "book a flight", "Paris", "Rome", "June 5th 2025"])
+        state = storage.memory["test/conversations/Convo1"]
+
+        codec = StateCodec(compress_above=0)
+        payload = codec.encode(state)
+        self.assertEqual(as_json(state), as_json(codec.decode(payload)))
+        self.assertLess(len(payload), len(encode(state)) / 4)
+        self.assertEqual(1, codec.stats["decoded"])
+
+    def test_values(self):
+        codec = StateCodec()
+        shared = ["x"]
+        booking = BookingDetails("Paris", "Rome", budget="300")
+        value = {
+            "ints": [0, 1, -1, 300, -2 ** 70],
+            "misc": (None, True, False, 1.5, b"\x00\xff", "é", "é"),
+            "shared": [shared, shared],
+            "booking": booking,
+            "pickled": {1, 2},
+        }
+        decoded = codec.decode(codec.encode(value))
+        self.assertEqual(value["ints"], decoded["ints"])
+        self.assertEqual(value["misc"], decoded["misc"])
+        self.assertIs(decoded["shared"][0], decoded["shared"][1])
+        self.assertEqual(("Paris", "Rome", "", "", "300"),
+                         tuple(getattr(decoded["booking"], name) for name in BookingDetails.SCHEMA))
+        self.assertEqual({1, 2}, decoded["pickled"])
+
+    def test_model_additional_properties(self):
+        codec = StateCodec()
+        # msrest only fills additional_properties when deserializing unknown keys.
+        activity = Activity(type="message", text="hi", from_property=ChannelAccount(id="user"))
+        activity.additional_properties = {"unknownKey": 5}
+        activity.from_property.additional_properties = {"foo": 1}
+        decoded = codec.decode(codec.encode(activity))
+        self.assertEqual({"unknownKey": 5}, decoded.additional_properties)
+        self.assertEqual({"foo": 1}, decoded.from_property.additional_properties)
+        self.assertEqual("hi", decoded.text)
+        self.assertEqual({}, codec.decode(codec.encode(Activity(text="hi"))).additional_properties)
+
+    def test_compression_and_version(self):
+        codec = StateCodec(compress_above=64)
+        small = codec.encode({"text": "short"})
+        large = codec.encode({"text": "word " * 200})
+        self.assertEqual(state_codec.VERSION, small[0])
+        self.assertEqual(state_codec.VERSION | 0x80, large[0])
+        self.assertLess(len(large), 200)
+        self.assertEqual("word " * 200, codec.decode(large)["text"])
+        self.assertEqual(1, codec.stats["compressed"])
+
+        with self.assertRaises(ValueError):
+            codec.decode(bytes((state_codec.VERSION + 1,)) + small[1:])
+
+    async def test_codec_storage(self):
+        inner = MemoryStorage()
+        storage = CodecStorage(inner)
+        adapter = await run_conversation(storage, ["hi", "book a flight", "Paris"])
+        self.assertIsInstance(inner.memory["test/conversations/Convo1"]["state"], bytes)
+
+        adapter.activity_buffer.clear()
+        await adapter.receive_activity("Rome")
+        self.assertIn("When", adapter.get_next_activity().text)
+
+        await inner.write({"legacy": {"value": 1}})
+        self.assertEqual({"value": 1}, (await storage.read(["legacy"]))["legacy"])
+        self.assertIn("codec_encoded", storage.stats)
+
+    async def test_codec_storage_e_tags(self):
+        database = os.path.join(tempfile.mkdtemp(), "state.db")
+        storage = CodecStorage(SqliteStorage(database, flush_interval=0))
+        item = {"count": 1}
+        await storage.write({"key": item})
+        self.assertIsNotNone(item["e_tag"])
+
+        read = (await storage.read(["key"]))["key"]
+        self.assertEqual({"count": 1, "e_tag": item["e_tag"]}, read)
+        with self.assertRaises(KeyError):
+            await storage.write({"key": {"count": 2, "e_tag": "stale"}})
+        await storage.close()
+
+    async def test_sqlite_codec_reads_legacy_rows(self):
+        database = os.path.join(tempfile.mkdtemp(), "state.db")
+        legacy = SqliteStorage(database, flush_interval=0)
+        await legacy.write({"old": {"count": 1}})
+        await legacy.close()
+
+        storage = SqliteStorage(database, flush_interval=0, codec=StateCodec())
+        self.assertEqual(1, (await storage.read(["old"]))["old"]["count"])
+        await storage.write({"new": {"count": 2}})
+        await storage.flush()
+        value = storage._connection.execute("SELECT value FROM state WHERE key = 'new'").fetchone()[0]
+        self.assertIsInstance(value, bytes)
+        self.assertEqual(2, (await storage.read(["new"]))["new"]["count"])
+        await storage.close()
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import tempfile
+
+from aiohttp import web
+from aiounittest import AsyncTestCase
+from applicationinsights import TelemetryClient
+from applicationinsights.channel import TelemetryChannel
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from helpers.telemetry_sink import AsyncTelemetryQueue
+
+
+class FakeIngestion:
+    """Records batches posted to it; answers 503 while ``down``."""
+
+    def __init__(self):
+        self.batches = []
+        self.down = False
+        self.runner = None
+        self.url = None
+
+    async def track(self, request):
+        if self.down:
+            return web.Response(status=503)
+        self.batches.append(json.loads(await request.read()))
+        return web.json_response({"itemsReceived": len(self.batches[-1])})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v2/track", self.track)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/v2/track"
+        return self
+
+
+class AsyncTelemetryQueueTest(AsyncTestCase):
+    """Tests for the batched telemetry queue."""
+
+    def client(self, queue):
+        return TelemetryClient("key", TelemetryChannel(queue=queue))
+
+    async def test_track_only_buffers_and_batches_are_sent_in_background(self):
+        ingestion = await FakeIngestion().start()
+        queue = AsyncTelemetryQueue(ingestion.url, batch_size=3, flush_interval=60)
+        client = self.client(queue)
+
+        for i in range(7):
+            client.track_event(f"event {i}")
+        # Nothing is sent from the tracking call itself.
+        self.assertEqual([], ingestion.batches)
+
+        await asyncio.sleep(0.2)
+        self.assertEqual([3, 3], [len(batch) for batch in ingestion.batches])
+
+        await queue.close()
+        self.assertEqual([3, 3, 1], [len(batch) for batch in ingestion.batches])
+        self.assertEqual(7, queue.stats["sent"])
+        await ingestion.runner.cleanup()
+
+    async def test_sampling_and_dropping_under_pressure(self):
+        queue = AsyncTelemetryQueue("http://127.0.0.1:1/v2/track", capacity=10, batch_size=100,
+                                    sample_above=0.5, pressure_sample_rate=2)
+        client = self.client(queue)
+
+        for i in range(20):
+            client.track_event(f"event {i}")
+        client.track_trace("error", severity="ERROR")
+
+        stats = queue.stats
+        self.assertEqual(10, stats["buffered"])
+        # Events 5..19 arrive under pressure: one in two is kept, then the
+        # oldest are dropped to make room (the error trace is never sampled).
+        self.assertEqual(8, stats["sampled_out"])
+        self.assertEqual(3, stats["dropped"])
+        self.assertEqual("Microsoft.ApplicationInsights.Message", queue._buffer[-1].name)
+        queue._flusher.cancel()
+
+    async def test_spool_when_unreachable_and_replay(self):
+        ingestion = await FakeIngestion().start()
+        ingestion.down = True
+        with tempfile.TemporaryDirectory() as tmp:
+            spool_path = os.path.join(tmp, "spool.jsonl")
+            queue = AsyncTelemetryQueue(ingestion.url, batch_size=2, flush_interval=60, spool_path=spool_path)
+            client = self.client(queue)
+
+            for i in range(4):
+                client.track_event(f"event {i}")
+            await queue.send_pending()
+            self.assertEqual(2, queue.stats["spooled"])
+            self.assertTrue(os.path.exists(spool_path))
+
+            ingestion.down = False
+            client.track_event("back online")
+            await queue.close()
+
+            self.assertFalse(os.path.exists(spool_path))
+            self.assertEqual(2, queue.stats["replayed"])
+            self.assertEqual(5, sum(len(batch) for batch in ingestion.batches))
+        await ingestion.runner.cleanup()
+
+    async def test_workers_sharing_a_spool_replay_each_batch_once(self):
+        ingestion = await FakeIngestion().start()
+        ingestion.down = True
+        with tempfile.TemporaryDirectory() as tmp:
+            spool_path = os.path.join(tmp, "spool.jsonl")
+            queues = [
+                AsyncTelemetryQueue(ingestion.url, batch_size=1, flush_interval=60, spool_path=spool_path)
+                for _ in range(2)
+            ]
+            for worker, queue in enumerate(queues):
+                client = self.client(queue)
+                for i in range(3):
+                    client.track_event(f"worker {worker} event {i}")
+            await asyncio.gather(*[queue.send_pending() for queue in queues])
+            self.assertEqual([3, 3], [queue.stats["spooled"] for queue in queues])
+            for queue in queues:
+                queue._flusher.cancel()
+                await asyncio.gather(queue._flusher, return_exceptions=True)
+                queue._flusher = None
+
+            ingestion.down = False
+            await asyncio.gather(*[queue.send_pending() for queue in queues])
+            await asyncio.gather(*[queue.close() for queue in queues])
+
+            self.assertFalse(os.path.exists(spool_path))
+            self.assertEqual(6, sum(queue.stats["replayed"] for queue in queues))
+            names = sorted(batch[0]["data"]["baseData"]["name"] for batch in ingestion.batches)
+            self.assertEqual(sorted(f"worker {w} event {i}" for w in range(2) for i in range(3)), names)
+        await ingestion.runner.cleanup()
@@ -0,0 +1,71 @@
+import asyncio
+
+from aiounittest import AsyncTestCase
+from pathlib import Path
+import os, sys
+
+
+# Add parent paskage to sys.path so it can be imported (in child folder)
+def find_pckg(pckg_name, starting_point=""):
+    if starting_point == "":
+        starting_point =  str(Path(os.path.realpath(__file__)).parent)
+
+    found_in = starting_point
+
+    while not pckg_name in os.listdir(found_in):
+        found_in_before = found_in
+        found_in = Path(found_in).parent
+
+        if found_in_before == found_in:
+            return None
+
+    if found_in not in sys.path:
+        sys.path.append(str(found_in))
+    return str(found_in)
+
+# name of the package to add
+path = find_pckg("helpers")
+
+from helpers.turn_queue import TurnQueue
+
+
+class TurnQueueTest(AsyncTestCase):
+    """Tests for per-conversation turn serialization."""
+
+    async def test_turns_of_one_conversation_do_not_overlap(self):
+        queue = TurnQueue()
+        events = []
+
+        def turn(name):
+            async def run():
+                events.append(("start", name))
+                await asyncio.sleep(0.01)
+                events.append(("end", name))
+            return run
+
+        await asyncio.gather(*[queue.run("conv", turn(i)) for i in range(3)])
+
+        self.assertEqual(
+            [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)],
+            events,
+        )
+        self.assertEqual(3, queue.stats["max_depth"])
+        self.assertEqual(2, queue.stats["waited"])
+        self.assertEqual(0, queue.stats["conversations"])
+
+    async def test_conversations_run_in_parallel(self):
+        queue = TurnQueue()
+        both_started = asyncio.Event()
+        started = []
+
+        def turn(name):
+            async def run():
+                started.append(name)
+                if len(started) == 2:
+                    both_started.set()
+                await asyncio.wait_for(both_started.wait(), 1)
+            return run
+
+        await asyncio.gather(queue.run("a", turn("a")), queue.run("b", turn("b")))
+
+        self.assertEqual(0, queue.stats["waited"])